@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# Copyright (c) 2025 by olliy78
+# SPDX-License-Identifier: MIT
+"""
+Benchmark für das Parsen großer, generierter Kconfig-Dateien
+
+Erzeugt eine synthetische Kconfig-Datei im Stil der Kconfig.system-Dateien
+(Menüs, bool/hex/string-Optionen, Choices, Abhängigkeiten und lange
+Hilfetexte) und misst, wie lange kconfiglib zum Einlesen braucht.
+
+Mit --ref kann zusätzlich eine ältere kconfiglib.py aus einem Git-Stand
+geladen werden, um die Parse-Zeit vorher/nachher zu vergleichen. Beide
+Versionen müssen denselben Konfigurationsinhalt liefern, sonst bricht der
+Benchmark mit einem Fehler ab.
+
+Verwendung:
+    python bench_kconfig_parse.py [-n ANZAHL] [-r WIEDERHOLUNGEN] [--ref GIT_REV] [--keep DATEI]
+
+Beispiele:
+    python config/bench_kconfig_parse.py
+    python config/bench_kconfig_parse.py -n 10000 --ref baseline
+    python config/bench_kconfig_parse.py --ref HEAD~1 --keep /tmp/Kconfig.synth
+"""
+import os
+import sys
+import gc
+import time
+import argparse
+import tempfile
+import subprocess
+import importlib.util
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+HELP_LINES = [
+    "Technische Hinweise (aus bios.mac): Diese Option steuert einen Schalter",
+    "im BIOS. Der Wert wird beim Speichern in die .mac-Datei übernommen und",
+    "beim nächsten Build in das Systemabbild @OS.COM eingebaut.",
+    "",
+    "- Bei \"0\" ist die Funktion abgeschaltet, jeder andere Wert aktiviert",
+    "  die Funktion beim Kaltstart. Bei RESET bleibt der Zustand erhalten.",
+    "\t- Zeilen mit Tabulator kommen in generierten Dateien ebenfalls vor.",
+]
+
+
+def generate_kconfig(n_syms, help_lines=12):
+    """
+    Erzeugt den Inhalt einer synthetischen Kconfig-Datei mit n_syms Symbolen.
+    """
+    out = ['mainmenu "Synthetische CP/A Konfiguration"\n\n']
+    per_menu = 50
+    for m in range(0, n_syms, per_menu):
+        out.append('menu "Gruppe {}"\n'.format(m // per_menu))
+        for i in range(m, min(m + per_menu, n_syms)):
+            name = "SYSTEM_SYN_{}".format(i)
+            kind = i % 10
+            if kind == 9 and i + 3 < n_syms:
+                # Choice mit drei Alternativen (wie RAM-Disk-Typ)
+                out.append("choice\n")
+                out.append('    prompt "Auswahl {}"\n'.format(i))
+                out.append("    default {}_A\n".format(name))
+                for suffix in "ABC":
+                    out.append("config {}_{}\n".format(name, suffix))
+                    out.append('    bool "Variante {}"\n'.format(suffix))
+                    out.append("    help\n")
+                    out.append("        source=bios.mac {}={}\n"
+                               .format(name.lower(), suffix))
+                out.append("endchoice\n\n")
+                continue
+            out.append("config {}\n".format(name))
+            if kind in (0, 1, 2, 3, 4):
+                out.append('    bool "Option {} aktivieren"\n'.format(i))
+                out.append("    default {}\n".format("y" if i % 2 else "n"))
+            elif kind in (5, 6):
+                out.append('    hex "Adresse {}"\n'.format(i))
+                out.append("    default 0x{:04X}\n".format(i & 0xFFFF))
+                out.append("    range 0x0000 0xFFFF\n")
+            else:
+                out.append('    string "Text {}"\n'.format(i))
+                out.append('    default "Wert {}"\n'.format(i))
+            if i > m:
+                out.append("    depends on SYSTEM_SYN_{} || !SYSTEM_SYN_{} && (SYSTEM_SYN_{} != n)\n"
+                           .format(i - 1, m, m))
+            out.append("    help\n")
+            out.append("        source=bios.mac key={}\n".format(name.lower()))
+            for j in range(help_lines):
+                line = HELP_LINES[j % len(HELP_LINES)]
+                out.append("        {}\n".format(line) if line else "\n")
+            out.append("\n")
+        out.append("endmenu\n\n")
+    return "".join(out)
+
+
+def load_kconfiglib(path, modname):
+    """
+    Lädt eine kconfiglib.py aus einem beliebigen Pfad als eigenes Modul.
+    """
+    spec = importlib.util.spec_from_file_location(modname, path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def load_ref_kconfiglib(rev, tmpdir):
+    """
+    Holt config/kconfiglib.py aus dem Git-Stand 'rev' und lädt sie.
+    """
+    try:
+        src = subprocess.run(["git", "show", "{}:config/kconfiglib.py".format(rev)],
+                             cwd=SCRIPT_DIR, capture_output=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError) as e:
+        print("[FEHLER] kconfiglib.py aus '{}' nicht lesbar: {}".format(rev, e))
+        sys.exit(1)
+    path = os.path.join(tmpdir, "kconfiglib_ref.py")
+    with open(path, "wb") as f:
+        f.write(src)
+    return load_kconfiglib(path, "kconfiglib_ref")
+
+
+def time_parse(mod, kconfig_path):
+    """
+    Parst kconfig_path einmal und liefert (CPU-Zeit, Kconfig-Objekt).
+
+    Die Garbage Collection ist während der Messung abgeschaltet (wie bei
+    timeit), damit ältere Kconfig-Objekte im Speicher die Zeit nicht
+    verfälschen.
+    """
+    gc.collect()
+    gc.disable()
+    try:
+        t = time.process_time()
+        kconf = mod.Kconfig(kconfig_path, warn=False)
+        return time.process_time() - t, kconf
+    finally:
+        gc.enable()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark für das Parsen großer Kconfig-Dateien")
+    parser.add_argument("-n", "--symbols", type=int, default=10000,
+                        help="Anzahl der Symbole (Standard: 10000)")
+    parser.add_argument("-r", "--repeat", type=int, default=5,
+                        help="Wiederholungen, die beste Zeit zählt (Standard: 5)")
+    parser.add_argument("--ref", metavar="GIT_REV",
+                        help="Vergleich mit config/kconfiglib.py aus diesem Git-Stand")
+    parser.add_argument("--keep", metavar="DATEI",
+                        help="Synthetische Kconfig zusätzlich hier speichern")
+    args = parser.parse_args()
+
+    text = generate_kconfig(args.symbols)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        kconfig_path = os.path.join(tmpdir, "Kconfig")
+        with open(kconfig_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        if args.keep:
+            with open(args.keep, "w", encoding="utf-8") as f:
+                f.write(text)
+        print("[INFO] Synthetische Kconfig: {} Symbole, {} Zeilen, {} KiB".format(
+            args.symbols, text.count("\n"), len(text) // 1024))
+
+        mods = [("aktuell", load_kconfiglib(os.path.join(SCRIPT_DIR, "kconfiglib.py"),
+                                            "kconfiglib_cur"))]
+        if args.ref:
+            mods.insert(0, (args.ref, load_ref_kconfiglib(args.ref, tmpdir)))
+
+        # Die Versionen werden abwechselnd gemessen, damit Schwankungen der
+        # Maschine beide gleich treffen. Es zählt jeweils die beste Zeit.
+        best = {}
+        results = {}
+        for _ in range(args.repeat):
+            for label, mod in mods:
+                results[label] = None
+                elapsed, results[label] = time_parse(mod, kconfig_path)
+                best[label] = min(elapsed, best.get(label, elapsed))
+
+        if args.ref:
+            ref_kconf, cur_kconf = results[args.ref], results["aktuell"]
+            if ref_kconf._config_contents(None) != cur_kconf._config_contents(None) or \
+               [getattr(n, "help", None) for n in ref_kconf.node_iter()] != \
+               [getattr(n, "help", None) for n in cur_kconf.node_iter()]:
+                print("[FEHLER] Unterschiedliches Parse-Ergebnis zwischen '{}' und aktuellem Stand"
+                      .format(args.ref))
+                sys.exit(1)
+            print("[INFO] vorher  ({}): {:.3f} s".format(args.ref, best[args.ref]))
+            print("[INFO] nachher (aktuell): {:.3f} s".format(best["aktuell"]))
+            print("[INFO] Faktor: {:.2f}x".format(best[args.ref] / best["aktuell"]))
+        else:
+            print("[INFO] Parse-Zeit (aktuell): {:.3f} s".format(best["aktuell"]))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+# Copyright (c) 2025 by olliy78
+# SPDX-License-Identifier: MIT
+"""
+Benchmark-Suite für die zeitkritischen Teile der CPA-Workbench
+
+Misst Laufzeit und Spitzen-Speicherbedarf von:
+- patch_mac: parse_kconfig_system, extract und patch (je Systemvariante und hochskaliert)
+- kconfiglib: Kconfig()-Aufbau, load_config und write_config (je Variante und synthetisch)
+- Disketten-Image: Erzeugen (leeres Image + cpmcp aller Dateien aus additions/) und Extrahieren
+  (cpmls + cpmcp), sofern tools/cpmcp und tools/cpmls ausführbar sind
+
+Die echten Varianten unter config/ und src/ werden in ein temporäres Verzeichnis kopiert, das
+Arbeitsverzeichnis bleibt unverändert. Hochskalierte Eingaben:
+- Kconfig: synthetische Datei aus bench_kconfig_parse.py (--kconfig-symbols)
+- *.mac: die echte Quelle, um --mac-scale Kopien mit umbenannten Labels verlängert
+
+Die Ergebnisse (beste Zeit aus --repeat Läufen, Spitzenspeicher) werden als JSON gespeichert.
+Mit --baseline wird gegen eine früher gespeicherte Datei verglichen. Ist ein Benchmark um mehr als
+--threshold Prozent langsamer (oder braucht mehr Speicher), endet das Skript mit Fehlercode 1.
+
+Verwendung:
+    python bench_workbench.py [-o DATEI] [--baseline DATEI] [--threshold PROZENT] [-r WIEDERHOLUNGEN]
+                              [-k FILTER] [--kconfig-symbols N] [--mac-scale F] [--root DIR] [--update-baseline]
+
+Beispiele:
+    python config/bench_workbench.py -o bench.json
+    python config/bench_workbench.py --baseline bench_baseline.json --threshold 25
+    python config/bench_workbench.py -k patch_mac --baseline bench_baseline.json --update-baseline
+"""
+import os
+import io
+import re
+import sys
+import gc
+import json
+import time
+import glob
+import shutil
+import argparse
+import platform
+import tempfile
+import contextlib
+import subprocess
+import tracemalloc
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, SCRIPT_DIR)
+
+import kconfiglib
+import patch_mac
+from bench_kconfig_parse import generate_kconfig
+from roundtrip_patch_mac import find_variants
+
+# Erstes Wort einer *.mac Zeile (für das Umbenennen der Labels beim Hochskalieren)
+_LABEL_RE = re.compile(r'^(\s*)([A-Za-z@?$][\w@?$]*)')
+
+
+def scale_mac(text, factor):
+    """
+    Verlängert eine *.mac Quelle auf das factor-fache: Die Zeilen werden wiederholt angehängt,
+    Labels und Symbole am Zeilenanfang bekommen ein Präfix, damit sie eindeutig bleiben.
+    """
+    lines = text.splitlines(keepends=True)
+    out = list(lines)
+    for i in range(1, factor):
+        out.extend(_LABEL_RE.sub(lambda m: f"{m.group(1)}Z{i}{m.group(2)}", line) for line in lines)
+    return "".join(out)
+
+
+def copy_variant(variant, workdir, mac_scale=1, root=REPO_DIR):
+    """
+    Kopiert config/<variante>/Kconfig.system und src/<variante> nach workdir (bei mac_scale > 1 mit
+    hochskalierten *.mac Quellen).
+    Returns:
+        tuple: (Basisverzeichnis, Parametermappings)
+    """
+    base = os.path.join(workdir, f"{variant}_x{mac_scale}")
+    os.makedirs(os.path.join(base, "config", variant))
+    shutil.copy2(os.path.join(root, "config", variant, "Kconfig.system"),
+                 os.path.join(base, "config", variant, "Kconfig.system"))
+    shutil.copytree(os.path.join(root, "src", variant), os.path.join(base, "src", variant))
+    param_mappings = patch_mac.parse_kconfig_system(os.path.join(base, "config", variant, "Kconfig.system"))
+    if mac_scale > 1:
+        for src in {entry["source"] or "bios.mac" for entry in param_mappings}:
+            path = os.path.join(base, "src", variant, src)
+            with open(path, encoding="utf-8", newline="") as f:
+                text = f.read()
+            with open(path, "w", encoding="utf-8", newline="") as f:
+                f.write(scale_mac(text, mac_scale))
+    return base, param_mappings
+
+
+def quiet(fn, *args, **kwargs):
+    """Ruft fn ohne Ausgaben auf stdout auf."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+
+def selected(names, keep):
+    """True, wenn keep (Filterfunktion oder None = alle) mindestens einen der Namen auswählt."""
+    return keep is None or any(keep(name) for name in names)
+
+
+def patch_mac_benchmarks(variant, workdir, mac_scale, root=REPO_DIR, keep=None):
+    """
+    Benchmarks für patch_mac auf einer (ggf. hochskalierten) Kopie der Variante.
+    Die Kopie wird nur angelegt, wenn keep mindestens einen der Benchmarks auswählt.
+    """
+    suffix = f"{variant}" if mac_scale == 1 else f"{variant}_x{mac_scale}"
+    names = [f"patch_mac.extract[{suffix}]", f"patch_mac.patch[{suffix}]"]
+    if mac_scale == 1:
+        names.insert(0, f"patch_mac.parse_kconfig_system[{suffix}]")
+    if not selected(names, keep):
+        return []
+    base, param_mappings = copy_variant(variant, workdir, mac_scale, root)
+    kconfig_path = os.path.join(base, "config", variant, "Kconfig.system")
+    config_path = os.path.join(base, ".config")
+    quiet(patch_mac.run, "extract", config_path, variant, base_dir=base, param_mappings=param_mappings)
+
+    def extract():
+        os.remove(config_path)
+        quiet(patch_mac.run, "extract", config_path, variant, base_dir=base, param_mappings=param_mappings)
+
+    def patch():
+        quiet(patch_mac.run, "patch", config_path, variant, base_dir=base, param_mappings=param_mappings)
+
+    functions = [extract, patch]
+    if mac_scale == 1:
+        functions.insert(0, lambda: patch_mac.parse_kconfig_system(kconfig_path))
+    return list(zip(names, functions))
+
+
+def kconfig_names(name):
+    """Namen der kconfiglib-Benchmarks für name."""
+    return [f"kconfiglib.Kconfig[{name}]", f"kconfiglib.load_write_config[{name}]"]
+
+
+def kconfig_benchmarks(name, kconfig_path, workdir):
+    """Benchmarks für kconfiglib: Aufbau, load_config und write_config."""
+    config_path = os.path.join(workdir, f"{name}.config")
+    kconf = kconfiglib.Kconfig(kconfig_path, warn=False)
+    kconf.write_config(config_path, header="")
+
+    def load_write():
+        kconf.load_config(config_path)
+        kconf.write_config(config_path, header="")
+
+    return list(zip(kconfig_names(name), [lambda: kconfiglib.Kconfig(kconfig_path, warn=False), load_write]))
+
+
+def image_benchmarks(workdir, keep=None):
+    """
+    Benchmarks für das Erzeugen und Extrahieren eines Disketten-Images mit cpmtools
+    (wie im Makefile bzw. in tools/extract_files.py). Leer, falls cpmtools fehlen oder keep
+    keinen der Benchmarks auswählt.
+    """
+    fmt = "cpa780_withoutBoot"
+    names = [f"image.create[{fmt}]", f"image.extract[{fmt}]"]
+    if not selected(names, keep):
+        return []
+    exe = ".exe" if os.name == "nt" else ""
+    cpmcp = os.path.join(REPO_DIR, "tools", "cpmcp" + exe)
+    cpmls = os.path.join(REPO_DIR, "tools", "cpmls" + exe)
+    if not (os.access(cpmcp, os.X_OK) and os.access(cpmls, os.X_OK)):
+        print("[WARN] tools/cpmcp oder tools/cpmls nicht ausführbar, Image-Benchmarks werden übersprungen")
+        return []
+    imgdir = os.path.join(workdir, "image")
+    os.makedirs(imgdir)
+    # cpmtools sucht die diskdefs im aktuellen Verzeichnis
+    shutil.copy2(os.path.join(REPO_DIR, "diskdefs"), imgdir)
+    files = sorted(f for f in glob.glob(os.path.join(REPO_DIR, "additions", "*")) if os.path.isfile(f))
+    img = os.path.join(imgdir, "bench.img")
+    outdir = os.path.join(imgdir, "out")
+
+    def create():
+        with open(img, "wb") as f:
+            f.write(b"\xe5" * 780 * 1024)
+        for path in files:
+            subprocess.run([cpmcp, "-f", fmt, img, path, "0:" + os.path.basename(path)],
+                           cwd=imgdir, check=True, stdout=subprocess.DEVNULL)
+
+    def extract():
+        shutil.rmtree(outdir, ignore_errors=True)
+        os.makedirs(outdir)
+        result = subprocess.run([cpmls, "-f", fmt, img], cwd=imgdir, check=True,
+                                capture_output=True, text=True)
+        names = [line.split()[0] for line in result.stdout.strip().splitlines()[1:] if line.strip()]
+        for name in names:
+            subprocess.run([cpmcp, "-f", fmt, img, "0:" + name, outdir], cwd=imgdir, check=True)
+
+    create()
+    return list(zip(names, [create, extract]))
+
+
+def measure(fn, repeat):
+    """
+    Führt fn repeat-mal aus und liefert die beste Zeit sowie den Spitzenspeicher.
+    Speicher: Python-Allokationen (tracemalloc, eigener Lauf), Unterprozesse zählen nicht mit.
+    """
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - start
+        finally:
+            gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"time": best, "peak_kib": peak // 1024, "repeat": repeat}
+
+
+def collect_benchmarks(workdir, args):
+    """
+    Alle mit -k ausgewählten Benchmarks als Liste (Name, Funktion). Die Vorbereitung (Kopien,
+    synthetische Kconfig, Image) läuft nur für Gruppen, aus denen ein Benchmark ausgewählt ist.
+    """
+    keep = (lambda name: args.filter in name) if args.filter else None
+    benchmarks = []
+    for variant in find_variants(args.root):
+        benchmarks += patch_mac_benchmarks(variant, workdir, 1, args.root, keep)
+        if args.mac_scale > 1:
+            benchmarks += patch_mac_benchmarks(variant, workdir, args.mac_scale, args.root, keep)
+        if selected(kconfig_names(variant), keep):
+            benchmarks += kconfig_benchmarks(variant, os.path.join(args.root, "config", variant,
+                                                                   "Kconfig.system"), workdir)
+    synth_name = f"synth{args.kconfig_symbols}"
+    if selected(kconfig_names(synth_name), keep):
+        synth_path = os.path.join(workdir, "Kconfig.synth")
+        with open(synth_path, "w", encoding="utf-8") as f:
+            f.write(generate_kconfig(args.kconfig_symbols))
+        benchmarks += kconfig_benchmarks(synth_name, synth_path, workdir)
+    benchmarks += image_benchmarks(workdir, keep)
+    return [(name, fn) for name, fn in benchmarks if keep is None or keep(name)]
+
+
+def compare(results, baseline, threshold):
+    """
+    Vergleicht Ergebnisse mit der Baseline.
+    Returns:
+        list: Meldungen für alle Benchmarks, die um mehr als threshold Prozent schlechter sind
+    """
+    regressions = []
+    for name, cur in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"[INFO] {name}: neu (nicht in der Baseline)")
+            continue
+        for field, label in (("time", "Zeit"), ("peak_kib", "Speicher")):
+            if not base.get(field):
+                continue
+            ratio = cur[field] / base[field]
+            if ratio > 1 + threshold / 100:
+                regressions.append(f"{name}: {label} {cur[field]:.4g} statt {base[field]:.4g} "
+                                   f"(+{(ratio - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark-Suite für die CPA-Workbench")
+    parser.add_argument("-o", "--output", metavar="DATEI", help="Ergebnisse als JSON speichern")
+    parser.add_argument("--baseline", metavar="DATEI", help="Vergleich mit gespeicherten Ergebnissen")
+    parser.add_argument("--threshold", type=float, default=20.0,
+                        help="Erlaubte Verschlechterung gegenüber der Baseline in Prozent (Standard: 20)")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Ergebnisse nach dem Lauf in die Baseline-Datei schreiben")
+    parser.add_argument("-r", "--repeat", type=int, default=5,
+                        help="Wiederholungen, die beste Zeit zählt (Standard: 5)")
+    parser.add_argument("-k", "--filter", metavar="TEXT", help="Nur Benchmarks, deren Name TEXT enthält")
+    parser.add_argument("--kconfig-symbols", type=int, default=5000,
+                        help="Symbole der synthetischen Kconfig (Standard: 5000)")
+    parser.add_argument("--mac-scale", type=int, default=10,
+                        help="Faktor für hochskalierte *.mac Quellen, 1 = aus (Standard: 10)")
+    parser.add_argument("--root", default=REPO_DIR,
+                        help="Wurzelverzeichnis mit config/ und src/ (Standard: Repository, siehe gen_variant.py)")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="bench_workbench_") as workdir:
+        for name, fn in collect_benchmarks(workdir, args):
+            results[name] = measure(fn, args.repeat)
+            print(f"[INFO] {name:55s} {results[name]['time'] * 1000:10.2f} ms "
+                  f"{results[name]['peak_kib']:8d} KiB")
+
+    data = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        print(f"[INFO] Ergebnisse gespeichert: {args.output}")
+
+    regressions = []
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for msg in regressions:
+            print(f"[FEHLER] Regression: {msg}")
+        if not regressions:
+            print(f"[INFO] Keine Regression gegenüber {args.baseline} (Schwelle {args.threshold:.0f}%)")
+    elif args.baseline:
+        print(f"[WARN] Baseline {args.baseline} nicht gefunden, kein Vergleich")
+    if args.baseline and args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        print(f"[INFO] Baseline aktualisiert: {args.baseline}")
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# Copyright (c) 2025 by olliy78
+# SPDX-License-Identifier: MIT
+"""
+Katalog einer Diskettensammlung: welche Datei liegt auf welchem Image (SQLite)
+
+scan durchsucht Verzeichnisse nach Images (.img, .cpz, .hfe, .scp), erkennt das Format
+(config/cpa_detect.py) und trägt jede Datei aller User-Bereiche mit Name, User, Größe, Anzahl
+Extents und SHA-1 des Inhalts in eine SQLite-Datenbank ein (gelesen mit der diskdef aus
+cpa_formats.Registry.image_diskdef). Die Images werden parallel in mehreren Prozessen gelesen.
+Erneut gelesen werden nur Images, deren Größe oder Änderungszeit sich geändert hat und deren SHA-1
+dann nicht mehr stimmt (mit --verify wird die SHA-1 immer geprüft, mit --full wird alles neu
+gelesen). Images, die unterhalb der durchsuchten Verzeichnisse nicht mehr existieren, werden aus dem
+Katalog entfernt.
+
+Abfragen:
+    where NAME     Images mit dieser Datei (Platzhalter * und ? erlaubt, Groß-/Kleinschreibung egal)
+    hash SHA1      Images mit einer Datei dieses Inhalts (auch nur der Anfang der SHA-1), oder mit
+                   --file DATEI die SHA-1 einer vorhandenen Datei (z.B. additions/wm.com)
+    list IMAGE     Dateien eines Images
+    stats          Anzahl Images, Dateien, unterschiedliche Inhalte, Images mit Fehlern
+
+HFE/SCP werden nur mit numpy gelesen (config/cpa_flux.py), sonst als Fehler eingetragen.
+
+Verwendung:
+    python cpa_catalog.py scan [VERZEICHNIS ...] [--db DATEI] [-j N] [--verify] [--full]
+    python cpa_catalog.py where NAME [--db DATEI]
+    python cpa_catalog.py hash (SHA1 | --file DATEI) [--db DATEI]
+    python cpa_catalog.py list IMAGE [--db DATEI]
+    python cpa_catalog.py stats [--db DATEI]
+
+Beispiele:
+    python config/cpa_catalog.py scan Disketten
+    python config/cpa_catalog.py where "format*.com"
+    python config/cpa_catalog.py hash --file additions/wm.com
+"""
+import os
+import sys
+import time
+import sqlite3
+import hashlib
+import argparse
+import concurrent.futures
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPT_DIR)
+
+import cpa_detect
+import cpa_formats
+import cpa_store
+from cpa_diskimage import directory_entries, read_cpm_files
+
+DEFAULT_DB = os.path.join("Disketten", "katalog.db")
+DEFAULT_ROOTS = ["Disketten"]
+IMAGE_EXTENSIONS = (".img", ".cpz", ".hfe", ".scp")
+HASH_CHUNK = 1 << 20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    sha1 TEXT NOT NULL,
+    format TEXT,
+    score INTEGER,
+    error TEXT,
+    scanned REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    image_id INTEGER NOT NULL REFERENCES images(id) ON DELETE CASCADE,
+    user INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    extents INTEGER NOT NULL,
+    sha1 TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_name ON files(name);
+CREATE INDEX IF NOT EXISTS files_sha1 ON files(sha1);
+CREATE INDEX IF NOT EXISTS files_image ON files(image_id);
+"""
+
+
+def open_db(path):
+    """Öffnet (und legt ggf. an) die Katalogdatenbank."""
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    db = sqlite3.connect(path)
+    db.execute("PRAGMA foreign_keys = ON")
+    db.executescript(SCHEMA)
+    return db
+
+
+def file_sha1(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def find_images(roots):
+    """Alle Image-Dateien unterhalb der Verzeichnisse (oder die angegebenen Dateien selbst)."""
+    images = []
+    for root in roots:
+        if os.path.isfile(root):
+            images.append(os.path.normpath(root))
+            continue
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            images += [os.path.normpath(os.path.join(dirpath, name)) for name in sorted(filenames)
+                       if name.lower().endswith(IMAGE_EXTENSIONS)]
+    return images
+
+
+def image_data(path):
+    """
+    Imagedaten und Rangliste der Formate einer Datei.
+    Returns:
+        tuple: (bytes, Liste (Punktzahl, Name))
+    """
+    if path.lower().endswith((".hfe", ".scp")):
+        ranking, images = cpa_detect.detect_flux(path)
+        return (bytes(images[ranking[0][1]][0]) if ranking else b""), ranking
+    with cpa_store.open_image(path) as data:
+        return bytes(data), cpa_detect.rank_formats(data, cpa_formats.load()) if len(data) else []
+
+
+def catalog_files(data, dd):
+    """
+    Alle Dateien aller User-Bereiche eines Images.
+    Returns:
+        list: (User, Name, Größe, Anzahl Extents, SHA-1 des Inhalts)
+    """
+    offset = dd.directory_offset
+    extents = {}
+    for _, user, (name, ext), _, _ in directory_entries(data[offset:offset + dd.maxdir * 32], dd):
+        fname = name.lower() + ("." + ext.lower() if ext else "")
+        extents[(user, fname)] = extents.get((user, fname), 0) + 1
+    files = []
+    for user in sorted({user for user, _ in extents}):
+        for fname, content in read_cpm_files(data, dd, user):
+            files.append((user, fname, len(content), extents[(user, fname)], hashlib.sha1(content).hexdigest()))
+    return files
+
+
+def scan_image(path, sha1):
+    """
+    Liest ein Image (läuft in einem eigenen Prozess). Ist das Format nicht eindeutig erkannt
+    (config/cpa_detect.py, choose_format), wird nur der Fehler eingetragen.
+    Returns:
+        dict: format, score, files, error
+    """
+    result = {"path": path, "sha1": sha1, "format": None, "score": None, "files": [], "error": None}
+    try:
+        data, ranking = image_data(path)
+        if ranking:
+            result["score"] = ranking[0][0]
+        flux = path.lower().endswith((".hfe", ".scp"))
+        result["format"] = cpa_detect.choose_format(ranking, cpa_formats.load(), None if flux else len(data))
+        dd, boot = cpa_formats.load().image_diskdef(result["format"], len(data))
+        result["files"] = catalog_files(data[boot:], dd)
+    except (OSError, ValueError, KeyError, RuntimeError) as e:
+        result["error"] = str(e)
+    return result
+
+
+def store_result(db, result, size, mtime):
+    """Ersetzt den Eintrag eines Images und seiner Dateien."""
+    db.execute("DELETE FROM images WHERE path = ?", (result["path"],))
+    cur = db.execute("INSERT INTO images (path, size, mtime, sha1, format, score, error, scanned) "
+                     "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                     (result["path"], size, mtime, result["sha1"], result["format"], result["score"],
+                      result["error"], time.time()))
+    db.executemany("INSERT INTO files (image_id, user, name, size, extents, sha1) VALUES (?, ?, ?, ?, ?, ?)",
+                   [(cur.lastrowid,) + f for f in result["files"]])
+
+
+def scan(db, roots, jobs=None, verify=False, full=False):
+    """
+    Bringt den Katalog für die Verzeichnisse auf den aktuellen Stand.
+    Returns:
+        tuple: (gelesen, unverändert, entfernt, Fehler)
+    """
+    known = {path: (size, mtime, sha1) for path, size, mtime, sha1
+             in db.execute("SELECT path, size, mtime, sha1 FROM images")}
+    images = find_images(roots)
+    todo = []
+    unchanged = 0
+    for path in images:
+        st = os.stat(path)
+        old = known.get(path)
+        if old and not verify and old[:2] == (st.st_size, st.st_mtime):
+            unchanged += 1
+            continue
+        sha1 = file_sha1(path)
+        if old and old[2] == sha1 and not full:
+            db.execute("UPDATE images SET size = ?, mtime = ? WHERE path = ?", (st.st_size, st.st_mtime, path))
+            unchanged += 1
+            continue
+        todo.append((path, sha1, st.st_size, st.st_mtime))
+
+    # Nicht mehr vorhandene Images unterhalb der durchsuchten Verzeichnisse entfernen
+    present = set(images)
+    prefixes = tuple(os.path.normpath(root) + os.sep for root in roots if os.path.isdir(root))
+    removed = [path for path in known if path not in present and path.startswith(prefixes)]
+    db.executemany("DELETE FROM images WHERE path = ?", [(path,) for path in removed])
+
+    errors = 0
+    sizes = {path: (size, mtime) for path, _, size, mtime in todo}
+    if jobs == 1 or len(todo) < 2:
+        results = (scan_image(path, sha1) for path, sha1, _, _ in todo)
+        executor = None
+    else:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=jobs)
+        futures = [executor.submit(scan_image, path, sha1) for path, sha1, _, _ in todo]
+        results = (f.result() for f in concurrent.futures.as_completed(futures))
+    try:
+        for result in results:
+            if result["error"]:
+                errors += 1
+                print(f"[WARN] {result['path']}: {result['error']}")
+            else:
+                print(f"[INFO] {result['path']}: {result['format']}, {len(result['files'])} Dateien")
+            store_result(db, result, *sizes[result["path"]])
+    finally:
+        if executor:
+            executor.shutdown()
+    db.commit()
+    return len(todo), unchanged, len(removed), errors
+
+
+def glob_pattern(name):
+    """Suchmuster für SQLite GLOB, ohne Beachtung der Groß-/Kleinschreibung (Namen sind klein)."""
+    return name.lower().replace("[", "[[]")
+
+
+def print_rows(rows):
+    for name, user, size, extents, sha1, path, fmt in rows:
+        print(f"{user:>2}:{name:<12} {size:>7} Bytes {extents:>3} Ext.  {sha1[:12]}  {path} ({fmt})")
+    if not rows:
+        print("[INFO] nichts gefunden")
+
+
+QUERY = ("SELECT f.name, f.user, f.size, f.extents, f.sha1, i.path, i.format FROM files f "
+         "JOIN images i ON i.id = f.image_id ")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Katalog einer Diskettensammlung (SQLite)")
+    parser.add_argument("--db", default=DEFAULT_DB, help="Katalogdatei (Standard: Disketten/katalog.db)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sc = sub.add_parser("scan", help="Images einlesen bzw. Katalog aktualisieren")
+    sc.add_argument("roots", nargs="*", default=DEFAULT_ROOTS, help="Verzeichnisse oder Images (Standard: Disketten)")
+    sc.add_argument("-j", "--jobs", type=int, default=None, help="Anzahl paralleler Prozesse (Standard: Anzahl CPUs)")
+    sc.add_argument("--verify", action="store_true", help="SHA-1 aller Images prüfen, auch bei gleicher Änderungszeit")
+    sc.add_argument("--full", action="store_true", help="alle Images neu lesen")
+    wh = sub.add_parser("where", help="Images mit einer Datei")
+    wh.add_argument("name", help="Dateiname, Platzhalter * und ? erlaubt")
+    hs = sub.add_parser("hash", help="Images mit einer Datei gleichen Inhalts")
+    hs.add_argument("sha1", nargs="?", help="SHA-1 des Inhalts (oder ihr Anfang)")
+    hs.add_argument("--file", help="SHA-1 dieser Datei verwenden")
+    ls = sub.add_parser("list", help="Dateien eines Images")
+    ls.add_argument("image", help="Pfad des Images wie im Katalog")
+    sub.add_parser("stats", help="Umfang des Katalogs")
+    args = parser.parse_args()
+
+    db = open_db(args.db)
+    if args.command == "scan":
+        start = time.perf_counter()
+        done, unchanged, removed, errors = scan(db, args.roots, args.jobs, args.verify or args.full, args.full)
+        print(f"[DONE] {done} Images gelesen, {unchanged} unverändert, {removed} entfernt, {errors} mit Fehlern "
+              f"({time.perf_counter() - start:.1f} s)")
+    elif args.command == "where":
+        print_rows(db.execute(QUERY + "WHERE f.name GLOB ? ORDER BY i.path, f.user, f.name",
+                              (glob_pattern(args.name),)).fetchall())
+    elif args.command == "hash":
+        if args.file:
+            try:
+                with open(args.file, "rb") as f:
+                    digest = hashlib.sha1(f.read()).hexdigest()
+            except OSError as e:
+                print(f"[FEHLER] {args.file}: {e.strerror or e}")
+                db.close()
+                sys.exit(1)
+            print(f"[INFO] {args.file}: {digest}")
+        elif args.sha1:
+            digest = args.sha1.lower()
+        else:
+            parser.error("hash benötigt SHA1 oder --file")
+        print_rows(db.execute(QUERY + "WHERE f.sha1 >= ? AND f.sha1 < ? ORDER BY i.path, f.user, f.name",
+                              (digest, digest + "g")).fetchall())
+    elif args.command == "list":
+        rows = db.execute(QUERY + "WHERE i.path = ? ORDER BY f.user, f.name",
+                          (os.path.normpath(args.image),)).fetchall()
+        print_rows(rows)
+    else:
+        images, failed = db.execute("SELECT COUNT(*), COUNT(error) FROM images").fetchone()
+        files, contents = db.execute("SELECT COUNT(*), COUNT(DISTINCT sha1) FROM files").fetchone()
+        print(f"{images} Images ({failed} mit Fehlern), {files} Dateien, {contents} unterschiedliche Inhalte")
+    db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+# Copyright (c) 2025 by olliy78
+# SPDX-License-Identifier: MIT
+"""
+Optionaler Build-Daemon mit warmen Caches
+
+Der Daemon läuft im Hintergrund, ist über einen Unix-Socket erreichbar und hält zwischen den
+Aufrufen im Speicher:
+- die Parametermappings aus config/<variante>/Kconfig.system (neu eingelesen nur bei Änderung)
+- die eingelesenen *.mac Dateien samt Zeilenindex und die übersetzten Suchmuster von patch_mac.py
+- die Hashes der Eingabedateien (neu berechnet nur bei geändertem Datum/Größe)
+- einen Artefakt-Cache: gebaute Dateien (z.B. build/@os.com) zum Hash ihrer Eingabedateien
+
+patch_mac.py und cpa_menuconfig.py leiten extract/patch an den Daemon weiter, wenn er läuft, und
+arbeiten sonst wie bisher im eigenen Prozess. Das Makefile fragt vor dem Assemblieren von @os.com
+den Artefakt-Cache ab (fetch) und legt das Ergebnis danach dort ab (store). Läuft kein Daemon,
+schlägt fetch fehl und es wird ganz normal gebaut.
+
+Ändert sich der Code, den der Daemon geladen hat (patch_mac.py, cpaconfig.py, cpa_daemon.py), wird die
+nächste Anfrage nicht mehr vom Daemon bearbeitet: der Aufrufer arbeitet im eigenen Prozess mit dem
+neuen Code, der Daemon startet sich neu.
+
+Verwendung:
+    python cpa_daemon.py start           Daemon im Hintergrund starten
+    python cpa_daemon.py serve           Daemon im Vordergrund laufen lassen
+    python cpa_daemon.py stop            Daemon beenden
+    python cpa_daemon.py status          Zustand und Cache-Statistik anzeigen
+    python cpa_daemon.py fetch <ausgabe> <eingabe ...> [--tag TEXT]
+                                         Artefakt aus dem Cache holen (Exit-Code 0 = Treffer)
+    python cpa_daemon.py store <ausgabe> <eingabe ...> [--tag TEXT]
+                                         Artefakt im Cache ablegen
+
+Umgebungsvariablen:
+    CPA_DAEMON_SOCKET   Pfad des Sockets (Standard: .cpa_daemon.sock im Repository)
+    CPA_DAEMON=0        Weiterleitung an den Daemon abschalten
+
+Beispiele:
+    python config/cpa_daemon.py start
+    make config os
+    python config/cpa_daemon.py status
+"""
+import os
+import io
+import sys
+import json
+import time
+import socket
+import hashlib
+import argparse
+import threading
+import contextlib
+import subprocess
+import collections
+import socketserver
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, SCRIPT_DIR)
+
+SOCKET_PATH = os.environ.get("CPA_DAEMON_SOCKET") or os.path.join(REPO_DIR, ".cpa_daemon.sock")
+MAX_ARTIFACTS = 64
+CONNECT_TIMEOUT = 0.5
+START_TIMEOUT = 10.0
+# Vom Daemon geladener Code, bei Änderung startet er neu (siehe code_stamp)
+CODE_FILES = ("patch_mac.py", "cpaconfig.py", "cpa_daemon.py")
+
+
+# --- Client ---
+
+def enabled():
+    """Weiterleitung möglich: Unix-Sockets vorhanden, nicht per CPA_DAEMON=0 abgeschaltet, Socket existiert."""
+    return (hasattr(socket, "AF_UNIX") and os.environ.get("CPA_DAEMON", "1") != "0"
+            and os.path.exists(SOCKET_PATH))
+
+
+def code_stamp():
+    """Änderungszeiten der Dateien in CODE_FILES (None für fehlende Dateien)."""
+    stamp = []
+    for name in CODE_FILES:
+        try:
+            stamp.append(os.stat(os.path.join(SCRIPT_DIR, name)).st_mtime_ns)
+        except OSError:
+            stamp.append(None)
+    return tuple(stamp)
+
+
+def request(cmd, **params):
+    """
+    Schickt eine Anfrage an den Daemon.
+    Returns:
+        dict|None: Antwort des Daemons oder None, wenn kein Daemon erreichbar ist oder er mit
+        veraltetem Code läuft (dann wird seine Warnung ausgegeben)
+    """
+    if not enabled():
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(CONNECT_TIMEOUT)
+        sock.connect(SOCKET_PATH)
+        sock.settimeout(None)
+        sock.sendall(json.dumps({"cmd": cmd, **params}).encode("utf-8") + b"\n")
+        with sock.makefile("rb") as f:
+            line = f.readline()
+    except OSError:
+        return None
+    finally:
+        sock.close()
+    reply = json.loads(line) if line else None
+    if reply is not None and reply.get("stale"):
+        sys.stdout.write(reply["stdout"])
+        sys.stdout.flush()
+        return None
+    return reply
+
+
+def forward_patch_mac(mode, config_path, system_variant, loglevel="info"):
+    """
+    Führt patch_mac extract/patch im Daemon aus und gibt dessen Ausgabe aus.
+    Returns:
+        int|None: Exit-Code oder None, wenn kein Daemon erreichbar ist (dann selbst ausführen)
+    """
+    reply = request("patch_mac", mode=mode, config=os.path.abspath(config_path),
+                    variant=system_variant, base_dir=os.getcwd(), loglevel=loglevel)
+    if reply is None:
+        return None
+    sys.stdout.write(reply["stdout"])
+    sys.stdout.flush()
+    return reply["rc"]
+
+
+# --- Daemon ---
+
+class Caches:
+    """Alle Caches des Daemons (nur im Daemon-Prozess benutzt, Anfragen laufen nacheinander)."""
+
+    def __init__(self):
+        import patch_mac
+        self.patch_mac = patch_mac
+        patch_mac.MAC_CACHE = {}
+        self.mappings = {}
+        self.file_hashes = {}
+        self.artifacts = collections.OrderedDict()
+        self.stats = collections.Counter()
+        self.started = time.time()
+
+    def param_mappings(self, kconfig_path):
+        """Parametermappings aus Kconfig.system, neu eingelesen nur bei geänderter Datei."""
+        stat_key = self.patch_mac._stat_key(kconfig_path)
+        cached = self.mappings.get(kconfig_path)
+        if cached and cached[0] == stat_key:
+            self.stats["mappings_hit"] += 1
+            return cached[1]
+        self.stats["mappings_miss"] += 1
+        mappings = self.patch_mac.parse_kconfig_system(kconfig_path)
+        self.mappings[kconfig_path] = (stat_key, mappings)
+        return mappings
+
+    def file_hash(self, path):
+        """SHA1 einer Datei, neu berechnet nur bei geändertem Datum oder geänderter Größe."""
+        stat_key = self.patch_mac._stat_key(path)
+        cached = self.file_hashes.get(path)
+        if cached and cached[0] == stat_key:
+            return cached[1]
+        with open(path, "rb") as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+        self.file_hashes[path] = (stat_key, digest)
+        return digest
+
+    def artifact_key(self, cwd, output, inputs, tag):
+        """Schlüssel eines Artefakts: Ausgabename, Tag und Inhalt aller Eingabedateien."""
+        h = hashlib.sha1(f"{output}\n{tag}\n".encode("utf-8"))
+        for path in sorted(set(inputs)):
+            full = os.path.join(cwd, path)
+            h.update(f"{path} {self.file_hash(full)}\n".encode("utf-8"))
+        return h.hexdigest()
+
+    # Anfragen
+
+    def do_patch_mac(self, req):
+        base_dir = req["base_dir"]
+        kconfig_path = os.path.join(base_dir, "config", req["variant"], "Kconfig.system")
+        out = io.StringIO()
+        rc = 0
+        with contextlib.redirect_stdout(out):
+            try:
+                self.patch_mac.run(req["mode"], req["config"], req["variant"], base_dir=base_dir,
+                                   loglevel=req.get("loglevel", "info"),
+                                   param_mappings=self.param_mappings(kconfig_path))
+            except SystemExit as e:
+                rc = e.code if isinstance(e.code, int) else 1
+        self.stats["patch_mac"] += 1
+        return {"rc": rc, "stdout": out.getvalue()}
+
+    def do_fetch(self, req):
+        key = self.artifact_key(req["cwd"], req["output"], req["inputs"], req.get("tag", ""))
+        data = self.artifacts.get(key)
+        if data is None:
+            self.stats["artifact_miss"] += 1
+            return {"rc": 1, "stdout": ""}
+        self.artifacts.move_to_end(key)
+        output = os.path.join(req["cwd"], req["output"])
+        os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+        with open(output, "wb") as f:
+            f.write(data)
+        self.stats["artifact_hit"] += 1
+        return {"rc": 0, "stdout": ""}
+
+    def do_store(self, req):
+        key = self.artifact_key(req["cwd"], req["output"], req["inputs"], req.get("tag", ""))
+        with open(os.path.join(req["cwd"], req["output"]), "rb") as f:
+            self.artifacts[key] = f.read()
+        self.artifacts.move_to_end(key)
+        while len(self.artifacts) > MAX_ARTIFACTS:
+            self.artifacts.popitem(last=False)
+        self.stats["artifact_store"] += 1
+        return {"rc": 0, "stdout": ""}
+
+    def do_status(self, req):
+        lines = [
+            f"[INFO] Build-Daemon läuft seit {time.time() - self.started:.0f} s (PID {os.getpid()}, {SOCKET_PATH})",
+            f"[INFO] Kconfig.system: {len(self.mappings)}, *.mac: {len(self.patch_mac.MAC_CACHE)}, "
+            f"Dateihashes: {len(self.file_hashes)}, Artefakte: {len(self.artifacts)} "
+            f"({sum(len(a) for a in self.artifacts.values()) // 1024} KiB)",
+            "[INFO] Zähler: " + (", ".join(f"{k}={v}" for k, v in sorted(self.stats.items())) or "-"),
+        ]
+        return {"rc": 0, "stdout": "\n".join(lines) + "\n"}
+
+
+class Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        req = json.loads(line)
+        caches = self.server.caches
+        changed = [name for name, old, new in zip(CODE_FILES, self.server.code_stamp, code_stamp())
+                   if old != new]
+        if changed and req["cmd"] != "stop":
+            # Geladener Code veraltet: Aufrufer arbeitet selbst, Daemon startet neu (siehe serve)
+            reply = {"rc": 1, "stale": True,
+                     "stdout": f"[WARN] Build-Daemon: {', '.join(changed)} geändert, "
+                               "Anfrage läuft im eigenen Prozess, Daemon startet neu\n"}
+            self.server.restart = True
+            threading.Thread(target=self.server.shutdown).start()
+        elif req["cmd"] == "stop":
+            reply = {"rc": 0, "stdout": "[INFO] Build-Daemon beendet\n"}
+            threading.Thread(target=self.server.shutdown).start()
+        else:
+            handler = getattr(caches, f"do_{req['cmd']}", None)
+            if handler is None:
+                reply = {"rc": 1, "stdout": f"[FEHLER] Unbekannte Anfrage: {req['cmd']}\n"}
+            else:
+                try:
+                    reply = handler(req)
+                except Exception as e:
+                    reply = {"rc": 1, "stdout": f"[FEHLER] {type(e).__name__}: {e}\n"}
+        self.wfile.write(json.dumps(reply).encode("utf-8") + b"\n")
+
+
+def serve():
+    """
+    Betreibt den Daemon im Vordergrund, bis 'stop' empfangen wird. Hat sich der geladene Code
+    geändert, ersetzt sich der Prozess nach dem Beenden durch einen neuen Daemon.
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        print("[FEHLER] Unix-Sockets werden auf diesem System nicht unterstützt")
+        sys.exit(1)
+    if os.path.exists(SOCKET_PATH):
+        if request("status") is not None:
+            print(f"[FEHLER] Build-Daemon läuft bereits ({SOCKET_PATH})")
+            sys.exit(1)
+        os.unlink(SOCKET_PATH)  # Überrest eines abgebrochenen Daemons
+    server = socketserver.UnixStreamServer(SOCKET_PATH, Handler)
+    server.code_stamp = code_stamp()
+    server.restart = False
+    server.caches = Caches()
+    print(f"[INFO] Build-Daemon wartet auf {SOCKET_PATH} (PID {os.getpid()})", flush=True)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(SOCKET_PATH):
+            os.unlink(SOCKET_PATH)
+    if server.restart:
+        print("[INFO] Build-Daemon startet mit geändertem Code neu", flush=True)
+        os.execv(sys.executable, [sys.executable, os.path.abspath(__file__), "serve"])
+
+
+def start():
+    """Startet den Daemon als eigenen, vom Terminal gelösten Prozess und wartet, bis er antwortet."""
+    if request("status") is not None:
+        print(f"[INFO] Build-Daemon läuft bereits ({SOCKET_PATH})")
+        return
+    subprocess.Popen([sys.executable, os.path.abspath(__file__), "serve"], cwd=REPO_DIR,
+                     stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                     start_new_session=True)
+    deadline = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < deadline:
+        if request("status") is not None:
+            print(f"[INFO] Build-Daemon gestartet ({SOCKET_PATH})")
+            return
+        time.sleep(0.05)
+    print("[FEHLER] Build-Daemon antwortet nicht")
+    sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Optionaler Build-Daemon mit warmen Caches")
+    parser.add_argument("command", choices=["start", "serve", "stop", "status", "fetch", "store"])
+    parser.add_argument("output", nargs="?", help="Artefakt (fetch/store), relativ zum aktuellen Verzeichnis")
+    parser.add_argument("inputs", nargs="*", help="Eingabedateien des Artefakts (fetch/store)")
+    parser.add_argument("--tag", default="", help="Zusätzlicher Schlüsselteil, z.B. Diskettenformat (fetch/store)")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve()
+        return
+    if args.command == "start":
+        start()
+        return
+    if args.command in ("fetch", "store"):
+        if not args.output:
+            parser.error(f"{args.command} benötigt eine Ausgabedatei")
+        reply = request(args.command, cwd=os.getcwd(), output=args.output, inputs=args.inputs, tag=args.tag)
+        # Ohne Daemon: fetch ist ein Fehlschlag (Aufrufer baut selbst), store wird übersprungen
+        if reply is None:
+            sys.exit(1 if args.command == "fetch" else 0)
+        if args.command == "store":
+            sys.stdout.write(reply["stdout"])
+        sys.exit(reply["rc"])
+    reply = request(args.command)
+    if reply is None:
+        print(f"[INFO] Kein Build-Daemon erreichbar ({SOCKET_PATH})")
+        sys.exit(0 if args.command == "stop" else 1)
+    sys.stdout.write(reply["stdout"])
+    sys.exit(reply["rc"])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# Copyright (c) 2025 by olliy78
+# SPDX-License-Identifier: MIT
+"""
+Erkennt das Diskettenformat eines Images anhand der Einträge in diskdefs
+
+Für jedes Format aus diskdefs wird das Verzeichnis an der Stelle gelesen, an der es bei diesem
+Format liegen müsste (wie beim Auslesen nach cpa_formats.Registry.image_diskdef, also z.B. bei cpa780
+hinter den vorangestellten Bootspuren bzw. dem Bootsektor), und bewertet:
+    - belegte Einträge mit gültigem User-Byte, Dateinamen und Extent-/Satzzähler      (+)
+    - Blocknummern innerhalb der Diskette, außerhalb des Verzeichnisses, nicht doppelt (+)
+    - Satzanzahl passt zur Anzahl belegter Blöcke, Extents einer Datei lückenlos       (+)
+    - ungültige Einträge (Steuerzeichen im Namen, Blocknummer außerhalb, ...)          (-)
+    - Systemspuren mit Z80-Code am Anfang (Bootsektor) bzw. leer                      (+/-)
+    - Imagegröße passt genau zum Format                                               (+)
+Die Datei wird einmal in den Speicher abgebildet (mmap), alle Formate werden darauf bewertet.
+.cpz-Container (config/cpa_store.py) werden gelesen, ohne sie ganz zu entpacken.
+Erkannt ist ein Format nur, wenn es mehr als 0 Punkte erreicht. Liegen mehrere Formate mit der besten
+Punktzahl gleichauf, müssen sie das Image gleich auslesen (gleiche Lage von Verzeichnis und Blöcken);
+sonst gilt das Format als nicht erkannt und muss angegeben werden.
+
+HFE- und SCP-Dateien werden einmal dekodiert (config/cpa_flux.py, benötigt numpy); die gefundenen
+Sektor-IDs werden mit den Spuraufbauten aus cpaFormates.cfg verglichen, die passenden Formate
+anschließend wie oben über das Verzeichnis bewertet.
+
+Verwendung:
+    python cpa_detect.py <image> [<image> ...] [--diskdefs DATEI] [--cfg DATEI] [-v]
+
+Beispiele:
+    python config/cpa_detect.py Disketten/archiv01.img
+    python config/cpa_detect.py Disketten/*.img -v
+"""
+import os
+import sys
+import argparse
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPT_DIR)
+
+import cpa_formats
+import cpa_store
+from cpa_formats import DISKDEFS, GW_FORMATS, TRACK_DEFAULTS
+
+# Punkte je Merkmal
+SCORE_ENTRY = 3          # belegter Eintrag, Blöcke passen zur Satzanzahl
+SCORE_ENTRY_WEAK = 1     # belegter Eintrag, Blockanzahl weicht ab
+SCORE_FILE = 1           # Datei mit lückenloser Extent-Folge
+SCORE_BAD = -5           # ungültiger Eintrag
+SCORE_BOOT = 2           # Systemspuren beginnen mit Z80-Code
+SCORE_SIZE = 10          # Imagegröße passt genau
+# Typische erste Bytes eines Bootsektors: JP, JR, DI, LD SP,nn, LD HL,nn, XOR A
+BOOT_OPCODES = {0xC3, 0x18, 0xF3, 0x31, 0x21, 0xAF}
+# In CP/M-Dateinamen nicht erlaubte Zeichen
+BAD_NAME_CHARS = set(b'<>.,;:=?*[]"|')
+# Spuren, die beim Abgleich von HFE/SCP mit cpaFormates.cfg gelesen werden (bis 84 Zylinder)
+FLUX_CYLS = 84
+
+
+def valid_name(raw):
+    """Prüft Name (8) und Typ (3) eines Verzeichniseintrags; Leerzeichen nur als Auffüllung."""
+    for part in (raw[:8], raw[8:]):
+        text = part.rstrip(b" ")
+        if any(b <= 0x20 or b >= 0x7F or b in BAD_NAME_CHARS for b in text):
+            return False
+    return bool(raw[:8].rstrip(b" "))
+
+
+def score_diskdef(data, dd, boot=0):
+    """
+    Bewertet, wie gut Imagedaten zu einem diskdefs-Eintrag passen.
+    Args:
+        boot: Anzahl Bytes vor dem cpmtools-Image (Bootspuren bzw. Bootsektor)
+    Returns:
+        int oder None: Punktzahl, None wenn das Verzeichnis außerhalb der Daten läge
+    """
+    blocksize, maxdir = dd.blocksize, dd.maxdir
+    offset = boot + dd.directory_offset
+    if offset + maxdir * 32 > len(data):
+        return None
+    blocks_total, wide, dir_blocks = dd.blocks_total, dd.wide, dd.dir_blocks
+    exm = max(blocksize * (8 if wide else 16) // 16384 - 1, 0)
+
+    score = 0
+    seen = set()
+    extents = {}
+    directory = data[offset:offset + maxdir * 32]
+    for pos in range(0, maxdir * 32, 32):
+        entry = directory[pos:pos + 32]
+        user = entry[0]
+        if user == 0xE5 or user in (0x20, 0x21):  # frei, Disklabel/Zeitstempel (CP/M 3)
+            continue
+        name = bytes(b & 0x7F for b in entry[1:12])
+        if user > 15 or not valid_name(name) or entry[12] > 31 or entry[13] > 128 or entry[14] > 63 \
+                or entry[15] > 128:
+            score += SCORE_BAD
+            continue
+        if wide:
+            pointers = [entry[i] | entry[i + 1] << 8 for i in range(16, 32, 2)]
+        else:
+            pointers = list(entry[16:32])
+        used = [b for b in pointers if b]
+        if any(b < dir_blocks or b >= blocks_total for b in used) or len(set(used)) != len(used) \
+                or seen.intersection(used):
+            score += SCORE_BAD
+            continue
+        seen.update(used)
+        records = (entry[12] & exm) * 128 + entry[15]
+        expected = -(-records * 128 // blocksize)
+        score += SCORE_ENTRY if len(used) == expected else SCORE_ENTRY_WEAK
+        extents.setdefault((user, name), []).append((entry[12] + 32 * entry[14]) // (exm + 1))
+    for numbers in extents.values():
+        if sorted(numbers) == list(range(len(numbers))):
+            score += SCORE_FILE
+    if offset:
+        system = data[:offset]
+        if system[0] in BOOT_OPCODES:
+            score += SCORE_BOOT
+        elif system.count(system[:1]) == len(system):
+            score -= SCORE_BOOT
+    if len(data) == boot + dd.size:
+        score += SCORE_SIZE
+    return score
+
+
+def rank_formats(data, registry):
+    """
+    Bewertet alle Formate aus diskdefs, jedes an der Stelle, an der es ausgelesen würde.
+    Returns:
+        list: (Punktzahl, Name), bestes zuerst; bei Gleichstand in der Reihenfolge von diskdefs
+    """
+    scores = []
+    for n, name in enumerate(registry.diskdefs):
+        dd, boot = registry.image_diskdef(name, len(data))
+        score = score_diskdef(data, dd, boot)
+        if score is not None:
+            scores.append((score, -n, name))
+    scores.sort(reverse=True)
+    return [(score, name) for score, _, name in scores]
+
+
+def geometry(registry, name, size):
+    """
+    Lage von Verzeichnis und Blöcken eines Formats im Image. Formate mit gleicher Lage lesen dieselben
+    Daten (z.B. cpa800 und scpprg780, die sich nur in maxdir unterscheiden).
+    """
+    dd, boot = registry.image_diskdef(name, size)
+    return boot + dd.directory_offset, dd.seclen, dd.sectrk, dd.blocksize, tuple(dd.skew_table)
+
+
+def choose_format(ranking, registry, size=None):
+    """
+    Wählt das Format aus einer Rangliste.
+    Args:
+        size: Imagegröße; None bei HFE/SCP (das Image hat dort die Größe des Formats aus cpaFormates.cfg)
+    Returns:
+        str: Formatname
+    Raises:
+        ValueError: kein Format mit mehr als 0 Punkten oder mehrere gleichauf, die verschieden auslesen
+    """
+    if not ranking:
+        raise ValueError("kein passendes Format gefunden")
+    best, name = ranking[0]
+    if best <= 0:
+        raise ValueError(f"kein passendes Format gefunden (bestes: {name} mit {best} Punkten)")
+    tied = [n for score, n in ranking if score == best]
+    if len({geometry(registry, n, registry.gw[n].size if size is None else size) for n in tied}) > 1:
+        raise ValueError(f"Format nicht eindeutig: {', '.join(tied)} mit je {best} Punkten")
+    return name
+
+
+def detect_image(path, diskdefs=DISKDEFS, gw_formats=GW_FORMATS):
+    """
+    Erkennt das Format einer Image-Datei (.img u.ä., auch .cpz).
+    Returns:
+        tuple: (Liste (Punktzahl, Name) bestes zuerst, Imagegröße)
+    """
+    registry = cpa_formats.load(gw_formats, diskdefs)
+    with cpa_store.open_image(path) as data:
+        return (rank_formats(data, registry) if len(data) else []), len(data)
+
+
+def detect_flux(path, diskdefs=DISKDEFS, gw_formats=GW_FORMATS):
+    """
+    Erkennt das Format einer HFE- oder SCP-Datei und liefert die dekodierten Imagedaten dazu.
+    Zuerst wird einmal dekodiert und je Format aus cpaFormates.cfg gezählt, wie viele seiner Sektoren
+    gefunden wurden abzüglich der Sektoren, die es nicht erklärt. Die besten Spuraufbauten werden
+    dann über das Verzeichnis (diskdefs) unterschieden.
+    Returns:
+        tuple: (Liste (Punktzahl, Name) bestes zuerst, dict Name -> (Imagedaten, fehlende Sektoren))
+    """
+    import cpa_flux
+    cpa_flux.require_numpy()
+    registry = cpa_formats.load(gw_formats, diskdefs)
+    defs = registry.diskdefs
+    generic = {(c, h): dict(TRACK_DEFAULTS, secs=5, bps=1024) for c in range(FLUX_CYLS) for h in range(2)}
+    sectors = cpa_flux.decode_tracks(cpa_flux.read_flux(path, generic))
+    layouts = {}
+    for name, fmt in registry.gw.items():
+        if name not in defs:
+            continue
+        found = sum(1 for (c, h, r) in fmt.sector_offsets
+                    if len(sectors.get((c, h, r), b"")) == fmt.params(c, h)["bps"])
+        layouts[name] = (found - (len(sectors) - found), fmt)
+    if not layouts:
+        return [], {}
+    best = max(v[0] for v in layouts.values())
+    scores = []
+    images = {}
+    for n, (name, (match, fmt)) in enumerate(layouts.items()):
+        if match < best:
+            continue
+        data, missing = cpa_flux.assemble_image(sectors, fmt)
+        images[name] = (data, missing)
+        # Die Größe passt hier immer: das Image entsteht aus dem Spuraufbau selbst
+        dd, boot = registry.image_diskdef(name, len(data))
+        score = score_diskdef(data, dd, boot)
+        if score is not None:
+            scores.append((score, -n, name))
+    scores.sort(reverse=True)
+    return [(score, name) for score, _, name in scores], images
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Erkennt das Diskettenformat von Images anhand von diskdefs")
+    parser.add_argument("images", nargs="+", help="Image-Dateien (.img, .cpz, .hfe, .scp)")
+    parser.add_argument("--diskdefs", default=DISKDEFS, help="cpmtools-Formatdatei (Standard: diskdefs)")
+    parser.add_argument("--cfg", default=GW_FORMATS, help="Greaseweazle-Formatdatei (Standard: cpaFormates.cfg)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Punktzahlen aller Formate anzeigen")
+    args = parser.parse_args()
+
+    registry = cpa_formats.load(args.cfg, args.diskdefs)
+    failed = False
+    for path in args.images:
+        ranking = []
+        try:
+            if path.lower().endswith((".hfe", ".scp")):
+                ranking, _ = detect_flux(path, args.diskdefs, args.cfg)
+                size = None
+            else:
+                ranking, size = detect_image(path, args.diskdefs, args.cfg)
+            print(f"{path}: {choose_format(ranking, registry, size)}")
+        except (OSError, ValueError) as e:
+            print(f"[FEHLER] {path}: {e}")
+            failed = True
+        if args.verbose:
+            for score, name in ranking:
+                print(f"    {name:<20} {score:>5}")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+# Copyright (c) 2025 by olliy78
+# SPDX-License-Identifier: MIT
+"""
+Erzeugt das Diskettenimage build/cpadisk.img aus einer zwischengespeicherten Basisschicht
+
+Die Zusatzdateien aus additions/ und additions/<variante>/ ändern sich selten, @OS.COM dagegen bei
+jedem Build. Deshalb wird je (Format, Bootsektor, Zusatzdateien, Länge von @OS.COM) einmal eine
+Basisschicht erzeugt, genau so, wie das Makefile das Image bisher erzeugt hat:
+    1. leeres Image, mit E5h gefüllt (800K: pseudo-Bootblock am Anfang des Verzeichnisses)
+    2. Platzhalter für @OS.COM in der richtigen Länge mit cpmcp ins Image (800K: Spur 0 fixen)
+    3. alle Zusatzdateien mit cpmcp ins Image
+Die Basisschicht liegt in .cpa_cache/baseimage/ (bleibt bei make clean erhalten). Ein Build kopiert
+sie nur noch und schreibt den Inhalt von @OS.COM an die Stellen des Platzhalters; cpmcp legt eine
+Datei gleicher Länge immer gleich ab, das Ergebnis ist daher byte-gleich mit einem vollständigen Build.
+Beim 780K-Format wird wie bisher der Bootsektor vor das Image gesetzt.
+
+Mit --layout/--trace werden die Dateien der Basisschicht nach Schritt 3 neu angeordnet
+(config/cpa_layout.py): die bevorzugten Dateien liegen dann lückenlos direkt hinter @OS.COM auf den
+untersten Zylindern. @OS.COM selbst bleibt an seiner Stelle.
+
+diskdef und Größe des cpmtools-Images sowie die Länge der vorangestellten Bootspuren ergeben sich
+aus dem Formatregister (config/cpa_formats.py, build_diskdef): cpa780 -> cpa780_withoutBoot, 780K,
+15104 Bytes Bootspuren; cpa800 -> cpa800, 800K, ohne vorangestellte Bootspuren.
+
+Verwendung:
+    python cpa_diskimage.py <image> --os DATEI --format FORMAT [--diskdef DISKDEF] [--size KBYTE]
+                            [--bootsector DATEI] [--additions ORDNER ...] [--cpmcp PFAD] [--cpmls PFAD]
+                            [--layout DATEI] [--trace DATEI] [--no-cache]
+
+Beispiel (so ruft das Makefile das Skript auf):
+    python config/cpa_diskimage.py build/cpadisk.img --os build/@os.com --format cpa780 \\
+        --bootsector prebuilt/bc_a5120/bootsec.bin --additions additions/bc_a5120 additions \\
+        --layout config/disklayout.txt
+"""
+import os
+import sys
+import json
+import glob
+import hashlib
+import argparse
+import tempfile
+import subprocess
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, SCRIPT_DIR)
+
+import cpa_formats
+import cpa_layout
+from cpa_formats import DISKDEFS
+CACHE_DIR = os.path.join(REPO_DIR, ".cpa_cache", "baseimage")
+MAX_LAYERS = 16
+SYSTEMNAME = "@os.com"
+DEFAULT_CPMCP = os.path.join("tools", "cpmcp")
+DEFAULT_CPMLS = os.path.join("tools", "cpmls")
+
+
+# --- CP/M-Verzeichnis (cpmtools-Images ohne Skew) ---
+
+def read_diskdef(name, path=DISKDEFS):
+    """Eintrag aus der cpmtools-Datei diskdefs (cpa_formats.DiskDef, verhält sich wie ein dict)."""
+    return cpa_formats.load(diskdefs_path=path).diskdef(name)
+
+
+def image_diskdef(name, size, path=DISKDEFS):
+    """diskdef zum Lesen eines vollständigen Images im Format name (siehe cpa_formats.Registry.image_diskdef)."""
+    return cpa_formats.load(diskdefs_path=path).image_diskdef(name, size)
+
+
+def cpm_name(fname):
+    """Dateiname wie ihn cpmcp im Verzeichnis ablegt (8.3, Großbuchstaben)."""
+    name, _, ext = fname.upper().partition(".")
+    return name[:8], ext[:3]
+
+
+def directory_entries(directory, dd):
+    """
+    Liefert die belegten Verzeichniseinträge.
+    Yields:
+        tuple: (Position im Verzeichnis, User, (Name, Typ), Extent-Nummer, Liste der Blocknummern)
+    """
+    wide = dd.wide
+    for pos in range(0, len(directory), 32):
+        entry = directory[pos:pos + 32]
+        if entry[0] > 15:
+            continue
+        name = bytes(b & 0x7F for b in entry[1:9]).decode("ascii", "replace").rstrip()
+        ext = bytes(b & 0x7F for b in entry[9:12]).decode("ascii", "replace").rstrip()
+        if wide:
+            blocks = [entry[i] | entry[i + 1] << 8 for i in range(16, 32, 2)]
+        else:
+            blocks = list(entry[16:32])
+        yield pos, entry[0], (name, ext), entry[12] + 32 * entry[14], [b for b in blocks if b]
+
+
+def file_blocks(image_data, diskdef, fname):
+    """Blocknummern einer Datei (User 0) in Dateireihenfolge."""
+    dd = read_diskdef(diskdef)
+    offset = dd.directory_offset
+    directory = image_data[offset:offset + dd["maxdir"] * 32]
+    wanted = cpm_name(fname)
+    extents = sorted((extent, blocks) for _, user, name, extent, blocks in directory_entries(directory, dd)
+                     if user == 0 and name == wanted)
+    return [b for _, blocks in extents for b in blocks]
+
+
+def read_cpm_files(image_data, dd, user=0):
+    """
+    Liest alle Dateien eines Users direkt aus Imagedaten im Speicher (wie cpmcp, binär).
+    Die Länge ergibt sich aus dem letzten Extent: logische Extent-Nummer * 16K + Satzanzahl * 128;
+    enthält Byte 13 (wie von cpmtools geschrieben) die Bytes im letzten Satz, wird entsprechend gekürzt.
+    Returns:
+        list: (Dateiname wie cpmls ihn ausgibt, Inhalt) in Verzeichnisreihenfolge
+    """
+    offset = dd.directory_offset
+    directory = image_data[offset:offset + dd["maxdir"] * 32]
+    files = {}
+    for pos, entry_user, (name, ext), extent, blocks in directory_entries(directory, dd):
+        # Einträge ohne gültigen Namen (z.B. der pseudo-Bootblock der 800K-Disketten) überspringen
+        if entry_user == user and name and all(32 < ord(ch) < 127 for ch in name + ext):
+            files.setdefault((name, ext), []).append((extent, directory[pos + 15], directory[pos + 13], blocks))
+    result = []
+    for (name, ext), extents in files.items():
+        extents.sort()
+        last_extent, records, last_bytes, _ = extents[-1]
+        size = last_extent * 16384 + records * 128
+        if records and last_bytes:
+            size -= 128 - last_bytes
+        data = b"".join(dd.block(image_data, b) for _, _, _, blocks in extents for b in blocks)
+        fname = name.lower() + ("." + ext.lower() if ext else "")
+        result.append((fname, data[:size]))
+    return result
+
+
+def remove_cpm_files(image, diskdef, fnames):
+    """
+    Löscht Dateien aus einem cpmtools-Image (User 0), indem ihre Verzeichniseinträge als frei (E5h)
+    markiert werden. Die Belegung der Blöcke ergibt sich bei CP/M 2.2 allein aus dem Verzeichnis.
+    """
+    dd = read_diskdef(diskdef)
+    offset = dd.directory_offset
+    wanted = {cpm_name(f) for f in fnames}
+    removed = 0
+    with open(image, "r+b") as f:
+        f.seek(offset)
+        directory = bytearray(f.read(dd["maxdir"] * 32))
+        for pos, user, name, _, _ in list(directory_entries(directory, dd)):
+            if user == 0 and name in wanted:
+                directory[pos] = 0xE5
+                removed += 1
+        f.seek(offset)
+        f.write(directory)
+    return removed
+
+
+# --- Basisschicht ---
+
+def addition_files(additions_dirs):
+    """Zusatzdateien in der Reihenfolge, in der sie ins Image kopiert werden (wie im Makefile)."""
+    files = []
+    for d in additions_dirs:
+        if os.path.isdir(d):
+            files += [p for p in sorted(glob.glob(os.path.join(d, "*"))) if os.path.isfile(p)]
+    return files
+
+
+def layer_key(args, os_len, bootsector, additions):
+    """Schlüssel der Basisschicht: alles, was das Image außer dem Inhalt von @OS.COM bestimmt."""
+    h = hashlib.sha1(f"{args.format} {args.diskdef} {args.size} {os_len}\n".encode("utf-8"))
+    if args.hot:
+        h.update(("layout " + " ".join(args.hot) + "\n").encode("utf-8"))
+    if bootsector is not None and not args.boot:
+        h.update(b"boot " + hashlib.sha1(bootsector).digest())
+    for path in additions:
+        with open(path, "rb") as f:
+            h.update(f"{os.path.basename(path)} ".encode("utf-8") + hashlib.sha1(f.read()).digest())
+    with open(DISKDEFS, "rb") as f:
+        h.update(hashlib.sha1(f.read()).digest())
+    return h.hexdigest()
+
+
+def cpmcp(args, image, src, name, quiet=False):
+    """Kopiert eine Datei mit cpmcp ins Image (Fehler werden wie im Makefile nur ausgegeben)."""
+    out = subprocess.DEVNULL if quiet else None
+    return subprocess.run([args.cpmcp, "-f", args.diskdef, image, src, f"0:{name}"],
+                          stdout=out, stderr=out).returncode
+
+
+def build_layer_pass(args, os_data, bootsector, additions, workdir, quiet=False):
+    """
+    Erzeugt ein Image wie bisher das Makefile, mit os_data als Inhalt von @OS.COM.
+    Returns:
+        tuple: (Image-Daten ohne vorangestellten Bootsektor, Blocknummern von @OS.COM vor Schritt 2b)
+    """
+    def step(text):
+        if not quiet:
+            print(text)
+
+    image = os.path.join(workdir, "layer.img")
+    step(f"[STEP 1] Erzeuge leeres Basisimage (Groesse: {args.size}k, Format: {args.format})")
+    data = bytearray(b"\xe5" * (args.size * 1024))
+    if not args.boot:
+        step("[STEP 1b] Erzeuge pseudo-Bootblock am Anfang der Dateizuordnungstabelle")
+        data[0:32] = bootsector[0:32]
+    with open(image, "wb") as f:
+        f.write(data)
+    step("[STEP 2] Platzhalter fuer das CPA-System (@os.com) ins Basisimage")
+    placeholder = os.path.join(workdir, SYSTEMNAME)
+    with open(placeholder, "wb") as f:
+        f.write(os_data)
+    if cpmcp(args, image, placeholder, SYSTEMNAME, quiet) != 0:
+        raise RuntimeError("cpmcp fuer @os.com fehlgeschlagen")
+    with open(image, "rb") as f:
+        data = bytearray(f.read())
+    blocks = file_blocks(data, args.diskdef, SYSTEMNAME)
+    if not args.boot:
+        step("[STEP 2b] Fixe Spur 0 damit sie bootfaehig wird")
+        data[0:128] = bootsector[0:128]
+        with open(image, "wb") as f:
+            f.write(data)
+    step("[STEP 3] Kopiere Zusatzdateien ins Basisimage")
+    for path in additions:
+        step(f"  [ADD] {os.path.basename(path)}")
+        cpmcp(args, image, path, os.path.basename(path), quiet)
+    with open(image, "rb") as f:
+        data = f.read()
+    if args.hot:
+        dd = read_diskdef(args.diskdef)
+        data, order = cpa_layout.relayout(data, dd, args.hot, pinned=blocks,
+                                          protected=cpa_layout.protected_bytes(dd, args.boot))
+        step(f"[STEP 3b] Ordne {len(order)} Dateien an, bevorzugt: {', '.join(n for n in args.hot if n in order)}")
+    return bytes(data), blocks
+
+
+def build_layer(args, os_len, bootsector, additions, workdir):
+    """
+    Erzeugt die Basisschicht. Dazu wird das Image zweimal gebaut, mit einem Platzhalter aus 00h und
+    einem aus FFh. Genau die Bytes, in denen sich beide unterscheiden, stammen aus @OS.COM. Blöcke,
+    die nach Schritt 2b nicht mehr zu @OS.COM gehören (800K-Format mit großem @OS.COM), werden so
+    wie bisher von den Zusatzdateien überschrieben.
+    Returns:
+        tuple: (Image-Daten, Liste von [Position im Image, Position in @OS.COM, Länge])
+    """
+    data, blocks = build_layer_pass(args, bytes(os_len), bootsector, additions, workdir)
+    other, _ = build_layer_pass(args, b"\xff" * os_len, bootsector, additions, workdir, quiet=True)
+    dd = read_diskdef(args.diskdef)
+    base = dd.directory_offset
+    bs = dd["blocksize"]
+    ranges = []
+    for i, block in enumerate(blocks):
+        length = min(bs, os_len - i * bs)
+        if length <= 0:
+            break
+        start = base + block * bs
+        run = None
+        for j in range(length):
+            if data[start + j] != other[start + j]:
+                if run and run[0] + run[2] == start + j:
+                    run[2] += 1
+                else:
+                    run = [start + j, i * bs + j, 1]
+                    ranges.append(run)
+    return data, ranges
+
+
+def load_layer(key):
+    """Basisschicht aus dem Cache oder None."""
+    img_path = os.path.join(CACHE_DIR, key + ".img")
+    meta_path = os.path.join(CACHE_DIR, key + ".json")
+    if not (os.path.exists(img_path) and os.path.exists(meta_path)):
+        return None
+    with open(meta_path, encoding="utf-8") as f:
+        meta = json.load(f)
+    with open(img_path, "rb") as f:
+        data = f.read()
+    os.utime(img_path)  # zuletzt benutzt, für das Aufräumen
+    return data, meta["os_ranges"]
+
+
+def save_layer(key, data, ranges):
+    """Legt eine Basisschicht im Cache ab und entfernt die am längsten nicht benutzten."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(os.path.join(CACHE_DIR, key + ".img"), "wb") as f:
+        f.write(data)
+    with open(os.path.join(CACHE_DIR, key + ".json"), "w", encoding="utf-8") as f:
+        json.dump({"os_ranges": ranges}, f)
+    layers = sorted(glob.glob(os.path.join(CACHE_DIR, "*.img")), key=os.path.getmtime)
+    for old in layers[:-MAX_LAYERS]:
+        for path in (old, old[:-4] + ".json"):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def place_file(data, ranges, content):
+    """Schreibt den Inhalt von @OS.COM an die in der Basisschicht ermittelten Stellen."""
+    for image_pos, file_pos, length in ranges:
+        data[image_pos:image_pos + length] = content[file_pos:file_pos + length]
+
+
+def build_image(args):
+    with open(args.os, "rb") as f:
+        os_data = f.read()
+    bootsector = None
+    if args.bootsector and os.path.exists(args.bootsector):
+        with open(args.bootsector, "rb") as f:
+            bootsector = f.read()
+    if not args.boot and bootsector is None:
+        print(f"[FEHLER] Bootsektor {args.bootsector} nicht gefunden!")
+        sys.exit(1)
+    if args.boot and bootsector is not None and len(bootsector) != args.boot:
+        print(f"[WARN] Bootsektor {args.bootsector} hat {len(bootsector)} Bytes, "
+              f"Format {args.format} erwartet {args.boot} Bytes Bootspuren")
+    additions = addition_files(args.additions)
+
+    key = layer_key(args, len(os_data), bootsector, additions)
+    layer = None if args.no_cache else load_layer(key)
+    if layer is not None:
+        print(f"[STEP 1-3] Basisimage aus dem Cache (Format: {args.format}, {len(additions)} Zusatzdateien)")
+        data, ranges = layer
+    else:
+        with tempfile.TemporaryDirectory(prefix="cpa_diskimage_") as workdir:
+            data, ranges = build_layer(args, len(os_data), bootsector, additions, workdir)
+        if not args.no_cache:
+            save_layer(key, data, ranges)
+
+    print(f"[STEP 2] Schreibe CPA-System (@os.com) ins Image (Format: {args.format})")
+    data = bytearray(data)
+    place_file(data, ranges, os_data)
+
+    tmp_image = args.image + ".tmp"
+    with open(tmp_image, "wb") as f:
+        f.write(data)
+    print("[STEP 4] Zeige Dateien im Image:")
+    subprocess.run([args.cpmls, "-Ff", args.diskdef, tmp_image])
+    if args.boot:
+        if bootsector is not None:
+            print(f"[STEP 5] Fuege Bootsektor aus {args.bootsector} hinzu")
+            with open(args.image, "wb") as f:
+                f.write(bootsector + data)
+        else:
+            print(f"[WARNUNG] Bootsektor {args.bootsector} nicht gefunden!")
+    else:
+        print("[STEP 5] Bootsektor braucht nicht hinzugefuegt zu werden")
+        with open(args.image, "wb") as f:
+            f.write(data)
+    os.remove(tmp_image)
+    print(f"[DONE] Diskettenimage erstellt: {args.image}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Erzeugt das Diskettenimage aus einer zwischengespeicherten Basisschicht")
+    parser.add_argument("image", help="Ziel-Image (z.B. build/cpadisk.img)")
+    parser.add_argument("--os", required=True, help="Systemdatei @os.com")
+    parser.add_argument("--format", required=True, help="Diskettenformat (cpa780 oder cpa800)")
+    parser.add_argument("--diskdef", help="diskdef für cpmtools (Standard: aus dem Formatregister)")
+    parser.add_argument("--size", type=int, help="Größe des cpmtools-Images in KByte (Standard: aus der diskdef)")
+    parser.add_argument("--bootsector", help="Bootsektor (prebuilt/<variante>/bootsec.bin)")
+    parser.add_argument("--additions", nargs="*", default=[],
+                        help="Ordner mit Zusatzdateien in Kopier-Reihenfolge (Standard: keine)")
+    parser.add_argument("--cpmcp", default=DEFAULT_CPMCP, help="Pfad zu cpmcp")
+    parser.add_argument("--cpmls", default=DEFAULT_CPMLS, help="Pfad zu cpmls")
+    parser.add_argument("--layout", help="Prioritätsliste der Dateien (z.B. config/disklayout.txt, Standard: keine)")
+    parser.add_argument("--trace", help="Aufgezeichnete Zugriffsfolge, ordnet die Dateien nach Häufigkeit an")
+    parser.add_argument("--no-cache", action="store_true", help="Basisschicht nicht aus dem Cache nehmen/ablegen")
+    args = parser.parse_args()
+    if not os.path.exists(DISKDEFS):
+        print(f"[FEHLER] {DISKDEFS} nicht gefunden (im Hauptverzeichnis der Workbench starten)")
+        sys.exit(1)
+    try:
+        dd, args.boot = cpa_formats.load().build_diskdef(args.format)
+    except KeyError as e:
+        print(f"[FEHLER] {e.args[0]}")
+        sys.exit(1)
+    args.diskdef = args.diskdef or dd.name
+    args.size = args.size or dd.size // 1024
+    try:
+        args.hot = cpa_layout.hot_files(args.layout, args.trace)
+    except OSError as e:
+        print(f"[FEHLER] {e}")
+        sys.exit(1)
+    build_image(args)
+
+if __name__ == "__main__":
+    main()
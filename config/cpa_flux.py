@@ -0,0 +1,619 @@
+#!/usr/bin/env python3
+# Copyright (c) 2025 by olliy78
+# SPDX-License-Identifier: MIT
+"""
+Erzeugt HFE- und SCP-Images nativ aus einem Diskettenimage und liest sie zurück (ohne 'gw convert')
+
+Die Spuraufteilung stammt wie bei Greaseweazle aus cpaFormates.cfg, auch gemischte Spuren wie beim
+Format cpa780 (Bootspuren mit 26 x 128 Bytes, sonst 5 x 1024 Bytes). Jede Spur wird im IBM-MFM-Format
+aufgebaut (Gap 4a, Index-Marke, je Sektor ID-Feld und Datenfeld mit CRC, Gap 3, Auffüllen bis zum
+Spurende) und in Bitzellen umgesetzt. CRC und MFM-Taktbits werden mit NumPy für alle Sektoren bzw.
+Spuren gleichzeitig berechnet.
+
+Die Bitzellen jeder Spur werden in .cpa_cache/flux/ abgelegt (Schlüssel: Spurinhalt und -parameter).
+HFE und SCP werden aus denselben Bitzellen geschrieben; geänderte Images kodieren nur geänderte Spuren
+neu, ein zweites Ausgabeformat kostet keine weitere Kodierung.
+
+Beim Dekodieren werden HFE-Bitzellen direkt, SCP-Flussdaten über einen Bit-Slicer mit nachgeführtem
+Takt (gleitendes Mittel der Zellenlänge, mit NumPy über alle Flusswechsel) in Bitzellen umgesetzt.
+Alle ID- und Datenfelder werden per CRC geprüft; bei SCP mit mehreren Umdrehungen zählt das erste
+fehlerfreie Exemplar eines Sektors. Das Ergebnis entspricht einer mit 'gw convert' erzeugten .img-Datei.
+
+Voraussetzung: numpy (pip install numpy). Ohne numpy verwendet das Makefile automatisch gw convert.
+
+Verwendung:
+    python cpa_flux.py encode <image> --format FORMAT [--diskdefs DATEI] [--hfe DATEI] [--scp DATEI]
+                              [--no-cache]
+    python cpa_flux.py decode <hfe|scp> <image> --format FORMAT [--diskdefs DATEI]
+
+Beispiele:
+    python config/cpa_flux.py encode build/cpadisk.img --format cpa780 --hfe build/cpadisk.hfe
+    python config/cpa_flux.py encode build/cpadisk.img --format cpa800 --hfe out.hfe --scp out.scp
+    python config/cpa_flux.py decode Disketten/archiv.scp archiv.img --format cpa800
+"""
+import os
+import sys
+import glob
+import json
+import struct
+import hashlib
+import argparse
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, SCRIPT_DIR)
+
+import cpa_formats
+from cpa_formats import GW_FORMATS as DEFAULT_DISKDEFS
+
+CACHE_DIR = os.path.join(REPO_DIR, ".cpa_cache", "flux")
+MAX_TRACKS = 4096
+# Wird erhöht, wenn sich die Kodierung ändert (alte Einträge im Cache gelten dann nicht mehr)
+ENCODING_VERSION = 2
+
+# IBM-MFM Spuraufbau (Längen in Bytes), Gap 3 wie bei Greaseweazle nach Sektorgrößen-Code N
+GAP4A, GAP1, GAP2, SYNC = 80, 50, 22, 12
+GAP3_DEFAULT = (32, 54, 84, 116, 255, 255, 255, 255)
+GAP3_MIN = 8
+GAP_BYTE = 0x4E
+RATES = (250, 500, 1000)
+# Marken mit fehlendem Taktbit: A1h vor ID-/Datenfeld, C2h vor der Index-Marke
+MARK_A1, MARK_C2 = 1, 2
+MARK_CELLS = {MARK_A1: 0x4489, MARK_C2: 0x5224}
+
+# HFE: Kodierung ISOIBM_MFM, Laufwerksmodus GENERIC_SHUGART_DD
+HFE_ENCODING_MFM = 0x00
+HFE_INTERFACE_SHUGART_DD = 0x07
+# SCP: Auflösung 25 ns, Disktyp "other", Flags: Index-ausgerichtet, 96 tpi, erzeugte (nicht gelesene) Daten
+SCP_TICK_NS = 25
+SCP_DISK_TYPE = 0x80
+SCP_FLAGS = 0x01 | 0x02 | 0x08
+SCP_TRACK_ENTRIES = 168
+# Bit-Slicer beim Dekodieren: Fenster (Flusswechsel) und erlaubte Abweichung der Zellenlänge
+PLL_WINDOW = 32
+PLL_RANGE = 0.15
+PLL_ROUNDS = 2
+
+
+def require_numpy():
+    if np is None:
+        print("[FEHLER] cpa_flux.py benötigt numpy (pip install numpy), alternativ im Makefile FLUX_ENCODER=gw")
+        sys.exit(1)
+
+
+def size_code(bps):
+    """Sektorgrößen-Code N des ID-Felds (128 << N Bytes)."""
+    return (bps // 128).bit_length() - 1
+
+
+def sector_order(secs, interleave):
+    """Sektor-Indizes in der Reihenfolge, in der sie auf der Spur liegen."""
+    slots = [None] * secs
+    pos = 0
+    for i in range(secs):
+        while slots[pos] is not None:
+            pos = (pos + 1) % secs
+        slots[pos] = i
+        pos = (pos + interleave) % secs
+    return slots
+
+
+def track_geometry(params):
+    """
+    Datenrate, Gap 3 und Spurlänge in MFM-Bytes einer Spur. Ohne Angabe in cpaFormates.cfg wird Gap 3
+    so weit verkleinert (mindestens GAP3_MIN), dass die Sektoren bei der kleinsten Datenrate auf die
+    Spur passen; erst wenn das nicht reicht, wird die nächsthöhere Datenrate gewählt.
+    Returns:
+        tuple: (Datenrate in kbit/s, Gap 3, MFM-Bytes pro Umdrehung)
+    """
+    secs, bps = params["secs"], params["bps"]
+    fixed = GAP4A + SYNC + 4 + GAP1 + secs * (SYNC + 8 + 2 + GAP2 + SYNC + 4 + bps + 2)
+    for rate in ([params["rate"]] if params["rate"] else RATES):
+        nbytes = rate * 1000 * 60 // params["rpm"] // 8
+        room = (nbytes - fixed) // secs
+        if params["gap3"] is not None:
+            if room >= params["gap3"]:
+                return rate, params["gap3"], nbytes
+        elif room >= GAP3_MIN:
+            return rate, min(GAP3_DEFAULT[size_code(bps)], room), nbytes
+    raise ValueError(f"{secs} x {bps} Bytes passen nicht auf eine Spur")
+
+
+def crc16_table():
+    table = []
+    for i in range(256):
+        crc = i << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021 if crc & 0x8000 else crc << 1) & 0xFFFF
+        table.append(crc)
+    return np.array(table, dtype=np.uint16)
+
+
+_CRC_TABLE = None
+
+
+def crc16_rows(rows):
+    """
+    CRC-CCITT (Startwert FFFFh) jeder Zeile einer 2D-Bytematrix. Die Schleife läuft über die Spalten,
+    alle Zeilen (Sektoren) werden gleichzeitig berechnet.
+    """
+    global _CRC_TABLE
+    if _CRC_TABLE is None:
+        _CRC_TABLE = crc16_table()
+    crc = np.full(rows.shape[0], 0xFFFF, dtype=np.uint16)
+    for col in rows.T:
+        crc = (crc << 8) ^ _CRC_TABLE[(crc >> 8) ^ col]
+    return crc
+
+
+def mfm_encode(raw, marks):
+    """
+    MFM-Bitzellen für mehrere gleich lange Spuren.
+    Args:
+        raw: 2D uint8 (Spuren x Bytes)
+        marks: gleich große Matrix, MARK_A1/MARK_C2 für Marken mit fehlendem Taktbit
+    Returns:
+        2D uint8: gepackte Bitzellen (Spuren x 2 * Bytes), höchstwertiges Bit zuerst
+    """
+    bits = np.unpackbits(raw, axis=1)
+    prev = np.zeros_like(bits)
+    prev[:, 1:] = bits[:, :-1]
+    cells = np.empty((bits.shape[0], bits.shape[1] * 2), dtype=np.uint8)
+    cells[:, 0::2] = 1 - (bits | prev)
+    cells[:, 1::2] = bits
+    cells = cells.reshape(raw.shape[0], raw.shape[1], 16)
+    for kind, pattern in MARK_CELLS.items():
+        cells[marks == kind] = np.unpackbits(np.array([pattern >> 8, pattern & 0xFF], dtype=np.uint8))
+    return np.packbits(cells.reshape(raw.shape[0], -1), axis=1)
+
+
+def encode_tracks(jobs):
+    """
+    Kodiert Spuren in MFM-Bitzellen.
+    Args:
+        jobs: Liste von (Spurparameter, Zylinder, Kopf, Sektordaten in ID-Reihenfolge)
+    Returns:
+        list: je Spur (Datenrate, Umdrehungen/min, gepackte Bitzellen als bytes)
+    """
+    # Alle ID- und Datenfelder sammeln, damit die CRCs in wenigen Matrix-Durchläufen entstehen
+    plans = []
+    id_rows = []
+    data_rows = {}
+    for params, cyl, head, data in jobs:
+        bps = params["bps"]
+        rate, gap3, nbytes = track_geometry(params)
+        sectors = []
+        for idx in sector_order(params["secs"], params["interleave"]):
+            rid = (params["id"] + idx) & 0xFF
+            id_rows.append(bytes((0xA1, 0xA1, 0xA1, 0xFE, cyl, head, rid, size_code(bps))))
+            rows = data_rows.setdefault(bps, [])
+            rows.append(b"\xA1\xA1\xA1\xFB" + data[idx * bps:(idx + 1) * bps])
+            sectors.append((len(id_rows) - 1, len(rows) - 1))
+        plans.append((params, rate, gap3, nbytes, sectors))
+    id_matrix = np.frombuffer(b"".join(id_rows), dtype=np.uint8).reshape(-1, 8)
+    id_crc = crc16_rows(id_matrix)
+    data_matrix = {bps: np.frombuffer(b"".join(rows), dtype=np.uint8).reshape(len(rows), -1)
+                   for bps, rows in data_rows.items()}
+    data_crc = {bps: crc16_rows(m) for bps, m in data_matrix.items()}
+
+    # Spuren als MFM-Bytes aufbauen, gleich lange Spuren gemeinsam in Bitzellen umsetzen
+    by_len = {}
+    for n, (params, rate, gap3, nbytes, sectors) in enumerate(plans):
+        raw = np.full(nbytes, GAP_BYTE, dtype=np.uint8)
+        marks = np.zeros(nbytes, dtype=np.uint8)
+        pos = GAP4A
+        raw[pos:pos + SYNC] = 0
+        pos += SYNC
+        raw[pos:pos + 4] = (0xC2, 0xC2, 0xC2, 0xFC)
+        marks[pos:pos + 3] = MARK_C2
+        pos += 4 + GAP1
+        matrix = data_matrix[params["bps"]]
+        crcs = data_crc[params["bps"]]
+        for id_row, data_row in sectors:
+            for row, crc, gap in ((id_matrix[id_row], id_crc[id_row], GAP2),
+                                  (matrix[data_row], crcs[data_row], gap3)):
+                raw[pos:pos + SYNC] = 0
+                pos += SYNC
+                raw[pos:pos + len(row)] = row
+                marks[pos:pos + 3] = MARK_A1
+                pos += len(row)
+                raw[pos:pos + 2] = (int(crc) >> 8, int(crc) & 0xFF)
+                pos += 2 + gap
+        by_len.setdefault(nbytes, []).append((n, raw, marks))
+    results = [None] * len(jobs)
+    for group in by_len.values():
+        cells = mfm_encode(np.stack([g[1] for g in group]), np.stack([g[2] for g in group]))
+        for (n, _, _), row in zip(group, cells):
+            results[n] = (plans[n][1], plans[n][0]["rpm"], row.tobytes())
+    return results
+
+
+def track_key(params, cyl, head, data):
+    h = hashlib.sha1(json.dumps([ENCODING_VERSION, cyl, head, sorted(params.items())]).encode())
+    h.update(data)
+    return h.hexdigest()
+
+
+def load_track(key):
+    """Bitzellen einer Spur aus dem Cache oder None."""
+    path = os.path.join(CACHE_DIR, key + ".bin")
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        meta = json.loads(f.readline())
+        cells = f.read()
+    os.utime(path)  # zuletzt benutzt, für das Aufräumen
+    return meta["rate"], meta["rpm"], cells
+
+
+def save_tracks(entries):
+    """Legt kodierte Spuren im Cache ab und entfernt die am längsten nicht benutzten."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    for key, (rate, rpm, cells) in entries.items():
+        with open(os.path.join(CACHE_DIR, key + ".bin"), "wb") as f:
+            f.write(json.dumps({"rate": rate, "rpm": rpm}).encode() + b"\n")
+            f.write(cells)
+    tracks = sorted(glob.glob(os.path.join(CACHE_DIR, "*.bin")), key=os.path.getmtime)
+    for old in tracks[:-MAX_TRACKS]:
+        os.remove(old)
+
+
+def encode_image(image, fmt, diskdefs=DEFAULT_DISKDEFS, use_cache=True):
+    """
+    Zerlegt ein Diskettenimage nach cpaFormates.cfg in Spuren und kodiert sie (mit Cache).
+    Returns:
+        tuple: (Zylinder, Köpfe, dict (Zylinder, Kopf) -> (Datenrate, Umdrehungen/min, gepackte Bitzellen))
+    """
+    with open(image, "rb") as f:
+        return encode_data(f.read(), cpa_formats.load(diskdefs).gw_format(fmt), use_cache)
+
+
+def encode_data(data, gw_format, use_cache=True):
+    """Wie encode_image, für Imagedaten im Speicher und einen Spuraufbau (cpa_formats.GwFormat)."""
+    if gw_format.size != len(data):
+        raise ValueError(f"Imagegröße {len(data)} passt nicht zum Format {gw_format.name} "
+                         f"({gw_format.size} Bytes)")
+    tracks = {}
+    jobs = []
+    keys = []
+    for c, h in gw_format.tracks:
+        params = gw_format.params(c, h)
+        track_data = gw_format.track(data, c, h)
+        key = track_key(params, c, h, track_data)
+        cached = load_track(key) if use_cache else None
+        if cached:
+            tracks[(c, h)] = cached
+        else:
+            jobs.append((params, c, h, track_data))
+            keys.append(key)
+    if jobs:
+        encoded = encode_tracks(jobs)
+        for (_, c, h, _), result in zip(jobs, encoded):
+            tracks[(c, h)] = result
+        if use_cache:
+            save_tracks(dict(zip(keys, encoded)))
+    print(f"[INFO] {len(tracks)} Spuren, {len(jobs)} neu kodiert, {len(tracks) - len(jobs)} aus dem Cache")
+    return gw_format.cyls, gw_format.heads, tracks
+
+
+def write_hfe(path, cyls, heads, tracks):
+    """Schreibt Bitzellen als HFE (Version 1): je Zylinder abwechselnd 256 Bytes Kopf 0 und Kopf 1."""
+    rates = {t[0] for t in tracks.values()}
+    rpms = {t[1] for t in tracks.values()}
+    if len(rates) != 1:
+        raise ValueError(f"HFE erlaubt nur eine Datenrate, Format hat {sorted(rates)}")
+    reverse = np.array([int(f"{i:08b}"[::-1], 2) for i in range(256)], dtype=np.uint8)
+    header = struct.pack("<8sBBBBHHBBHBBBBBB", b"HXCPICFE", 0, cyls, heads, HFE_ENCODING_MFM,
+                         rates.pop(), rpms.pop() if len(rpms) == 1 else 0, HFE_INTERFACE_SHUGART_DD,
+                         0, 1, 0xFF, 0xFF, 0xFF, HFE_ENCODING_MFM, 0xFF, HFE_ENCODING_MFM)
+    out = bytearray(header.ljust(512, b"\xFF"))
+    table_blocks = (cyls * 4 + 511) // 512
+    out += b"\xFF" * (table_blocks * 512)
+    for c in range(cyls):
+        # HFE speichert das erste Bit im niederwertigsten Bit jedes Bytes
+        sides = [reverse[np.frombuffer(tracks[(c, h)][2], dtype=np.uint8)] if h < heads else None
+                 for h in range(2)]
+        side_len = len(sides[0])
+        chunks = (side_len + 255) // 256
+        block = np.zeros((chunks, 2, 256), dtype=np.uint8)
+        for h, side in enumerate(sides):
+            if side is not None:
+                padded = np.zeros(chunks * 256, dtype=np.uint8)
+                padded[:len(side)] = side
+                block[:, h, :] = padded.reshape(chunks, 256)
+        struct.pack_into("<HH", out, 512 + c * 4, len(out) // 512, side_len * 2)
+        out += block.tobytes()
+        out += b"\x00" * (-len(out) % 512)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def write_scp(path, cyls, heads, tracks):
+    """Schreibt Bitzellen als SCP-Flussdaten (eine Umdrehung je Spur, 25 ns Auflösung)."""
+    entries = [0] * SCP_TRACK_ENTRIES
+    body = bytearray()
+    data_start = 16 + SCP_TRACK_ENTRIES * 4
+    for c in range(cyls):
+        for h in range(heads):
+            rate, rpm, packed = tracks[(c, h)]
+            cells = np.unpackbits(np.frombuffer(packed, dtype=np.uint8))
+            ticks_per_cell = 1_000_000 // (rate * 2) // SCP_TICK_NS
+            times = (np.flatnonzero(cells) + 1) * ticks_per_cell
+            flux = np.diff(times, prepend=0).astype(">u2")
+            number = c * 2 + h
+            entries[number] = data_start + len(body)
+            index_time = len(cells) * ticks_per_cell
+            body += b"TRK" + bytes((number,)) + struct.pack("<III", index_time, len(flux), 16)
+            body += flux.tobytes()
+    last = max(n for n, off in enumerate(entries) if off)
+    rest = struct.pack(f"<{SCP_TRACK_ENTRIES}I", *entries) + bytes(body)
+    checksum = int(np.frombuffer(rest, dtype=np.uint8).sum(dtype=np.uint64)) & 0xFFFFFFFF
+    header = struct.pack("<3sBBBBBBBBBI", b"SCP", 0, SCP_DISK_TYPE, 1, 0, last, SCP_FLAGS, 0,
+                         0 if heads == 2 else 1, 0, checksum)
+    with open(path, "wb") as f:
+        f.write(header + rest)
+
+
+# --- Dekodieren ---
+
+def read_hfe(path):
+    """
+    Liest die Bitzellen aller Spuren einer HFE-Datei (Version 1).
+    Returns:
+        dict: (Zylinder, Kopf) -> Liste mit einem Bitzellen-Array (0/1)
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:8] != b"HXCPICFE":
+        raise ValueError(f"{path} ist keine HFE-Datei (Version 1)")
+    _, _, cyls, heads, _, _, _, _, _, table = struct.unpack_from("<8sBBBBHHBBH", data)
+    reverse = np.array([int(f"{i:08b}"[::-1], 2) for i in range(256)], dtype=np.uint8)
+    tracks = {}
+    for c in range(cyls):
+        offset, length = struct.unpack_from("<HH", data, table * 512 + c * 4)
+        chunks = (length + 511) // 512
+        block = np.frombuffer(data, dtype=np.uint8, count=chunks * 512, offset=offset * 512).reshape(chunks, 2, 256)
+        for h in range(heads):
+            side = block[:, h, :].reshape(-1)[:length // 2]
+            tracks[(c, h)] = [np.unpackbits(reverse[side])]
+    return tracks
+
+
+def flux_to_cells(flux, cell):
+    """
+    Bit-Slicer mit nachgeführtem Takt: jedes Flusswechsel-Intervall wird in eine ganze Zahl von
+    Bitzellen gerundet. Die Zellenlänge folgt dabei dem gleitenden Mittel über PLL_WINDOW Intervalle
+    (Drehzahlschwankungen), begrenzt auf PLL_RANGE um den Nennwert.
+    Args:
+        flux: Intervalle zwischen Flusswechseln in Ticks
+        cell: Nenn-Zellenlänge in Ticks
+    Returns:
+        np.ndarray: Bitzellen (0/1)
+    """
+    flux = flux.astype(np.float64)
+    n = np.maximum(np.rint(flux / cell), 1)
+    for _ in range(PLL_ROUNDS):
+        est = np.pad(flux / n, (PLL_WINDOW // 2, PLL_WINDOW - PLL_WINDOW // 2), mode="edge")
+        total = np.concatenate(([0.0], np.cumsum(est)))
+        local = (total[PLL_WINDOW:PLL_WINDOW + len(flux)] - total[:len(flux)]) / PLL_WINDOW
+        local = np.clip(local, cell * (1 - PLL_RANGE), cell * (1 + PLL_RANGE))
+        n = np.maximum(np.rint(flux / local), 1)
+    positions = np.cumsum(n.astype(np.int64)) - 1
+    cells = np.zeros(int(positions[-1]) + 1 if len(positions) else 0, dtype=np.uint8)
+    cells[positions] = 1
+    return cells
+
+
+def read_scp(path, layout):
+    """
+    Liest die Flussdaten aller Umdrehungen einer SCP-Datei und setzt sie in Bitzellen um.
+    Die Nenn-Zellenlänge ergibt sich aus der Datenrate der Spur laut cpaFormates.cfg.
+    Returns:
+        dict: (Zylinder, Kopf) -> Liste der Bitzellen-Arrays (je Umdrehung eines)
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:3] != b"SCP":
+        raise ValueError(f"{path} ist keine SCP-Datei")
+    revs, _, _, _, cell_width, _, resolution = struct.unpack_from("<BBBBBBB", data, 5)
+    if cell_width not in (0, 16):
+        raise ValueError(f"SCP mit {cell_width}-Bit-Zellen wird nicht unterstützt")
+    tick_ns = SCP_TICK_NS * (resolution + 1)
+    offsets = struct.unpack_from(f"<{SCP_TRACK_ENTRIES}I", data, 16)
+    tracks = {}
+    for (c, h), params in layout.items():
+        number = c * 2 + h
+        if number >= SCP_TRACK_ENTRIES:
+            continue
+        offset = offsets[number]
+        if not offset or data[offset:offset + 3] != b"TRK":
+            continue
+        cell = 1_000_000 / (track_geometry(params)[0] * 2) / tick_ns
+        tracks[(c, h)] = []
+        for r in range(revs):
+            _, count, start = struct.unpack_from("<III", data, offset + 4 + r * 12)
+            values = np.frombuffer(data, dtype=">u2", count=count, offset=offset + start).astype(np.int64)
+            # 0 bedeutet Überlauf: 65536 Ticks ohne Flusswechsel, zum nächsten Intervall addieren
+            times = np.cumsum(np.where(values == 0, 65536, values))[values != 0]
+            tracks[(c, h)].append(flux_to_cells(np.diff(times, prepend=0), cell))
+    return tracks
+
+
+def field_bytes(cells, starts, count):
+    """
+    Liest ab den Zellpositionen starts je count MFM-Bytes (nur die Datenbits, jedes zweite Zelle).
+    Returns:
+        2D uint8: eine Zeile je Startposition
+    """
+    index = starts[:, None] + np.arange(count * 16)[None, :]
+    bits = cells[index].reshape(len(starts), count, 16)[:, :, 1::2]
+    return np.packbits(bits, axis=2).reshape(len(starts), count)
+
+
+def find_fields(cells):
+    """
+    Sucht alle ID- und Datenfelder einer Spur (drei A1h-Marken mit fehlendem Taktbit).
+    Returns:
+        tuple: (Zellpositionen nach den Marken, Marken-Bytes FEh/FBh/F8h)
+    """
+    if len(cells) < 64:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.uint8)
+    # 16-Bit-Wort ab jeder Zellposition, daraus die Positionen von drei aufeinanderfolgenden A1h-Marken
+    count = len(cells) - 15
+    words = np.zeros(count, dtype=np.uint16)
+    for k in range(16):
+        words |= cells[k:k + count].astype(np.uint16) << (15 - k)
+    sync = words == MARK_CELLS[MARK_A1]
+    starts = np.flatnonzero(sync[:-32] & sync[16:-16] & sync[32:]) + 48
+    starts = starts[starts + 16 <= len(cells)]
+    marks = field_bytes(cells, starts, 1)[:, 0]
+    return starts, marks
+
+
+def decode_tracks(tracks):
+    """
+    Dekodiert die Sektoren aller Spuren. Die CRC aller ID-Felder bzw. aller Datenfelder gleicher Größe
+    wird gemeinsam geprüft; je Sektor gilt das erste Datenfeld mit korrekter CRC.
+    Returns:
+        dict: (Zylinder, Kopf, Sektor-ID) -> Sektordaten
+    """
+    id_rows = []
+    id_owner = []
+    data_rows = {}
+    for (c, h), revolutions in tracks.items():
+        for cells in revolutions:
+            starts, marks = find_fields(cells)
+            ids = starts[marks == 0xFE]
+            ids = ids[ids + 7 * 16 <= len(cells)]
+            if not len(ids):
+                continue
+            id_fields = field_bytes(cells, ids, 7)
+            for pos, field in zip(ids, id_fields):
+                id_rows.append(b"\xA1\xA1\xA1" + field.tobytes())
+                id_owner.append((c, h, pos))
+            # Datenfeld: nächste Datenmarke nach einem ID-Feld, vor dem nächsten ID-Feld
+            data_starts = starts[(marks == 0xFB) | (marks == 0xF8)]
+            following = np.searchsorted(data_starts, ids)
+            for n, k in enumerate(following):
+                if k == len(data_starts) or (n + 1 < len(ids) and data_starts[k] > ids[n + 1]):
+                    continue
+                size = 128 << int(id_fields[n][4] & 7)
+                if data_starts[k] + (size + 3) * 16 > len(cells):
+                    continue
+                row = field_bytes(cells, data_starts[k:k + 1], size + 3)[0]
+                data_rows.setdefault(size, []).append((len(id_rows) - len(ids) + n, row))
+    if not id_rows:
+        return {}
+    # CRC über Marken, Feld und CRC selbst ist bei fehlerfreien Feldern 0
+    id_ok = crc16_rows(np.frombuffer(b"".join(id_rows), dtype=np.uint8).reshape(-1, 10)) == 0
+    sectors = {}
+    for size, rows in data_rows.items():
+        matrix = np.stack([np.concatenate((np.full(3, 0xA1, dtype=np.uint8), row)) for _, row in rows])
+        data_ok = crc16_rows(matrix) == 0
+        for (owner, row), ok in zip(rows, data_ok):
+            if not (ok and id_ok[owner]):
+                continue
+            c, h, _ = id_owner[owner]
+            key = (c, h, id_rows[owner][6])
+            sectors.setdefault(key, row[1:size + 1].tobytes())
+    return sectors
+
+
+def read_flux(path, layout):
+    """Bitzellen aller Spuren einer HFE- oder SCP-Datei (siehe read_hfe, read_scp)."""
+    if path.lower().endswith(".hfe"):
+        return read_hfe(path)
+    if path.lower().endswith(".scp"):
+        return read_scp(path, layout)
+    raise ValueError(f"{path}: nur .hfe und .scp können dekodiert werden")
+
+
+def assemble_image(sectors, gw_format):
+    """
+    Setzt dekodierte Sektoren nach einem Spuraufbau (cpa_formats.GwFormat) zu Imagedaten zusammen;
+    fehlende Sektoren bleiben mit Nullen gefüllt.
+    Returns:
+        tuple: (Imagedaten, Liste der fehlenden Sektoren als "Zylinder.Kopf.Sektor")
+    """
+    out = bytearray(gw_format.size)
+    missing = []
+    for (c, h, rid), pos in gw_format.sector_offsets.items():
+        bps = gw_format.params(c, h)["bps"]
+        data = sectors.get((c, h, rid))
+        if data is None or len(data) != bps:
+            missing.append(f"{c}.{h}.{rid}")
+        else:
+            out[pos:pos + bps] = data
+    return bytes(out), missing
+
+
+def report_missing(missing):
+    if missing:
+        print(f"[WARN] {len(missing)} Sektor(en) nicht lesbar (Zylinder.Kopf.Sektor): {', '.join(missing[:20])}"
+              f"{' ...' if len(missing) > 20 else ''}")
+
+
+def decode_image(path, fmt, diskdefs=DEFAULT_DISKDEFS):
+    """
+    Dekodiert eine HFE- oder SCP-Datei nach dem Spuraufbau aus cpaFormates.cfg in ein Diskettenimage
+    im Speicher (gleicher Aufbau wie eine mit 'gw convert' erzeugte .img-Datei). Unlesbare Sektoren
+    werden mit Nullen gefüllt und gemeldet.
+    Returns:
+        bytes: Imagedaten
+    """
+    gw_format = cpa_formats.load(diskdefs).gw_format(fmt)
+    data, missing = assemble_image(decode_tracks(read_flux(path, gw_format.layout)), gw_format)
+    report_missing(missing)
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Erzeugt und liest HFE- und SCP-Images ohne gw convert")
+    sub = parser.add_subparsers(dest="command", required=True)
+    enc = sub.add_parser("encode", help="IMG nach HFE und/oder SCP")
+    enc.add_argument("image", help="Diskettenimage (z.B. build/cpadisk.img)")
+    enc.add_argument("--format", required=True, help="Format aus cpaFormates.cfg (z.B. cpa780)")
+    enc.add_argument("--diskdefs", default=DEFAULT_DISKDEFS, help="Formatdatei (Standard: cpaFormates.cfg)")
+    enc.add_argument("--hfe", help="HFE-Datei schreiben")
+    enc.add_argument("--scp", help="SCP-Datei schreiben")
+    enc.add_argument("--no-cache", action="store_true", help="Spuren nicht aus dem Cache nehmen/ablegen")
+    dec = sub.add_parser("decode", help="HFE oder SCP nach IMG")
+    dec.add_argument("flux", help="HFE- oder SCP-Datei")
+    dec.add_argument("image", help="Ziel-Image (.img)")
+    dec.add_argument("--format", required=True, help="Format aus cpaFormates.cfg (z.B. cpa780)")
+    dec.add_argument("--diskdefs", default=DEFAULT_DISKDEFS, help="Formatdatei (Standard: cpaFormates.cfg)")
+    args = parser.parse_args()
+    require_numpy()
+
+    if args.command == "decode":
+        try:
+            data = decode_image(args.flux, args.format, args.diskdefs)
+        except (KeyError, ValueError) as e:
+            print(f"[FEHLER] {e}")
+            sys.exit(1)
+        with open(args.image, "wb") as f:
+            f.write(data)
+        print(f"[DONE] Image erstellt: {args.image}")
+        return
+
+    if not (args.hfe or args.scp):
+        parser.error("mindestens --hfe oder --scp angeben")
+    try:
+        cyls, heads, tracks = encode_image(args.image, args.format, args.diskdefs, not args.no_cache)
+    except (KeyError, ValueError) as e:
+        print(f"[FEHLER] {e}")
+        sys.exit(1)
+    if args.hfe:
+        write_hfe(args.hfe, cyls, heads, tracks)
+        print(f"[DONE] HFE-Image erstellt: {args.hfe}")
+    if args.scp:
+        write_scp(args.scp, cyls, heads, tracks)
+        print(f"[DONE] SCP-Image erstellt: {args.scp}")
+
+if __name__ == "__main__":
+    main()
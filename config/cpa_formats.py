@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+# Copyright (c) 2025 by olliy78
+# SPDX-License-Identifier: MIT
+"""
+Gemeinsames Register der Diskettenformate aus cpaFormates.cfg und diskdefs
+
+Die Geometrie jedes Formats steht zweimal im Repository: in cpaFormates.cfg für Greaseweazle
+(physikalische Spuren: Zylinder, Köpfe, Sektoren und Sektorgröße je Spur) und in diskdefs für
+cpmtools (logisches Dateisystem: Spuren, Systemspuren, Blockgröße, Verzeichnisgröße). Dieses Modul
+liest beide Dateien einmal ein und hält sie als Formatobjekte vor:
+
+- GwFormat: Spuraufbau eines Formats aus cpaFormates.cfg mit vorberechneten Tabellen
+  (Zylinder, Kopf) -> Byte-Position der Spur und (Zylinder, Kopf, Sektor-ID) -> Byte-Position
+  des Sektors im Image (wie es 'gw read' / 'gw convert' erzeugt)
+- DiskDef: Eintrag aus diskdefs. Verhält sich wie das bisherige dict der Zahlenwerte
+  (dd["maxdir"]) und bietet Verzeichnisposition, Blockanzahl und eine Tabelle logischer Sektor
+  -> Byte-Position (mit Skew) als Attribute
+
+Das Register wird je Paar von Dateien im Prozess zwischengespeichert und nur bei geändertem Datum
+oder geänderter Größe einer der Dateien neu eingelesen.
+
+Der Abgleich (check) meldet Formate, deren Beschreibungen in beiden Dateien nicht zusammenpassen
+(Imagegröße, Spurgröße der Datenspuren, Lage des Verzeichnisses), sowie Einträge, die cpmtools nicht
+lesen kann. Außerdem leitet das Register ab, mit welcher diskdef das Image eines Formats gebaut wird
+(build_diskdef): die gleichnamige, wenn sie das ganze Image beschreibt, sonst eine diskdef ohne
+Systemspuren, die genau die Spuren ab einer Spurgrenze beschreibt; die Bytes davor sind die
+Bootspuren (cpa780 -> cpa780_withoutBoot mit 15104 Bytes Bootsektor).
+
+Verwendung:
+    python cpa_formats.py list [--cfg DATEI] [--diskdefs DATEI]
+    python cpa_formats.py check [--cfg DATEI] [--diskdefs DATEI]
+    python cpa_formats.py build FORMAT [--cfg DATEI] [--diskdefs DATEI]
+
+Beispiele:
+    python config/cpa_formats.py check
+    python config/cpa_formats.py build cpa780      # -> cpa780_withoutBoot 780 15104
+
+    import cpa_formats
+    reg = cpa_formats.load()
+    fmt = reg.gw_format("cpa780")
+    pos = fmt.sector_offsets[(0, 1, 1)]            # Sektor 1 von Zylinder 0, Kopf 1
+"""
+import os
+import sys
+import argparse
+
+DISKDEFS = "diskdefs"
+GW_FORMATS = "cpaFormates.cfg"
+
+# Spurparameter, die aus cpaFormates.cfg übernommen werden, mit den Standardwerten von Greaseweazle
+TRACK_DEFAULTS = {"secs": 0, "bps": 512, "id": 1, "interleave": 1, "gap3": None, "rate": 0, "rpm": 300}
+# Pflichtangaben eines diskdefs-Eintrags für cpmtools
+DISKDEF_REQUIRED = ("seclen", "tracks", "sectrk", "blocksize", "maxdir")
+
+# (Pfad cfg, Pfad diskdefs) -> (Stat-Schlüssel beider Dateien, Registry)
+_REGISTRY_CACHE = {}
+
+
+def _stat_key(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def parse_track_set(spec, cyls, heads):
+    """
+    Spurangabe aus cpaFormates.cfg ('*', '0-1', '0.1', '2-79.0', '1,3-5') als Liste von (Zylinder, Kopf).
+    """
+    if spec == "*":
+        return [(c, h) for c in range(cyls) for h in range(heads)]
+    cyl_part, _, head_part = spec.partition(".")
+
+    def numbers(text, limit):
+        result = []
+        for item in text.split(","):
+            lo, _, hi = item.partition("-")
+            result += range(int(lo), int(hi or lo) + 1)
+        return [n for n in result if n < limit]
+
+    head_list = numbers(head_part, heads) if head_part else list(range(heads))
+    return [(c, h) for c in numbers(cyl_part, cyls) for h in head_list]
+
+
+def parse_gw_formats(path=GW_FORMATS):
+    """
+    Liest alle Formate der Greaseweazle-Datei cpaFormates.cfg in einem Durchgang.
+    Returns:
+        dict: Name -> (Zylinder, Köpfe, dict (Zylinder, Kopf) -> dict der Spurparameter wie
+              TRACK_DEFAULTS), in der Reihenfolge der Datei; spätere 'tracks'-Angaben überschreiben
+              frühere wie in Greaseweazle
+    """
+    formats = {}
+    name = None
+    spec = params = None
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            words = line.split("#", 1)[0].replace("=", " = ").split()
+            if not words:
+                continue
+            if name is None:
+                if len(words) >= 2 and words[0] == "disk":
+                    name, cyls, heads, layout = words[1], None, None, {}
+                continue
+            if words[0] == "tracks":
+                spec, params = words[1], dict(TRACK_DEFAULTS)
+            elif words[0] == "end":
+                if params is None:
+                    formats[name] = (cyls, heads, layout)
+                    name = None
+                else:
+                    layout.update({t: params for t in parse_track_set(spec, cyls, heads)})
+                    params = None
+            elif words[0] == "cyls":
+                cyls = int(words[2])
+            elif words[0] == "heads":
+                heads = int(words[2])
+            elif params is not None and words[0] in TRACK_DEFAULTS:
+                params[words[0]] = int(words[2], 0)
+    return formats
+
+
+def parse_diskdefs(path=DISKDEFS):
+    """
+    Liest alle Einträge der cpmtools-Datei diskdefs.
+    Returns:
+        tuple: (dict Name -> dict der Werte in der Reihenfolge der Datei (Zahlen als int, sonst Text),
+                Liste der Probleme, die cpmtools beim Lesen hätte)
+    """
+    defs = {}
+    problems = []
+    current = None
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            words = line.split()
+            if not words or words[0].startswith("#"):
+                continue
+            if words[0] == "diskdef":
+                current = words[1] if len(words) > 1 else None
+                if current:
+                    defs[current] = {}
+            elif words[0].startswith("end"):
+                current = None
+            elif current and len(words) == 1:
+                problems.append(f"diskdefs {current}: '{words[0]}' ohne Wert")
+            elif current:
+                defs[current][words[0]] = int(words[1]) if words[1].isdigit() else words[1]
+    return defs, problems
+
+
+class GwFormat:
+    """
+    Spuraufbau eines Formats aus cpaFormates.cfg.
+
+    Das Image enthält die Spuren in der Reihenfolge Zylinder 0 Kopf 0, Zylinder 0 Kopf 1, Zylinder 1 ...
+    und in jeder Spur die Sektoren nach aufsteigender ID (wie 'gw read').
+    """
+
+    def __init__(self, name, cyls, heads, layout):
+        self.name = name
+        self.cyls = cyls
+        self.heads = heads
+        self.layout = layout
+        # Spuren in Imagereihenfolge und die vorberechneten Byte-Positionen
+        self.tracks = [(c, h) for c in range(cyls) for h in range(heads)]
+        self.track_offsets = {}
+        self.sector_offsets = {}
+        pos = 0
+        for c, h in self.tracks:
+            params = layout.get((c, h), TRACK_DEFAULTS)
+            self.track_offsets[(c, h)] = pos
+            for i in range(params["secs"]):
+                self.sector_offsets[(c, h, (params["id"] + i) & 0xFF)] = pos + i * params["bps"]
+            pos += params["secs"] * params["bps"]
+        self.size = pos
+
+    def params(self, c, h):
+        return self.layout.get((c, h), TRACK_DEFAULTS)
+
+    def track_size(self, c, h):
+        params = self.params(c, h)
+        return params["secs"] * params["bps"]
+
+    def track_sizes(self):
+        """dict (Zylinder, Kopf) -> Spurgröße in Bytes."""
+        return {t: self.track_size(*t) for t in self.tracks}
+
+    def track(self, data, c, h):
+        pos = self.track_offsets[(c, h)]
+        return data[pos:pos + self.track_size(c, h)]
+
+    def sector(self, data, c, h, r):
+        pos = self.sector_offsets[(c, h, r)]
+        return data[pos:pos + self.params(c, h)["bps"]]
+
+
+class DiskDef(dict):
+    """
+    Eintrag aus diskdefs.
+
+    Verhält sich wie das dict der Werte (dd["maxdir"], dd.get("boottrk", 0)); die daraus abgeleiteten
+    Größen stehen als Attribute bereit.
+    """
+
+    def __init__(self, name, values):
+        super().__init__(values)
+        missing = [key for key in DISKDEF_REQUIRED if not isinstance(values.get(key), int)]
+        if missing:
+            raise ValueError(f"diskdef {name}: {', '.join(missing)} fehlt")
+        self.name = name
+        self.seclen = values["seclen"]
+        self.tracks = values["tracks"]
+        self.sectrk = values["sectrk"]
+        self.blocksize = values["blocksize"]
+        self.maxdir = values["maxdir"]
+        self.boottrk = values.get("boottrk", 0)
+        self.skew = values.get("skew", 0)
+        self.track_size = self.sectrk * self.seclen
+        # offset wie bei cpmtools: Bytes oder Spuren ("4T") vor der ersten Spur
+        offset = values.get("offset", 0)
+        if isinstance(offset, str):
+            offset = int(offset[:-1]) * self.track_size if offset[-1:] in "Tt" else int(offset, 0)
+        self.offset = offset
+        self.size = offset + self.tracks * self.track_size
+        self.directory_offset = offset + self.boottrk * self.track_size
+        self.blocks_total = (self.tracks - self.boottrk) * self.track_size // self.blocksize
+        self.wide = self.blocks_total > 255
+        self.dir_blocks = -(-self.maxdir * 32 // self.blocksize)
+        # Logischer Sektor -> Position auf der Spur (Skew-Tabelle wie cpmtools)
+        self.skew_table = list(range(self.sectrk))
+        if self.skew:
+            self.skew_table = []
+            j = 0
+            for _ in range(self.sectrk):
+                while j in self.skew_table:
+                    j = (j + 1) % self.sectrk
+                self.skew_table.append(j)
+                j = (j + self.skew) % self.sectrk
+        # Logischer Sektor (Spur * sectrk + Sektor) -> Byte-Position im Image
+        self.sector_offsets = [offset + t * self.track_size + s * self.seclen
+                               for t in range(self.tracks) for s in self.skew_table]
+
+    def block(self, data, block):
+        """Inhalt eines Blocks (Blocknummer wie im Verzeichnis)."""
+        if not self.skew:
+            pos = self.directory_offset + block * self.blocksize
+            return data[pos:pos + self.blocksize]
+        per_block = self.blocksize // self.seclen
+        first = self.boottrk * self.sectrk + block * per_block
+        return b"".join(data[pos:pos + self.seclen] for pos in self.sector_offsets[first:first + per_block])
+
+
+class Registry:
+    """Alle Formate aus cpaFormates.cfg und diskdefs (fehlende Dateien gelten als leer)."""
+
+    def __init__(self, gw_path=GW_FORMATS, diskdefs_path=DISKDEFS):
+        self.gw_path = gw_path
+        self.diskdefs_path = diskdefs_path
+        self.gw = {}
+        self.diskdefs = {}
+        self.problems = []
+        if os.path.exists(gw_path):
+            for name, (cyls, heads, layout) in parse_gw_formats(gw_path).items():
+                self.gw[name] = GwFormat(name, cyls, heads, layout)
+        if os.path.exists(diskdefs_path):
+            defs, self.problems = parse_diskdefs(diskdefs_path)
+            for name, values in defs.items():
+                try:
+                    self.diskdefs[name] = DiskDef(name, values)
+                except ValueError as e:
+                    self.problems.append(f"diskdefs {e}")
+
+    def gw_format(self, name):
+        if name not in self.gw:
+            raise KeyError(f"Format {name} nicht in {self.gw_path} gefunden")
+        return self.gw[name]
+
+    def diskdef(self, name):
+        if name not in self.diskdefs:
+            raise KeyError(f"diskdef {name} nicht in {self.diskdefs_path} gefunden")
+        return self.diskdefs[name]
+
+    def layout_problems(self, fmt, dd):
+        """Unterschiede zwischen einem Spuraufbau und einer diskdef, die das ganze Image beschreibt."""
+        problems = []
+        if fmt.size != dd.size:
+            problems.append(f"Imagegröße {fmt.size} Bytes in {self.gw_path}, {dd.size} Bytes in {self.diskdefs_path}")
+        boot = dd.boottrk + dd.offset // dd.track_size
+        for c, h in fmt.tracks[boot:dd.tracks]:
+            params = fmt.params(c, h)
+            if params["secs"] * params["bps"] != dd.track_size:
+                problems.append(f"Spur {c}.{h}: {params['secs']} x {params['bps']} Bytes in {self.gw_path}, "
+                                f"{dd.sectrk} x {dd.seclen} Bytes in {self.diskdefs_path}")
+                break
+        if boot < len(fmt.tracks):
+            start = fmt.track_offsets[fmt.tracks[boot]]
+            if start != dd.directory_offset:
+                c, h = fmt.tracks[boot]
+                problems.append(f"Verzeichnis bei Byte {dd.directory_offset} laut {self.diskdefs_path}, "
+                                f"Spur {c}.{h} beginnt bei Byte {start}")
+        return problems
+
+    def build_diskdef(self, name):
+        """
+        diskdef, mit der das Image eines Formats aus cpaFormates.cfg gebaut wird.
+        Returns:
+            tuple: (DiskDef, Anzahl Bytes vor dem cpmtools-Image, d.h. Länge der Bootspuren)
+        """
+        fmt = self.gw_format(name)
+        dd = self.diskdefs.get(name)
+        if dd is not None and not self.layout_problems(fmt, dd):
+            return dd, 0
+        starts = {pos: n for n, pos in enumerate(fmt.track_offsets.values())}
+        # Kandidaten ohne Systemspuren, deren Name mit dem Format beginnt (cpa780_withoutBoot)
+        for dd in self.diskdefs.values():
+            if not dd.name.startswith(name) or dd.boottrk or dd.offset or dd.size >= fmt.size:
+                continue
+            first = starts.get(fmt.size - dd.size)
+            if first is not None and all(fmt.track_size(c, h) == dd.track_size for c, h in fmt.tracks[first:]):
+                return dd, fmt.size - dd.size
+        raise KeyError(f"keine diskdef in {self.diskdefs_path} passt zum Format {name}")
+
+    def image_diskdef(self, name, size):
+        """
+        diskdef zum Lesen der Dateien eines Images im Format name. Beschreibt die gleichnamige diskdef
+        den physikalischen Aufbau nicht (cpa780: Verzeichnis laut diskdefs hinter 3 Spuren, tatsächlich
+        hinter den 15104 Bytes Bootspuren), wird wie beim Bauen des Images build_diskdef verwendet. Das
+        gilt auch, wenn statt der Bootspuren nur ein kürzerer Bootsektor davor steht (pc_1715: 128 Bytes).
+        Returns:
+            tuple: (DiskDef, Anzahl Bytes vor dem cpmtools-Image)
+        """
+        fmt = self.gw.get(name)
+        if fmt is not None:
+            try:
+                dd, boot = self.build_diskdef(name)
+            except KeyError:
+                dd = None
+            if dd is not None and (fmt.size == size or 0 < size - dd.size <= boot):
+                return dd, size - dd.size
+        return self.diskdef(name), 0
+
+    def check(self):
+        """
+        Gleicht beide Dateien ab.
+        Returns:
+            list: Meldungen (leer, wenn alles zusammenpasst)
+        """
+        messages = list(self.problems)
+        for name, fmt in self.gw.items():
+            dd = self.diskdefs.get(name)
+            if dd is None:
+                messages.append(f"{name}: keine diskdef in {self.diskdefs_path}")
+                continue
+            messages += [f"{name}: {p}" for p in self.layout_problems(fmt, dd)]
+        return messages
+
+
+def load(gw_path=GW_FORMATS, diskdefs_path=DISKDEFS):
+    """Registry für beide Dateien, aus dem Zwischenspeicher, solange sich keine der Dateien geändert hat."""
+    key = (os.path.abspath(gw_path), os.path.abspath(diskdefs_path))
+    stat = (_stat_key(gw_path), _stat_key(diskdefs_path))
+    cached = _REGISTRY_CACHE.get(key)
+    if cached and cached[0] == stat:
+        return cached[1]
+    registry = Registry(gw_path, diskdefs_path)
+    _REGISTRY_CACHE[key] = (stat, registry)
+    return registry
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Register der Diskettenformate aus cpaFormates.cfg und diskdefs")
+    parser.add_argument("command", choices=("list", "check", "build"))
+    parser.add_argument("format", nargs="?", help="Format aus cpaFormates.cfg (für build)")
+    parser.add_argument("--cfg", default=GW_FORMATS, help="Greaseweazle-Formatdatei (Standard: cpaFormates.cfg)")
+    parser.add_argument("--diskdefs", default=DISKDEFS, help="cpmtools-Formatdatei (Standard: diskdefs)")
+    args = parser.parse_args()
+    reg = load(args.cfg, args.diskdefs)
+
+    if args.command == "build":
+        if not args.format:
+            parser.error("build benötigt ein Format")
+        try:
+            dd, boot = reg.build_diskdef(args.format)
+        except KeyError as e:
+            print(f"[FEHLER] {e.args[0]}")
+            sys.exit(1)
+        print(f"{dd.name} {dd.size // 1024} {boot}")
+    elif args.command == "list":
+        print(f"{'Format':<20} {'Zyl':>4} {'Köpfe':>5} {'Bytes':>8}  diskdef (Bootspuren)")
+        for name, fmt in reg.gw.items():
+            try:
+                dd, boot = reg.build_diskdef(name)
+                build = f"{dd.name} ({boot} Bytes)" if boot else dd.name
+            except KeyError:
+                build = "-"
+            print(f"{name:<20} {fmt.cyls:>4} {fmt.heads:>5} {fmt.size:>8}  {build}")
+        print()
+        print(f"{'diskdef':<20} {'Spuren':>6} {'Sekt.':>5} {'Länge':>5} {'Boot':>4} {'Block':>5} {'Verz.':>5} {'Bytes':>8}")
+        for name, dd in reg.diskdefs.items():
+            print(f"{name:<20} {dd.tracks:>6} {dd.sectrk:>5} {dd.seclen:>5} {dd.boottrk:>4} {dd.blocksize:>5} "
+                  f"{dd.maxdir:>5} {dd.size:>8}")
+    else:
+        messages = reg.check()
+        for message in messages:
+            print(f"[WARN] {message}")
+        if not messages:
+            print(f"[INFO] {args.cfg} und {args.diskdefs} passen zusammen")
+        sys.exit(1 if messages else 0)
+
+if __name__ == "__main__":
+    main()
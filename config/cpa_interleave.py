@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+# Copyright (c) 2025 by olliy78
+# SPDX-License-Identifier: MIT
+"""
+Berechnet den Sektor-Interleave, mit dem eine Diskette sequentiell am schnellsten gelesen wird
+
+Das BIOS liest die Datenspuren über einen Puffer von einem physischen Sektor (dbufsz=10) ohne
+Sektorversatz: Nach dem Lesen eines Sektors gibt es dessen 128-Byte-Sätze einzeln an das BDOS
+weiter (LDIR in den DMA-Puffer), erst danach wird der nächste Sektor angefordert. Ist diese
+Bearbeitungszeit länger als die Lücke bis zum nächsten Sektor-ID-Feld, kostet jeder Sektor eine
+volle Umdrehung. Ein physischer Interleave (Sektoren auf der Spur nicht in ID-Reihenfolge) gibt dem
+Rechner die Zeit, die er braucht.
+
+Modell je Spurgeometrie (Zeiten aus dem Spuraufbau von config/cpa_flux.py, d.h. Datenrate,
+Umdrehungszeit, Gap 3):
+    - der nächste Sektor kann erst gelesen werden, wenn sein ID-Feld nach der Bearbeitung des
+      vorigen Sektors unter dem Kopf ankommt
+    - Bearbeitung je Sektor: SECTOR_CYCLES + Sätze je Sektor * RECORD_CYCLES Takte beim
+      eingestellten CPU-Takt (2,5 oder 4,0 MHz, aus .config: CONFIG_SYSTEM_CPUCLK_40)
+    - nach jeder Spur Kopfwechsel, nach jedem Zylinder zusätzlich STEP_MS Schritt und Beruhigung
+Gerechnet wird ein sequentielles Lesen über SIM_CYLS Zylinder; der beste Interleave ist der mit
+der kürzesten Zeit je Spur (bei Gleichstand der kleinste).
+
+Spuren mit 128-Byte-Sektoren (Bootspuren) liest das BIOS ungepuffert mit eigener Sektortabelle
+(xlt 1,7,13,...); sie bleiben unverändert.
+
+Der Interleave ist rein physikalisch: Das Diskettenimage (.img) und der diskdefs-Eintrag bleiben
+gleich (skew 0, das BIOS übersetzt auf den Datenspuren keine Sektornummern). Erzeugt werden ein
+Eintrag für cpaFormates.cfg mit 'interleave = N' (für gw write und config/cpa_flux.py) und
+gleichlautende diskdefs-Einträge unter dem neuen Namen, damit cpmtools, extract_files und die
+Formaterkennung das Format kennen. Mit --hfe/--scp werden daraus direkt Flux-Images erzeugt.
+
+Verwendung:
+    python cpa_interleave.py [FORMAT ...] [--clock 25|40 ...] [--cfg DATEI] [--diskdefs DATEI]
+                             [--sector-cycles N] [--record-cycles N] [--step-ms MS]
+    python cpa_interleave.py FORMAT --clock 25|40 [--name NAME] --emit | --apply
+    python cpa_interleave.py FORMAT --clock 25|40 --image IMG [--hfe DATEI] [--scp DATEI]
+
+Beispiele:
+    python config/cpa_interleave.py                       # alle Formate, Takt aus .config
+    python config/cpa_interleave.py cpa800 --clock 25 40
+    python config/cpa_interleave.py cpa800 --clock 25 --apply
+    python config/cpa_interleave.py cpa780 --clock 40 --image build/cpadisk.img --hfe build/cpadisk.hfe
+"""
+import os
+import sys
+import argparse
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPT_DIR)
+
+import cpaconfig
+import cpa_formats
+import cpa_flux
+from cpa_formats import DISKDEFS, GW_FORMATS
+
+CONFIG_FILE = ".config"
+CLOCKS = (25, 40)            # CPU-Takt in 100 kHz wie cpuclk in bios.mac
+# Geschätzte Takte; mit --sector-cycles/--record-cycles an die eigene Hardware anpassen
+SECTOR_CYCLES = 3000         # je Sektor: Puffer prüfen, Kommando, ID-Suche vorbereiten, Status
+RECORD_CYCLES = 6000         # je 128-Byte-Satz: BDOS/BIOS-Aufruf, Deblocking, LDIR 128 Bytes
+STEP_MS = 20.0               # Schritt zum nächsten Zylinder mit Beruhigungszeit
+SIM_CYLS = 4                 # Zylinder, über die sequentielles Lesen gerechnet wird
+MIN_BPS = 256                # kleinere Sektoren liest das BIOS mit eigener Sektortabelle
+
+# Bytes vor dem ersten ID-Feld und je Sektor vom ID-Feld bis zum Ende des Datenfelds (ohne Gap 3)
+TRACK_START = cpa_flux.GAP4A + cpa_flux.SYNC + 4 + cpa_flux.GAP1
+SECTOR_FIELDS = cpa_flux.SYNC + 8 + 2 + cpa_flux.GAP2 + cpa_flux.SYNC + 4 + 2
+
+
+def mhz(clock):
+    """25 -> '2,5 MHz' (Schreibweise wie in Kconfig.system)."""
+    return f"{clock // 10},{clock % 10} MHz"
+
+
+def configured_clock(path=CONFIG_FILE):
+    """CPU-Takt aus .config (wie bios.mac: 40 bei CONFIG_SYSTEM_CPUCLK_40, sonst 25) oder None."""
+    if not os.path.exists(path):
+        return None
+    return 40 if cpaconfig.load(path).is_enabled("CONFIG_SYSTEM_CPUCLK_40") else 25
+
+
+def geometry_groups(fmt):
+    """
+    Spuren eines Formats nach Geometrie gruppiert.
+    Returns:
+        dict: (Sektoren, Sektorgröße) -> (Spurparameter, Anzahl Spuren), in Reihenfolge der Spuren
+    """
+    groups = {}
+    for c, h in fmt.tracks:
+        params = fmt.params(c, h)
+        key = (params["secs"], params["bps"])
+        if key in groups:
+            groups[key] = (groups[key][0], groups[key][1] + 1)
+        else:
+            groups[key] = (params, 1)
+    return groups
+
+
+def track_time(params, interleave, heads, clock, sector_cycles=SECTOR_CYCLES,
+               record_cycles=RECORD_CYCLES, step_ms=STEP_MS):
+    """
+    Mittlere Zeit je Spur beim sequentiellen Lesen mit einem Interleave (siehe Modell oben).
+    Returns:
+        float: Millisekunden je Spur
+    """
+    secs, bps = params["secs"], params["bps"]
+    rate, gap3, _ = cpa_flux.track_geometry(params)
+    byte_ms = 8 / rate
+    rev_ms = 60000 / params["rpm"]
+    slot_ms = (SECTOR_FIELDS + bps + gap3) * byte_ms
+    read_ms = (SECTOR_FIELDS + bps) * byte_ms
+    work_ms = (sector_cycles + bps // 128 * record_cycles) / (clock * 100)
+    # Sektor-Index -> Beginn seines ID-Felds nach dem Indexloch
+    start_ms = [0.0] * secs
+    for slot, idx in enumerate(cpa_flux.sector_order(secs, interleave)):
+        start_ms[idx] = TRACK_START * byte_ms + slot * slot_ms
+
+    t = 0.0
+    track_end = []
+    for n in range(SIM_CYLS * heads):
+        if n and n % heads == 0:
+            t += step_ms
+        for idx in range(secs):
+            wait = (start_ms[idx] - t) % rev_ms
+            t += wait + read_ms + work_ms
+        track_end.append(t)
+    return (track_end[-1] - track_end[0]) / (len(track_end) - 1)
+
+
+def best_interleave(params, heads, clock, **model):
+    """
+    Returns:
+        tuple: (bester Interleave, dict Interleave -> ms je Spur)
+    """
+    times = {i: track_time(params, i, heads, clock, **model) for i in range(1, params["secs"])}
+    if not times:
+        return 1, {1: track_time(params, 1, heads, clock, **model)}
+    best = min(times, key=lambda i: (round(times[i], 3), i))
+    return best, times
+
+
+def optimize(fmt, clock, **model):
+    """
+    Bester Interleave je Spurgeometrie eines Formats (nur Sektoren ab MIN_BPS).
+    Returns:
+        dict: (Sektoren, Sektorgröße) -> Interleave
+    """
+    return {key: best_interleave(params, fmt.heads, clock, **model)[0]
+            for key, (params, _) in geometry_groups(fmt).items() if key[1] >= MIN_BPS}
+
+
+def print_report(fmt, clocks, **model):
+    for (secs, bps), (params, count) in geometry_groups(fmt).items():
+        print(f"{fmt.name}: {count} Spuren mit {secs} x {bps} Bytes "
+              f"({cpa_flux.track_geometry(params)[0]} kbit/s, {params['rpm']} U/min)")
+        if bps < MIN_BPS:
+            print("    128-Byte-Sektoren: BIOS liest mit eigener Sektortabelle, bleibt unverändert")
+            continue
+        results = {clock: best_interleave(params, fmt.heads, clock, **model) for clock in clocks}
+        header = "".join(f"  {mhz(clock):>8}: ms/Spur  KB/s" for clock in clocks)
+        print(f"    Interleave{header}")
+        for i in sorted(results[clocks[0]][1]):
+            row = ""
+            for clock in clocks:
+                best, times = results[clock]
+                mark = "*" if i == best else " "
+                row += f"  {mark}{times[i]:>17.0f} {secs * bps / times[i] * 1000 / 1024:>5.1f}"
+            current = " (aktuell)" if i == params["interleave"] else ""
+            print(f"    {i:>10}{row}{current}")
+
+
+# --- Einträge für cpaFormates.cfg und diskdefs ---
+
+def entry_lines(path, keyword, name):
+    """
+    Zeilen eines Eintrags ('disk NAME' bzw. 'diskdef NAME' bis zum zugehörigen 'end'); nur in
+    cpaFormates.cfg enthält ein Eintrag 'tracks'-Blöcke mit eigenem 'end'.
+    """
+    with open(path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    for start, line in enumerate(lines):
+        words = line.split("#", 1)[0].split()
+        if words[:2] == [keyword, name]:
+            break
+    else:
+        raise KeyError(f"{keyword} {name} nicht in {path} gefunden")
+    depth = 0
+    for end in range(start + 1, len(lines)):
+        words = lines[end].split("#", 1)[0].split()
+        if keyword == "disk" and words[:1] == ["tracks"]:
+            depth += 1
+        elif words[:1] and words[0].startswith("end"):
+            if depth == 0:
+                return lines[start:end + 1]
+            depth -= 1
+    raise ValueError(f"{keyword} {name} in {path} ohne 'end'")
+
+
+def cfg_entry(cfg_path, fmt, new_name, interleaves, comment):
+    """Eintrag für cpaFormates.cfg: Kopie von fmt mit 'interleave = N' in den optimierten Spurblöcken."""
+    out = [f"# {comment}"]
+    block = None
+    for line in entry_lines(cfg_path, "disk", fmt):
+        words = line.split("#", 1)[0].replace("=", " = ").split()
+        if words[:1] == ["disk"]:
+            line = line.replace(fmt, new_name, 1)
+        elif words[:1] == ["tracks"]:
+            block = {"secs": 0, "bps": 512, "indent": line[:len(line) - len(line.lstrip())] + "    "}
+        elif block is not None and words[:1] == ["end"]:
+            n = interleaves.get((block["secs"], block["bps"]), 1)
+            if n != 1:
+                out.append(f"{block['indent']}interleave = {n}")
+            block = None
+        elif block is not None and words and words[0] in ("secs", "bps"):
+            block[words[0]] = int(words[2], 0)
+            block["indent"] = line[:len(line) - len(line.lstrip())]
+        if block is not None and words[:1] == ["interleave"]:
+            continue
+        out.append(line)
+    return "\n".join(out) + "\n"
+
+
+def diskdef_entries(registry, fmt, new_name, comment):
+    """
+    diskdefs-Einträge unter dem neuen Namen: die gleichnamige diskdef und, falls das Image mit einer
+    anderen gebaut wird (cpa780_withoutBoot), auch diese mit dem neuen Namen als Präfix.
+    """
+    names = {}
+    if fmt in registry.diskdefs:
+        names[fmt] = new_name
+    try:
+        build, _ = registry.build_diskdef(fmt)
+        names[build.name] = new_name + build.name[len(fmt):]
+    except KeyError:
+        pass
+    out = []
+    for old, new in names.items():
+        lines = entry_lines(registry.diskdefs_path, "diskdef", old)
+        lines[0] = lines[0].replace(old, new, 1)
+        out.append("\n".join([f"# {comment} (gleiche Belegung wie {old})"] + lines) + "\n")
+    return out, list(names.values())
+
+
+def append_entry(path, text):
+    with open(path, encoding="utf-8") as f:
+        content = f.read()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(("\n" if content and not content.endswith("\n") else "") + "\n" + text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bester Sektor-Interleave je Format und CPU-Takt")
+    parser.add_argument("formats", nargs="*", help="Formate aus cpaFormates.cfg (Standard: alle)")
+    parser.add_argument("--clock", type=int, nargs="+", choices=CLOCKS,
+                        help="CPU-Takt: 25 = 2,5 MHz, 40 = 4,0 MHz (Standard: aus .config, sonst beide)")
+    parser.add_argument("--cfg", default=GW_FORMATS, help="Greaseweazle-Formatdatei (Standard: cpaFormates.cfg)")
+    parser.add_argument("--diskdefs", default=DISKDEFS, help="cpmtools-Formatdatei (Standard: diskdefs)")
+    parser.add_argument("--sector-cycles", type=int, default=SECTOR_CYCLES,
+                        help=f"Takte je Sektor (Standard: {SECTOR_CYCLES})")
+    parser.add_argument("--record-cycles", type=int, default=RECORD_CYCLES,
+                        help=f"Takte je 128-Byte-Satz (Standard: {RECORD_CYCLES})")
+    parser.add_argument("--step-ms", type=float, default=STEP_MS,
+                        help=f"Zylinderwechsel in ms (Standard: {STEP_MS:g})")
+    parser.add_argument("--name", help="Name des erzeugten Formats (Standard: FORMAT_ilN)")
+    parser.add_argument("--emit", action="store_true", help="Einträge für cpaFormates.cfg und diskdefs ausgeben")
+    parser.add_argument("--apply", action="store_true", help="Einträge an cpaFormates.cfg und diskdefs anhängen")
+    parser.add_argument("--image", help="Diskettenimage, aus dem mit dem Interleave HFE/SCP erzeugt werden")
+    parser.add_argument("--hfe", help="HFE-Datei schreiben (mit --image)")
+    parser.add_argument("--scp", help="SCP-Datei schreiben (mit --image)")
+    args = parser.parse_args()
+    registry = cpa_formats.load(args.cfg, args.diskdefs)
+    model = {"sector_cycles": args.sector_cycles, "record_cycles": args.record_cycles, "step_ms": args.step_ms}
+    clocks = args.clock or ([configured_clock()] if configured_clock() else list(CLOCKS))
+    try:
+        formats = [registry.gw_format(name) for name in args.formats] or list(registry.gw.values())
+    except KeyError as e:
+        print(f"[FEHLER] {e.args[0]}")
+        sys.exit(1)
+
+    if not (args.emit or args.apply or args.image):
+        for fmt in formats:
+            print_report(fmt, clocks, **model)
+        return
+
+    if len(formats) != 1 or len(clocks) != 1:
+        parser.error("--emit, --apply und --image brauchen genau ein Format und einen Takt (--clock)")
+    fmt, clock = formats[0], clocks[0]
+    interleaves = optimize(fmt, clock, **model)
+    if all(n == 1 for n in interleaves.values()):
+        print(f"[INFO] {fmt.name}: Interleave 1 ist bei {mhz(clock)} bereits am schnellsten")
+    comment = (f"{fmt.name} mit Interleave "
+               f"{', '.join(f'{n} ({s} x {b})' for (s, b), n in interleaves.items())} "
+               f"für {mhz(clock)} (config/cpa_interleave.py)")
+
+    if args.image:
+        if not (args.hfe or args.scp):
+            parser.error("mit --image mindestens --hfe oder --scp angeben")
+        cpa_flux.require_numpy()
+        layout = {t: dict(p, interleave=interleaves.get((p["secs"], p["bps"]), p["interleave"]))
+                  for t, p in fmt.layout.items()}
+        target = cpa_formats.GwFormat(fmt.name, fmt.cyls, fmt.heads, layout)
+        with open(args.image, "rb") as f:
+            data = f.read()
+        try:
+            cyls, heads, tracks = cpa_flux.encode_data(data, target)
+        except ValueError as e:
+            print(f"[FEHLER] {e}")
+            sys.exit(1)
+        if args.hfe:
+            cpa_flux.write_hfe(args.hfe, cyls, heads, tracks)
+            print(f"[DONE] HFE-Image erstellt: {args.hfe} ({comment})")
+        if args.scp:
+            cpa_flux.write_scp(args.scp, cyls, heads, tracks)
+            print(f"[DONE] SCP-Image erstellt: {args.scp} ({comment})")
+        return
+
+    name = args.name or f"{fmt.name}_il{max(interleaves.values(), default=1)}"
+    cfg_text = cfg_entry(args.cfg, fmt.name, name, interleaves, comment)
+    dd_texts, dd_names = diskdef_entries(registry, fmt.name, name, comment)
+    if args.emit:
+        print(f"# --- {args.cfg} ---")
+        print(cfg_text)
+        print(f"# --- {args.diskdefs} ---")
+        print("\n".join(dd_texts))
+        return
+    existing = list(dict.fromkeys([n for n in [name] if n in registry.gw]
+                                  + [n for n in dd_names if n in registry.diskdefs]))
+    if existing:
+        print(f"[FEHLER] {', '.join(existing)} existiert bereits (anderen Namen mit --name angeben)")
+        sys.exit(1)
+    append_entry(args.cfg, cfg_text)
+    for text in dd_texts:
+        append_entry(args.diskdefs, text)
+    print(f"[DONE] Format {name} in {args.cfg} und {', '.join(dd_names) or '-'} in {args.diskdefs} angelegt")
+    print(f"[INFO] Schreiben z.B. mit: gw write --diskdefs={args.cfg} --format={name} build/cpadisk.img")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# Copyright (c) 2025 by olliy78
+# SPDX-License-Identifier: MIT
+"""
+Ordnet die Dateien eines CP/M-Images so an, dass häufig geladene Dateien nahe am Verzeichnis liegen
+
+cpmcp belegt die Blöcke in der Reihenfolge, in der die Dateien kopiert werden. Auf der Systemdiskette
+landen so autoexec.sub, pip.com, wm.com oder m80.com irgendwo zwischen den übrigen Zusatzdateien, und
+das Laufwerk muss beim Booten und bei typischen Arbeitsabläufen weit über die Diskette fahren.
+
+Die Anordnung geht von einer Prioritätsliste (config/disklayout.txt) und/oder einer aufgezeichneten
+Zugriffsfolge aus und baut das Image neu auf:
+    - Verzeichnis und @OS.COM bleiben, wo sie sind (direkt am Anfang der Datenspuren; das 800K-Format
+      lädt @OS.COM über den im Bootsektor hinterlegten Verzeichniseintrag von festen Blöcken)
+    - danach folgen die Dateien der Liste in dieser Reihenfolge, jede lückenlos und mit den Extents
+      in Dateireihenfolge, anschließend alle übrigen Dateien in ihrer bisherigen Reihenfolge
+    - die Verzeichniseinträge werden in derselben Reihenfolge abgelegt (das BDOS findet die häufig
+      benutzten Dateien beim Durchsuchen des Verzeichnisses zuerst)
+Nicht verschoben werden Dateien mit Blöcken außerhalb der Diskette oder doppelt belegten Blöcken,
+Einträge ohne gültigen Namen sowie beim 800K-Format die ersten 128 Bytes des Verzeichnisses, die
+zugleich Bootsektor sind. Freiwerdende Blöcke werden mit E5h gefüllt.
+
+Prioritätsliste: ein Dateiname je Zeile, Kommentare mit #; nicht vorhandene Dateien werden übergangen.
+Zugriffsfolge (--trace): ein Dateiname je Zugriff und Zeile, z.B. aus dem Protokoll eines Emulators;
+weitere Spalten, Laufwerk (A:) und User (0:) werden ignoriert. Die Dateien werden nach Anzahl der
+Zugriffe geordnet (bei Gleichstand nach dem ersten Zugriff) und nach denen der Prioritätsliste angelegt.
+
+Verwendung:
+    python cpa_layout.py <image> [--format FORMAT] [--layout DATEI] [--trace DATEI] [-o AUSGABE]
+
+    Ohne -o wird nur angezeigt, wie weit der Kopf beim Laden der bevorzugten Dateien fährt.
+
+Beispiele:
+    python config/cpa_layout.py build/cpadisk.img --format cpa780
+    python config/cpa_layout.py Disketten/arbeit.img --format cpa800 --trace sitzung.log -o arbeit_neu.img
+
+    import cpa_layout
+    data, order = cpa_layout.relayout(data, dd, cpa_layout.read_priority("config/disklayout.txt"))
+"""
+import os
+import sys
+import bisect
+import argparse
+from collections import Counter
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPT_DIR)
+
+import cpa_formats
+
+DEFAULT_LAYOUT = os.path.join("config", "disklayout.txt")
+SYSTEMNAME = "@os.com"
+# Länge des Bootsektors, der beim 800K-Format am Anfang des Verzeichnisses liegt (Spur 0 fixen)
+BOOT_RECORD = 128
+
+
+# --- Prioritätsliste und Zugriffsfolge ---
+
+def read_names(path):
+    """Dateinamen aus einer Textdatei (erste Spalte, ohne Laufwerk/User, Kleinbuchstaben)."""
+    names = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            fields = line.split("#", 1)[0].split()
+            if fields:
+                names.append(fields[0].rpartition(":")[2].lower())
+    return [name for name in names if name]
+
+
+def read_priority(path):
+    """Prioritätsliste ohne doppelte Namen, in der angegebenen Reihenfolge."""
+    return list(dict.fromkeys(read_names(path)))
+
+
+def read_trace(path):
+    """Dateien einer Zugriffsfolge, häufigste zuerst, bei Gleichstand nach dem ersten Zugriff."""
+    names = read_names(path)
+    counts = Counter(names)
+    first = {}
+    for n, name in enumerate(names):
+        first.setdefault(name, n)
+    return sorted(counts, key=lambda name: (-counts[name], first[name]))
+
+
+def hot_files(layout=None, trace=None):
+    """Bevorzugte Dateien: erst die Prioritätsliste, dann die Zugriffsfolge."""
+    names = read_priority(layout) if layout else []
+    if trace:
+        names += read_trace(trace)
+    return list(dict.fromkeys(names))
+
+
+# --- Verzeichnis ---
+
+def entry_name(entry):
+    """Dateiname eines Verzeichniseintrags wie cpmls ihn ausgibt, None bei ungültigem Namen."""
+    name = bytes(b & 0x7F for b in entry[1:9]).decode("ascii", "replace").rstrip()
+    ext = bytes(b & 0x7F for b in entry[9:12]).decode("ascii", "replace").rstrip()
+    if not name or not all(32 < ord(ch) < 127 for ch in name + ext):
+        return None
+    return name.lower() + ("." + ext.lower() if ext else "")
+
+
+def entry_blocks(entry, wide):
+    """Die 8 (16-Bit) bzw. 16 (8-Bit) Blockzeiger eines Verzeichniseintrags."""
+    if wide:
+        return [entry[i] | entry[i + 1] << 8 for i in range(16, 32, 2)]
+    return list(entry[16:32])
+
+
+def set_entry_blocks(entry, blocks, wide):
+    """Schreibt die Blockzeiger in einen Verzeichniseintrag (bytearray)."""
+    if wide:
+        for n, b in enumerate(blocks):
+            entry[16 + 2 * n:18 + 2 * n] = b.to_bytes(2, "little")
+    else:
+        entry[16:32] = bytes(blocks)
+
+
+def read_files(directory, dd, protected=0):
+    """
+    Belegte Verzeichniseinträge, nach Dateien zusammengefasst.
+    Returns:
+        tuple: (dict (User, Name) -> Liste (Extent-Nummer, Position, Blockzeiger),
+                Menge der Blöcke von Einträgen, die nicht verändert werden dürfen,
+                Menge der Dateien mit solchen Einträgen)
+    """
+    files = {}
+    fixed = set()
+    fixed_files = set()
+    for pos in range(0, len(directory), 32):
+        entry = directory[pos:pos + 32]
+        if entry[0] > 15:
+            continue
+        blocks = entry_blocks(entry, dd.wide)
+        name = entry_name(entry)
+        if name is None:
+            fixed.update(b for b in blocks if b)
+            continue
+        key = (entry[0], name)
+        files.setdefault(key, []).append((entry[12] + 32 * entry[14], pos, blocks))
+        if pos < protected:
+            fixed_files.add(key)
+    return files, fixed, fixed_files
+
+
+def block_ranges(dd, block):
+    """Byte-Bereiche (Position, Länge) eines Blocks im Image, auch bei diskdefs mit Skew."""
+    if not dd.skew:
+        return [(dd.directory_offset + block * dd.blocksize, dd.blocksize)]
+    per_block = dd.blocksize // dd.seclen
+    first = dd.boottrk * dd.sectrk + block * per_block
+    return [(pos, dd.seclen) for pos in dd.sector_offsets[first:first + per_block]]
+
+
+def protected_bytes(dd, boot):
+    """Anfang des Verzeichnisses, der zugleich Bootsektor ist (800K-Format), sonst 0."""
+    return BOOT_RECORD if not boot and dd.directory_offset == 0 else 0
+
+
+def relayout(data, dd, hot, pinned=(), keep=(SYSTEMNAME,), protected=0):
+    """
+    Ordnet die Dateien eines cpmtools-Images (ohne vorangestellte Bootspuren) neu an.
+    Args:
+        data: Imagedaten
+        dd: DiskDef des Images
+        hot: bevorzugte Dateinamen in der gewünschten Reihenfolge
+        pinned: Blöcke, die nicht verschoben werden (Dateien, die sie belegen, bleiben liegen)
+        keep: Dateinamen, die nicht verschoben werden
+        protected: Anzahl Bytes am Anfang des Verzeichnisses, die unverändert bleiben
+    Returns:
+        tuple: (neue Imagedaten als bytearray, Liste der verschobenen Dateinamen in neuer Reihenfolge)
+    """
+    offset = dd.directory_offset
+    directory = bytes(data[offset:offset + dd.maxdir * 32])
+    files, fixed, fixed_files = read_files(directory, dd, protected)
+    fixed.update(range(dd.dir_blocks))
+    fixed.update(pinned)
+    usage = Counter(b for extents in files.values() for _, _, blocks in extents for b in blocks if b)
+    fixed.update(b for b, n in usage.items() if n > 1 or b >= dd.blocks_total)
+
+    movable = []
+    for key, extents in files.items():
+        blocks = {b for _, _, blocks in extents for b in blocks if b}
+        if key[1] in keep or key in fixed_files or blocks & fixed:
+            fixed.update(blocks)
+        else:
+            movable.append((min(blocks, default=dd.blocks_total), key))
+    # Zuerst die bevorzugten Dateien, dann die übrigen in der Reihenfolge ihrer bisherigen Blöcke
+    rank = {name: n for n, name in enumerate(hot)}
+    movable.sort(key=lambda item: (rank.get(item[1][1], len(rank)), item[0]))
+
+    source = bytes(data)
+    result = bytearray(data)
+    for key in (key for _, key in movable):
+        for _, _, blocks in files[key]:
+            for b in blocks:
+                if b:
+                    for pos, length in block_ranges(dd, b):
+                        result[pos:pos + length] = b"\xe5" * length
+    free = (b for b in range(dd.dir_blocks, dd.blocks_total) if b not in fixed)
+    slots = sorted(pos for _, key in movable for _, pos, _ in files[key])
+    entries = []
+    for _, key in movable:
+        for _, pos, blocks in sorted(files[key]):
+            entry = bytearray(directory[pos:pos + 32])
+            new_blocks = []
+            for b in blocks:
+                if not b:
+                    new_blocks.append(0)
+                    continue
+                nb = next(free)
+                for (src, length), (dst, _) in zip(block_ranges(dd, b), block_ranges(dd, nb)):
+                    result[dst:dst + length] = source[src:src + length]
+                new_blocks.append(nb)
+            set_entry_blocks(entry, new_blocks, dd.wide)
+            entries.append(entry)
+    for pos, entry in zip(slots, entries):
+        result[offset + pos:offset + pos + 32] = entry
+    return result, [key[1] for _, key in movable]
+
+
+# --- Kopfbewegung ---
+
+def cylinder_map(fmt, boot):
+    """Funktion Position im cpmtools-Image -> Zylinder (nach dem Spuraufbau aus cpaFormates.cfg)."""
+    starts = [fmt.track_offsets[t] - boot for t in fmt.tracks]
+    return lambda pos: fmt.tracks[bisect.bisect_right(starts, pos) - 1][0]
+
+
+def head_travel(data, dd, names, cylinder):
+    """
+    Kopfbewegung beim Laden der Dateien nacheinander, ausgehend vom Verzeichnis.
+    Returns:
+        tuple: (Summe der Zylinderwechsel, höchster Zylinder, Anzahl gefundener Dateien)
+    """
+    offset = dd.directory_offset
+    files, _, _ = read_files(data[offset:offset + dd.maxdir * 32], dd)
+    blocks_of = {}
+    for (_, name), extents in files.items():
+        blocks_of.setdefault(name, []).extend(b for _, _, blocks in sorted(extents) for b in blocks if b)
+    current = highest = cylinder(offset)
+    travel = found = 0
+    for name in names:
+        if name not in blocks_of:
+            continue
+        found += 1
+        for b in blocks_of[name]:
+            for pos, _ in block_ranges(dd, b):
+                cyl = cylinder(pos)
+                travel += abs(cyl - current)
+                current = cyl
+                highest = max(highest, cyl)
+    return travel, highest, found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ordnet die Dateien eines CP/M-Images nach Zugriffshäufigkeit an")
+    parser.add_argument("image", help="Image-Datei (.img)")
+    parser.add_argument("--format", default="cpa780", help="Format aus cpaFormates.cfg (Standard: cpa780)")
+    parser.add_argument("--layout", default=DEFAULT_LAYOUT, help="Prioritätsliste (Standard: config/disklayout.txt)")
+    parser.add_argument("--trace", help="Aufgezeichnete Zugriffsfolge (ein Dateiname je Zugriff)")
+    parser.add_argument("-o", "--output", help="Neu angeordnetes Image hierhin schreiben")
+    args = parser.parse_args()
+
+    try:
+        registry = cpa_formats.load()
+        dd, boot = registry.build_diskdef(args.format)
+        fmt = registry.gw_format(args.format)
+        hot = hot_files(args.layout if os.path.exists(args.layout) else None, args.trace)
+        with open(args.image, "rb") as f:
+            image = f.read()
+    except (KeyError, OSError) as e:
+        print(f"[FEHLER] {e}")
+        sys.exit(1)
+    if len(image) != fmt.size:
+        print(f"[FEHLER] {args.image} hat {len(image)} Bytes, Format {args.format} hat {fmt.size} Bytes")
+        sys.exit(1)
+    if not hot:
+        print("[FEHLER] keine bevorzugten Dateien (--layout/--trace)")
+        sys.exit(1)
+
+    cylinder = cylinder_map(fmt, boot)
+    data = image[boot:]
+    travel, highest, found = head_travel(data, dd, hot, cylinder)
+    print(f"[INFO] {found} von {len(hot)} bevorzugten Dateien im Image, "
+          f"Kopfbewegung {travel} Zylinder, bis Zylinder {highest}")
+    if not args.output:
+        return
+    new, order = relayout(data, dd, hot, protected=protected_bytes(dd, boot))
+    travel, highest, _ = head_travel(new, dd, hot, cylinder)
+    print(f"[INFO] Neu angeordnet ({len(order)} Dateien): Kopfbewegung {travel} Zylinder, bis Zylinder {highest}")
+    with open(args.output, "wb") as f:
+        f.write(image[:boot] + new)
+    print(f"[DONE] {args.output}")
+
+if __name__ == "__main__":
+    main()
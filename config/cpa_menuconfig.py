@@ -12,15 +12,16 @@ Es führt den Nutzer durch die Konfigurationsmenüs (Systemtyp, Hardware, Build-
 Aufbau:
 - merge_config: Mischen von Konfigurationswerten mit relevanten Präfixen
 - run_menu: Startet das interaktive Konfigurationsmenü
-- run_patch_bios_mac: Synchronisiert BIOS-Werte mit externer Datei
+- run_patch_bios_mac: Synchronisiert BIOS-Werte mit externer Datei (über den Build-Daemon, falls er läuft)
 - run_build: Führt den Build-Prozess aus
 - generate_kconfig_variant: Erstellt Kconfig.variante dynamisch
 - main: Ablaufsteuerung des gesamten Workflows
 
 Verwendung:
 Das Skript wird als Hauptskript für die Konfiguration und den Build des CPA-Workbench-Projekts verwendet. Es kann direkt über die Kommandozeile ausgeführt werden:
-    python cpa_menuconfig.py
+    python cpa_menuconfig.py [--profile[=datei]]
 Das Skript führt alle notwendigen Schritte zur Konfiguration und zum Build in der richtigen Reihenfolge aus.
+Mit --profile oder CPA_PROFILE wird ein Laufzeitprofil geschrieben (siehe cpaprofile.py).
 """
 
 import subprocess
@@ -28,34 +29,24 @@ import sys
 import os
 import shutil
 import glob
-import re
+import hashlib
 
-# Hilfsfunktion: Lese alle Zeilen mit bestimmtem Präfix aus einer Datei in ein Dict
+import cpaconfig
+import cpaprofile
+import cpa_daemon
+
+# Hilfsfunktion: Lese alle Einträge mit bestimmtem Präfix aus einer Datei (Sicht auf cpaconfig.Config)
 def read_config_section(config_path, prefix):
-    section = {}
-    if os.path.exists(config_path):
-        with open(config_path, "r", encoding="utf-8") as f:
-            for line in f:
-                m = re.match(r'^(# )?(' + re.escape(prefix) + r'[A-Za-z0-9_]+)', line)
-                if m:
-                    key = m.group(2)
-                    section[key] = line.rstrip("\n")
-    return section
+    return cpaconfig.load(config_path).section(prefix)
 
-# Hilfsfunktion: Schreibe mehrere Konfig-Dicts in Reihenfolge in die Datei (Datei wird geleert)
+# Hilfsfunktion: Schreibe mehrere Abschnitte in Reihenfolge in die Datei (Datei wird ersetzt)
 def write_config_sections(config_path, *sections):
-    with open(config_path, "w", encoding="utf-8") as f:
-        for section in sections:
-            for line in section.values():
-                f.write(line + "\n")
+    cpaconfig.from_sections(*sections).write(config_path)
 
-# Hilfsfunktion: Ermittelt die gewählte Systemvariante aus dem variant_section-Dict
+# Hilfsfunktion: Ermittelt die gewählte Systemvariante aus dem variant_section-Abschnitt
 def get_selected_variant(variant_section):
     """Gibt die gewählte Systemvariante (ohne Prefix) zurück oder None."""
-    for key, val in variant_section.items():
-        if key.startswith("CONFIG_VARIANT_") and val.endswith("=y"):
-            return key[len("CONFIG_VARIANT_"):]
-    return None
+    return variant_section.selected()
 
 ## Merge-Logik: Nach jedem Menü die neuen Werte in die bestehende .config übernehmen
 # Die Funktion erhält die Liste der relevanten Präfixe beim Aufruf als Argument (z.B. ["CONFIG_SYSTEM_", "CONFIG_DEV_", ...]).
@@ -66,28 +57,14 @@ def merge_config(old_config, new_config, relevant_prefixes):
     Mische nur die Werte mit den relevanten Prefixen aus new_config in old_config.
     Die relevanten Präfixe werden beim Aufruf als drittes Argument übergeben und bestimmen, welche Konfigurationsoptionen übernommen werden.
     """
-    import re
-    def parse_config(path):
-        vals = {}
-        if os.path.exists(path):
-            with open(path) as f:
-                for line in f:
-                    m = re.match(r'^(# )?(CONFIG_[A-Za-z0-9_\-]+)', line)
-                    if m:
-                        key = m.group(2)
-                        vals[key] = line.rstrip("\n")
-        return vals
-    old_vals = parse_config(old_config)
-    new_vals = parse_config(new_config)
+    new_vals = cpaconfig.load(new_config)
     # Nur relevante Keys übernehmen, alle anderen entfernen
-    merged = {}
+    merged = cpaconfig.Config()
     for key, val in new_vals.items():
-        if any(key.startswith(prefix) for prefix in relevant_prefixes):
+        if key.startswith(tuple(relevant_prefixes)):
             merged[key] = val
     # Schreibe gemergte .config (nur relevante Keys, Reihenfolge wie new_config)
-    with open(old_config, "w") as f:
-        for key in merged:
-            f.write(merged[key] + "\n")
+    merged.write(old_config)
 
 ## Startet das externe menuconfig für eine bestimmte Kconfig-Datei und speichert die Auswahl in config_file.
 # Ablauf:
@@ -112,7 +89,8 @@ def run_menu(kconfig_file, config_file):
 
 ## Führt das externe Skript patch_mac.py aus, um Konfigurationswerte zu synchronisieren.
 # Ablauf:
-# - Ruft patch_mac.py mit <mode> <config> <systemvariante> auf.
+# - Läuft der Build-Daemon (cpa_daemon.py), wird die Anfrage direkt an ihn weitergeleitet.
+# - Sonst wird patch_mac.py mit <mode> <config> <systemvariante> aufgerufen.
 # - Im Modus "extract" werden Werte aus bios.mac ausgelesen und in die Konfiguration geschrieben.
 # - Im Modus "patch" werden Werte aus der Konfiguration zurück in bios.mac geschrieben.
 # - Bei Fehler wird eine Meldung ausgegeben und das Programm beendet.
@@ -121,6 +99,12 @@ def run_patch_mac(config_file, system_variant, mode):
     Führe patch_mac.py im Modus 'extract' oder 'patch' aus.
     Synchronisiert die Konfigurationswerte zwischen Datei und BIOS.
     """
+    rc = cpa_daemon.forward_patch_mac(mode, config_file, system_variant)
+    if rc is not None:
+        if rc != 0:
+            print(f"[FEHLER] patch_mac.py im Build-Daemon fehlgeschlagen (Exit-Code {rc})")
+            sys.exit(1)
+        return
     try:
         subprocess.run([
             sys.executable, os.path.join("config", "patch_mac.py"), mode, config_file, system_variant
@@ -129,16 +113,56 @@ def run_patch_mac(config_file, system_variant, mode):
         print(f"[FEHLER] patch_mac.py fehlgeschlagen: {e}")
         sys.exit(1)
 
-## Diese Funktion erzeugt die Datei Kconfig.variante dynamisch neu.
+## Manifest der Systemvarianten: Liste der src-Unterordner und Hash der jeweiligen about.txt.
+# Der Hash dieses Manifests steht als Kommentar im choice-Block von Kconfig.variante. Solange er
+# übereinstimmt, bleibt Kconfig.variante unverändert (kein neues Schreiben, kein geändertes Datum).
+VARIANT_MANIFEST_TAG = "# Manifest der Systemvarianten:"
+NO_ABOUT_HELPTEXT = "keine Hilfe vorhanden, da keine about.txt im Ordner gefunden"
+
+def read_variants(src_dir):
+    """
+    Liest die Systemvarianten aus den src-Unterordnern.
+    Returns:
+        tuple: (Liste von (Name, Hilfetext), Manifest-Hash als Hex-String)
+    """
+    variants = []
+    manifest = hashlib.sha1()
+    for entry in sorted(glob.glob(os.path.join(src_dir, "*"))):
+        if os.path.isdir(entry):
+            name = os.path.basename(entry)
+            about_path = os.path.join(entry, "about.txt")
+            if os.path.isfile(about_path):
+                with open(about_path, "rb") as af:
+                    about = af.read()
+                helptext = "\n".join(about.decode("utf-8").strip().splitlines())
+                # Hash über den Text mit einheitlichen Zeilenenden, damit ein Checkout mit CRLF
+                # (Windows, text=auto) dasselbe Manifest ergibt
+                about_hash = hashlib.sha1(helptext.encode("utf-8")).hexdigest()
+            else:
+                helptext = NO_ABOUT_HELPTEXT
+                about_hash = "-"
+            variants.append((name, helptext))
+            manifest.update(f"{name} {about_hash}\n".encode("utf-8"))
+    return variants, manifest.hexdigest()
+
+## Diese Funktion erzeugt den choice-Block der Datei Kconfig.variante, falls sich die Varianten geändert haben.
 # Ablauf:
 # - Liest die vorhandene Kconfig.variante ein und sucht den choice-Block.
-# - Ersetzt den choice-Block durch einen neuen Block, der alle Systemvarianten aus den src-Unterordnern auflistet.
+# - Bildet das Manifest aus den src-Unterordnern und den about.txt Dateien. Stimmt es mit dem im choice-Block
+#   hinterlegten Manifest überein, wird nichts geschrieben.
+# - Sonst wird der choice-Block durch einen neuen Block ersetzt, der alle Systemvarianten aus den src-Unterordnern auflistet.
 # - Für jede Variante wird der Name und (falls vorhanden) der Inhalt der about.txt als Hilfetext übernommen.
-# - So wird das Menü zur Systemauswahl automatisch an die vorhandenen Systemvarianten angepasst.
+# - Die Datei wird nur geschrieben, wenn sich ihr Inhalt tatsächlich ändert.
+# - So wird das Menü zur Systemauswahl automatisch an die vorhandenen Systemvarianten angepasst, ohne
+#   Kconfig.variante bei jedem Start neu zu schreiben.
 def generate_kconfig_variant(kconfig_path, src_dir):
-    """Erzeuge Kconfig.variante dynamisch aus sich selbst und src-Unterordnern."""
+    """
+    Erzeuge Kconfig.variante aus sich selbst und src-Unterordnern, falls nötig.
+    Returns:
+        bool: True, falls die Datei neu geschrieben wurde
+    """
     # Lese aktuelle Kconfig.variante ein
-    with open(kconfig_path, "r") as f:
+    with open(kconfig_path, "r", encoding="utf-8") as f:
         lines = f.readlines()
 
     # Finde choice-Block
@@ -154,21 +178,15 @@ def generate_kconfig_variant(kconfig_path, src_dir):
         raise RuntimeError("choice-Block in Kconfig.variante nicht gefunden!")
 
     # Systemvarianten aus src-Unterordnern
-    variants = []
-    for entry in sorted(glob.glob(os.path.join(src_dir, "*"))):
-        if os.path.isdir(entry):
-            name = os.path.basename(entry)
-            about_path = os.path.join(entry, "about.txt")
-            if os.path.isfile(about_path):
-                with open(about_path, "r") as af:
-                    helptext = af.read().strip()
-            else:
-                helptext = "keine Hilfe vorhanden, da keine about.txt im Ordner gefunden"
-            variants.append((name, helptext))
+    variants, manifest = read_variants(src_dir)
+    manifest_line = f"    {VARIANT_MANIFEST_TAG} {manifest}\n"
+    if manifest_line in lines[choice_start:choice_end]:
+        return False
 
     # Baue neuen choice-Block
     choice_lines = []
     choice_lines.append("choice\n")
+    choice_lines.append(manifest_line)
     choice_lines.append("    prompt \"Systemvariante\"\n")
     if variants:
         choice_lines.append(f"    default VARIANT_{variants[0][0]}\n")
@@ -183,11 +201,14 @@ def generate_kconfig_variant(kconfig_path, src_dir):
             choice_lines.append(f"        {line}\n")
     choice_lines.append("endchoice\n")
 
-    # Überschreibe Kconfig.variante direkt
-    with open(kconfig_path, "w") as f:
-        f.writelines(lines[:choice_start])
-        f.writelines(choice_lines)
-        f.writelines(lines[choice_end+1:])
+    new_lines = lines[:choice_start] + choice_lines + lines[choice_end+1:]
+    if new_lines == lines:
+        return False
+    # Überschreibe Kconfig.variante nur bei Änderungen
+    with open(kconfig_path, "w", encoding="utf-8") as f:
+        f.writelines(new_lines)
+    print(f"[INFO] {kconfig_path} neu erzeugt (Systemvarianten geändert)")
+    return True
 
 ## Diese Funktion steuert den gesamten Konfigurations-Workflow für das CPA-Projekt.
 # Ablauf:
@@ -204,13 +225,14 @@ def main():
     src_dir = "src"
     kconfig_path = os.path.join("config", "Kconfig.variante")
 
-    # Erzeuge dynamische Kconfig.variante direkt aus sich selbst
+    # Erzeuge dynamische Kconfig.variante direkt aus sich selbst (nur bei geänderten Varianten)
     generate_kconfig_variant(kconfig_path, src_dir)
 
 
     # Menü 1: vor Systemtyp-Auswahl: Sichere VARIANT- und BUILD-Einträge, leere .config und schreibe nur diese zurück
-    variant_section = read_config_section(config_file, "CONFIG_VARIANT_")
-    build_section = read_config_section(config_file, "CONFIG_BUILD_")
+    config = cpaconfig.load(config_file)
+    variant_section = config.section("CONFIG_VARIANT_")
+    build_section = config.section("CONFIG_BUILD_")
     write_config_sections(config_file, variant_section, build_section)
     run_menu(kconfig_path, config_file)
     # Nach Menü 1: Sichere VARIANT-Einträge, leere .config und schreibe VARIANT und BUILD zurück
@@ -249,18 +271,15 @@ def main():
     # Build-Target aus CONFIG_BUILD_* bestimmen und explizit an run_build übergeben
     # Build-Target direkt aus build_section bestimmen
     # überprüfen, ob CLEAN gesetzt ist
-    if build_section.get("CONFIG_BUILD_CLEAN") == "CONFIG_BUILD_CLEAN=y":
+    if build_section.config.is_enabled("CONFIG_BUILD_CLEAN"):
         cmd = ["make", "clean"]
         print(f"[DEBUG] Starte make clean")
         subprocess.run(cmd, check=True)
 
-    build_target = None
-    for key, val in build_section.items():
-        if key.startswith("CONFIG_BUILD_TARGET_") and val.endswith("=y"):
-            build_target = key[len("CONFIG_BUILD_TARGET_"):].lower()
-            print(f"[INFO] Gewähltes Build-Target: {build_target}")
-            break
+    build_target = build_section.config.section("CONFIG_BUILD_TARGET_").selected()
     if build_target:
+        build_target = build_target.lower()
+        print(f"[INFO] Gewähltes Build-Target: {build_target}")
         cmd = ["make", "config", build_target]
         print(f"[DEBUG] Starte make config {build_target}")
         subprocess.run(cmd, check=False)
@@ -268,4 +287,4 @@ def main():
         print("[INFO] Kein Build-Target in .config gefunden. Build wird übersprungen.")
 
 if __name__ == "__main__":
-    main()
+    cpaprofile.run_main(main)
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# Copyright (c) 2025 by olliy78
+# SPDX-License-Identifier: MIT
+"""
+Findet fast gleiche Images in einer Diskettensammlung (MinHash/LSH) und zeigt die Unterschiede
+
+Viele archivierte Images sind Varianten derselben Systemdiskette: anderes BIOS, eine geänderte
+Datei, Lesefehler in einzelnen Sektoren. Für jedes Image wird eine Merkmalsmenge gebildet:
+    - je belegtem Sektor (nicht nur E5h) Position und Inhalt
+    - je Datei (config/cpa_catalog.py) User, Name und SHA-1 des Inhalts
+Daraus entsteht eine MinHash-Signatur (--perms Werte, Multiply-Shift-Hashes auf 64 Bit, mit numpy
+vektorisiert), deren Übereinstimmung die Jaccard-Ähnlichkeit der Mengen schätzt. Die Signaturen werden
+in Bänder zerlegt (LSH, --bands); nur Images, die in mindestens einem Band gleich sind, werden
+verglichen. Paare ab --threshold werden zu Familien zusammengefasst (Union-Find), ohne alle Paare
+der Sammlung zu vergleichen.
+
+Je Familie wird die beste Lesung bestimmt: die wenigsten Sektoren nur aus 00h (so füllen
+Greaseweazle und cpa_flux nicht lesbare Sektoren; bei allen Formaten gleich gezählt, damit .img und
+HFE/SCP vergleichbar bleiben), dann die meisten Dateien. Für jedes weitere Image (mit --pairs für jedes Paar) werden die
+geänderten, fehlenden und zusätzlichen Dateien und die abweichenden Spuren ausgegeben.
+
+Verwendung:
+    python cpa_similar.py [VERZEICHNIS|IMAGE ...] [--threshold J] [--perms N] [--bands B] [-j N] [--pairs]
+
+Beispiele:
+    python config/cpa_similar.py Disketten
+    python config/cpa_similar.py Disketten/archiv --threshold 0.3 --pairs
+"""
+import os
+import sys
+import random
+import hashlib
+import argparse
+import concurrent.futures
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPT_DIR)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import cpa_detect
+import cpa_formats
+import cpa_store
+from cpa_catalog import find_images, catalog_files
+
+DEFAULT_ROOTS = ["Disketten"]
+DEFAULT_PERMS = 128
+DEFAULT_BANDS = 32
+DEFAULT_THRESHOLD = 0.5
+MASK64 = (1 << 64) - 1
+# Fester Startwert, damit Signaturen verschiedener Läufe vergleichbar sind
+SEED = 0xC9A
+# Abweichende Spuren/Dateien, die je Paar höchstens ausgegeben werden
+MAX_LISTED = 12
+
+
+def hash_functions(perms):
+    """Koeffizienten (a ungerade, b) der Multiply-Shift-Hashes."""
+    rng = random.Random(SEED)
+    return [(rng.getrandbits(64) | 1, rng.getrandbits(64)) for _ in range(perms)]
+
+
+def token(*parts):
+    """64-Bit-Hash eines Merkmals."""
+    text = "\0".join(str(p) for p in parts).encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(text, digest_size=8).digest(), "little")
+
+
+def minhash(tokens, functions):
+    """MinHash-Signatur einer Menge von 64-Bit-Werten (obere 32 Bit von a * x + b modulo 2^64)."""
+    if not tokens:
+        return [0] * len(functions)
+    if np is not None:
+        x = np.fromiter(tokens, dtype=np.uint64, count=len(tokens))
+        a = np.array([f[0] for f in functions], dtype=np.uint64)[:, None]
+        b = np.array([f[1] for f in functions], dtype=np.uint64)[:, None]
+        with np.errstate(over="ignore"):
+            values = (a * x + b) >> np.uint64(32)
+        return values.min(axis=1).tolist()
+    return [min(((a * x + b) & MASK64) >> 32 for x in tokens) for a, b in functions]
+
+
+def load_image(path):
+    """Imagedaten und erkannter Formatname einer Datei (.img, .cpz, .hfe, .scp; Name leer, wenn nicht erkannt)."""
+    registry = cpa_formats.load()
+    if path.lower().endswith((".hfe", ".scp")):
+        ranking, images = cpa_detect.detect_flux(path)
+        try:
+            name = cpa_detect.choose_format(ranking, registry)
+        except ValueError:
+            # Ohne eindeutiges Format trotzdem die am besten passende Dekodierung vergleichen
+            return (bytes(images[ranking[0][1]][0]) if ranking else b""), ""
+        return bytes(images[name][0]), name
+    with cpa_store.open_image(path) as data:
+        ranking = cpa_detect.rank_formats(data, registry) if len(data) else []
+        try:
+            name = cpa_detect.choose_format(ranking, registry, len(data))
+        except ValueError:
+            name = ""
+        return bytes(data), name
+
+
+def image_features(path, functions):
+    """
+    Merkmale und Signatur eines Images (läuft in einem eigenen Prozess).
+    Returns:
+        dict: path, format, size, sha1, tracks (SHA-1 je Spur), files ((User, Name) -> SHA-1),
+              bad (Sektoren nur aus 00h), signature, error
+    """
+    result = {"path": path, "format": "", "size": 0, "sha1": "", "tracks": [], "files": {}, "bad": 0,
+              "signature": None, "error": None}
+    try:
+        data, fmt_name = load_image(path)
+    except (OSError, ValueError, KeyError) as e:
+        result["error"] = str(e)
+        return result
+    result.update(format=fmt_name, size=len(data), sha1=hashlib.sha1(data).hexdigest())
+    tokens = set()
+    pos = 0
+    for n, (track_len, sector_len) in enumerate(cpa_store.geometry(len(data), fmt_name)):
+        result["tracks"].append(hashlib.sha1(data[pos:pos + track_len]).hexdigest())
+        for i, length in enumerate(cpa_store.sector_lengths(track_len, sector_len)):
+            sector = data[pos:pos + length]
+            pos += length
+            if sector.count(cpa_store.FILL) == length:
+                continue
+            if sector.count(0) == length:
+                result["bad"] += 1
+            tokens.add(token("s", n, i, hashlib.sha1(sector).hexdigest()))
+    if fmt_name:
+        try:
+            dd, boot = cpa_formats.load().image_diskdef(fmt_name, len(data))
+            for user, name, _, _, sha1 in catalog_files(data[boot:], dd):
+                result["files"][(user, name)] = sha1
+                tokens.add(token("f", user, name, sha1))
+        except (KeyError, ValueError, IndexError) as e:
+            result["error"] = f"Verzeichnis nicht lesbar ({e})"
+    result["signature"] = minhash(tokens, functions)
+    return result
+
+
+def similarity(a, b):
+    """Geschätzte Jaccard-Ähnlichkeit zweier Signaturen."""
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+def candidate_pairs(signatures, bands):
+    """Paare (i, j), die in mindestens einem Band dieselben Werte haben (LSH)."""
+    rows = len(signatures[0]) // bands
+    pairs = set()
+    for band in range(bands):
+        buckets = {}
+        for n, sig in enumerate(signatures):
+            buckets.setdefault(tuple(sig[band * rows:(band + 1) * rows]), []).append(n)
+        for members in buckets.values():
+            for i in range(len(members)):
+                for j in range(i + 1, len(members)):
+                    pairs.add((members[i], members[j]))
+    return pairs
+
+
+def families(count, edges):
+    """Zusammenhängende Gruppen (Union-Find) mit mehr als einem Image, größte zuerst."""
+    parent = list(range(count))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in edges:
+        parent[find(i)] = find(j)
+    groups = {}
+    for i in range(count):
+        groups.setdefault(find(i), []).append(i)
+    return sorted((g for g in groups.values() if len(g) > 1), key=lambda g: (-len(g), g))
+
+
+def best_read(images, members):
+    """Beste Lesung einer Familie: wenigste 00h-Sektoren, dann meiste Dateien."""
+    return min(members, key=lambda n: (images[n]["bad"], -len(images[n]["files"]), images[n]["path"]))
+
+
+def track_name(fmt_name, size, n):
+    """Spurbezeichnung Zylinder.Kopf, wenn der Spuraufbau bekannt ist, sonst die Nummer."""
+    fmt = cpa_formats.load().gw.get(fmt_name)
+    if fmt is not None and fmt.size == size:
+        c, h = fmt.tracks[n]
+        return f"{c}.{h}"
+    return str(n)
+
+
+def limited(items):
+    items = list(items)
+    return ", ".join(items[:MAX_LISTED]) + (f" (+{len(items) - MAX_LISTED})" if len(items) > MAX_LISTED else "")
+
+
+def differences(a, b):
+    """
+    Unterschiede zwischen zwei Images.
+    Returns:
+        list: Textzeilen (leer, wenn die Images gleich sind)
+    """
+    if a["sha1"] == b["sha1"]:
+        return ["identisch"]
+    lines = []
+    names = lambda keys: (f"{user}:{name}" if user else name for user, name in sorted(keys))
+    changed = [k for k in a["files"].keys() & b["files"].keys() if a["files"][k] != b["files"][k]]
+    if changed:
+        lines.append(f"geänderte Dateien: {limited(names(changed))}")
+    if a["files"].keys() - b["files"].keys():
+        lines.append(f"nur in {os.path.basename(a['path'])}: {limited(names(a['files'].keys() - b['files'].keys()))}")
+    if b["files"].keys() - a["files"].keys():
+        lines.append(f"nur in {os.path.basename(b['path'])}: {limited(names(b['files'].keys() - a['files'].keys()))}")
+    if a["size"] == b["size"] and len(a["tracks"]) == len(b["tracks"]):
+        tracks = [n for n, (x, y) in enumerate(zip(a["tracks"], b["tracks"])) if x != y]
+        if tracks:
+            lines.append(f"abweichende Spuren ({len(tracks)}): "
+                         f"{limited(track_name(a['format'], a['size'], n) for n in tracks)}")
+    else:
+        lines.append(f"unterschiedliche Größe ({a['size']} / {b['size']} Bytes)")
+    if a["bad"] != b["bad"]:
+        lines.append(f"Sektoren nur 00h: {a['bad']} / {b['bad']}")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Findet fast gleiche Images (MinHash/LSH) und zeigt die Unterschiede")
+    parser.add_argument("roots", nargs="*", default=DEFAULT_ROOTS, help="Verzeichnisse oder Images (Standard: Disketten)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Mindestähnlichkeit für eine Familie (Standard: 0.5)")
+    parser.add_argument("--perms", type=int, default=DEFAULT_PERMS, help="Länge der Signatur (Standard: 128)")
+    parser.add_argument("--bands", type=int, default=DEFAULT_BANDS, help="Anzahl LSH-Bänder (Standard: 32)")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Anzahl paralleler Prozesse (Standard: Anzahl CPUs)")
+    parser.add_argument("--pairs", action="store_true", help="alle Paare einer Familie vergleichen, nicht nur mit der besten Lesung")
+    args = parser.parse_args()
+    if args.perms % args.bands:
+        parser.error("--perms muss ein Vielfaches von --bands sein")
+
+    functions = hash_functions(args.perms)
+    paths = find_images(args.roots)
+    if args.jobs == 1 or len(paths) < 2:
+        results = [image_features(path, functions) for path in paths]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            results = list(pool.map(image_features, paths, [functions] * len(paths)))
+    images = []
+    for result in results:
+        if result["signature"] is None:
+            print(f"[WARN] {result['path']}: {result['error']}")
+            continue
+        if result["error"]:
+            print(f"[WARN] {result['path']}: {result['error']}")
+        images.append(result)
+    if not images:
+        print("[FEHLER] keine Images gefunden")
+        sys.exit(1)
+
+    signatures = [img["signature"] for img in images]
+    candidates = candidate_pairs(signatures, args.bands)
+    edges = [(i, j) for i, j in candidates if similarity(signatures[i], signatures[j]) >= args.threshold]
+    groups = families(len(images), edges)
+    print(f"[INFO] {len(images)} Images, {len(candidates)} Kandidatenpaare (statt {len(images) * (len(images) - 1) // 2}), "
+          f"{len(groups)} Familien")
+
+    for number, members in enumerate(groups, 1):
+        best = best_read(images, members)
+        ref = images[best]
+        print(f"\nFamilie {number} ({len(members)} Images, Format {ref['format'] or '-'})")
+        print(f"  beste Lesung: {ref['path']} ({ref['bad']} Sektoren nur 00h, {len(ref['files'])} Dateien)")
+        if args.pairs:
+            pairs = [(i, j) for n, i in enumerate(members) for j in members[n + 1:]]
+        else:
+            pairs = [(best, n) for n in members if n != best]
+        for i, j in pairs:
+            a, b = images[i], images[j]
+            print(f"  {a['path']} <-> {b['path']}  ~{similarity(a['signature'], b['signature']):.2f}")
+            for line in differences(a, b):
+                print(f"      {line}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+# Copyright (c) 2025 by olliy78
+# SPDX-License-Identifier: MIT
+"""
+Kompakter Speicher für Diskettenimages (.cpz): nur belegte Sektoren, spurweise komprimiert
+
+Ein frisch erzeugtes oder archiviertes CP/A-Image besteht großteils aus E5h. Der Container legt je
+Spur nur die Sektoren ab, die nicht vollständig aus E5h bestehen, und komprimiert sie spurweise mit
+zlib oder lzma. Ein Index am Dateianfang hält für jede Spur Position, Länge, Verfahren und eine
+Bitmaske der abgelegten Sektoren; beim Lesen wird nur die Spur entpackt, die gebraucht wird.
+
+Aufbau (little endian):
+    Kopf:   "CPAZ", Version, Füllbyte, Länge des Formatnamens, Imagegröße, Anzahl Spuren,
+            SHA-1 des ganzen Images, Formatname (z.B. cpa780)
+    Index:  je Spur Position, gepackte Länge, Spurlänge, Sektorlänge, Verfahren, Länge der Maske,
+            Maske (Bit i gesetzt = Sektor i abgelegt)
+    Daten:  je Spur die gepackten Sektoren
+Die Spuraufteilung stammt aus cpaFormates.cfg, wenn das Format dort steht und die Größe passt (cpa780:
+Bootspuren mit 128-Byte-Sektoren, sonst 1024), sonst werden Spuren zu 5120 Bytes in 128-Byte-Sektoren
+geteilt. Beim Entpacken wird die SHA-1 geprüft; das Ergebnis ist byte-gleich mit dem Original.
+
+HFE- und SCP-Dateien werden beim Einpacken dekodiert (config/cpa_flux.py, benötigt numpy), abgelegt
+wird das Image. Beim Auspacken können HFE/SCP mit dem nativen Kodierer neu erzeugt werden; sie
+enthalten dieselben Sektoren, aber nicht die ursprünglichen Flussdaten.
+
+extract_files.py und cpa_detect.py lesen .cpz-Dateien direkt (open_image).
+
+Verwendung:
+    python cpa_store.py pack <image> [<image> ...] [-o DATEI] [--format FORMAT] [--method zlib|lzma|auto]
+    python cpa_store.py expand <cpz> [-o DATEI] [--hfe DATEI] [--scp DATEI]
+    python cpa_store.py info <cpz> [<cpz> ...]
+
+Beispiele:
+    python config/cpa_store.py pack Disketten/*.img --method auto
+    python config/cpa_store.py expand Disketten/archiv01.cpz -o archiv01.img
+    python config/cpa_store.py expand build/cpadisk.cpz --hfe build/cpadisk.hfe
+"""
+import os
+import sys
+import lzma
+import zlib
+import mmap
+import struct
+import bisect
+import contextlib
+import hashlib
+import argparse
+from collections import OrderedDict
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPT_DIR)
+
+import cpa_formats
+
+MAGIC = b"CPAZ"
+VERSION = 1
+EXTENSION = ".cpz"
+FILL = 0xE5
+HEADER = struct.Struct("<4sBBBxII20s")
+TRACK_ENTRY = struct.Struct("<IIIHBB")
+# Verfahren je Spur
+RAW, ZLIB, LZMA = 0, 1, 2
+# Spuraufteilung für Images ohne passendes Format in cpaFormates.cfg
+DEFAULT_TRACK = 5120
+DEFAULT_SECTOR = 128
+# Anzahl entpackter Spuren, die beim wahlfreien Lesen vorgehalten werden
+TRACK_CACHE = 16
+
+
+def is_store(path):
+    """True, wenn die Datei ein .cpz-Container ist (am Inhalt erkannt)."""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def geometry(size, fmt_name=None, gw_formats=cpa_formats.GW_FORMATS):
+    """Spuraufteilung als Liste (Spurlänge, Sektorlänge) für ein Image der Größe size."""
+    fmt = cpa_formats.load(gw_formats).gw.get(fmt_name) if fmt_name else None
+    if fmt is not None and fmt.size == size:
+        return [(fmt.track_size(c, h), fmt.params(c, h)["bps"]) for c, h in fmt.tracks]
+    full, rest = divmod(size, DEFAULT_TRACK)
+    return [(DEFAULT_TRACK, DEFAULT_SECTOR)] * full + ([(rest, DEFAULT_SECTOR)] if rest else [])
+
+
+def sector_lengths(track_len, sector_len):
+    return [min(sector_len, track_len - pos) for pos in range(0, track_len, sector_len)]
+
+
+def compress(raw, method):
+    """Gepackte Daten und Verfahren; ungepackt, wenn das Packen nichts bringt."""
+    candidates = []
+    if method in ("zlib", "auto"):
+        candidates.append((zlib.compress(raw, 9), ZLIB))
+    if method in ("lzma", "auto"):
+        candidates.append((lzma.compress(raw, preset=9), LZMA))
+    packed, used = min(candidates, key=lambda item: len(item[0]))
+    return (packed, used) if len(packed) < len(raw) else (raw, RAW)
+
+
+def decompress(packed, method):
+    if method == ZLIB:
+        return zlib.decompress(packed)
+    if method == LZMA:
+        return lzma.decompress(packed)
+    return packed
+
+
+def pack_data(data, fmt_name="", method="zlib"):
+    """
+    Packt Imagedaten in einen Container.
+    Returns:
+        bytes: Inhalt der .cpz-Datei
+    """
+    name = fmt_name.encode("ascii")
+    tracks = geometry(len(data), fmt_name)
+    index = []
+    payloads = []
+    pos = 0
+    for track_len, sector_len in tracks:
+        stored = []
+        mask = bytearray(-(-len(sector_lengths(track_len, sector_len)) // 8))
+        for i, length in enumerate(sector_lengths(track_len, sector_len)):
+            sector = data[pos:pos + length]
+            pos += length
+            if sector.count(FILL) != length:
+                mask[i // 8] |= 1 << (i % 8)
+                stored.append(sector)
+        packed, used = compress(b"".join(stored), method) if stored else (b"", RAW)
+        index.append((track_len, sector_len, used, bytes(mask)))
+        payloads.append(packed)
+    header = HEADER.pack(MAGIC, VERSION, FILL, len(name), len(data), len(tracks),
+                         hashlib.sha1(data).digest()) + name
+    offset = len(header) + sum(TRACK_ENTRY.size + len(mask) for *_, mask in index)
+    out = [header]
+    for (track_len, sector_len, used, mask), packed in zip(index, payloads):
+        out.append(TRACK_ENTRY.pack(offset, len(packed), track_len, sector_len, used, len(mask)) + mask)
+        offset += len(packed)
+    return b"".join(out + payloads)
+
+
+class StoredImage:
+    """
+    Wahlfreier Lesezugriff auf einen .cpz-Container.
+
+    Verhält sich beim Lesen wie die Imagedaten (len(), image[a:b], image[i]); entpackt wird nur die
+    benötigte Spur, die zuletzt benutzten werden vorgehalten.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            head = self._file.read(HEADER.size)
+            if len(head) < HEADER.size:
+                raise ValueError(f"{path}: kein .cpz-Container")
+            magic, version, self.fill, name_len, self.size, count, self.sha1 = HEADER.unpack(head)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path}: kein .cpz-Container (Version {version})")
+            self.format = self._file.read(name_len).decode("ascii")
+            self.tracks = []
+            self.starts = []
+            pos = 0
+            for _ in range(count):
+                offset, packed_len, track_len, sector_len, method, mask_len = \
+                    TRACK_ENTRY.unpack(self._file.read(TRACK_ENTRY.size))
+                mask = self._file.read(mask_len)
+                self.tracks.append((offset, packed_len, track_len, sector_len, method, mask))
+                self.starts.append(pos)
+                pos += track_len
+        except (struct.error, UnicodeDecodeError):
+            self._file.close()
+            raise ValueError(f"{path}: Index beschädigt")
+        except Exception:
+            self._file.close()
+            raise
+        if pos != self.size:
+            self._file.close()
+            raise ValueError(f"{path}: Spuren ergeben {pos} statt {self.size} Bytes")
+        self._cache = OrderedDict()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.size
+
+    def track(self, n):
+        """Inhalt der Spur n (entpackt, mit Füllbytes für nicht abgelegte Sektoren)."""
+        if n in self._cache:
+            self._cache.move_to_end(n)
+            return self._cache[n]
+        offset, packed_len, track_len, sector_len, method, mask = self.tracks[n]
+        stored = b""
+        if packed_len:
+            self._file.seek(offset)
+            stored = decompress(self._file.read(packed_len), method)
+        parts = []
+        pos = 0
+        for i, length in enumerate(sector_lengths(track_len, sector_len)):
+            if mask[i // 8] >> (i % 8) & 1:
+                parts.append(stored[pos:pos + length])
+                pos += length
+            else:
+                parts.append(bytes([self.fill]) * length)
+        data = b"".join(parts)
+        if len(data) != track_len or pos != len(stored):
+            raise ValueError(f"{self.path}: Spur {n} beschädigt")
+        self._cache[n] = data
+        if len(self._cache) > TRACK_CACHE:
+            self._cache.popitem(last=False)
+        return data
+
+    def read(self, start, length):
+        """length Bytes ab Position start (am Imageende gekürzt)."""
+        end = min(start + length, self.size)
+        parts = []
+        n = bisect.bisect_right(self.starts, start) - 1
+        while start < end:
+            first = self.starts[n]
+            data = self.track(n)
+            parts.append(data[start - first:end - first])
+            start = first + len(data)
+            n += 1
+        return b"".join(parts)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.size)
+            data = self.read(start, max(stop - start, 0))
+            return data if step == 1 else data[::step]
+        if key < 0:
+            key += self.size
+        if not 0 <= key < self.size:
+            raise IndexError("Position außerhalb des Images")
+        return self.read(key, 1)[0]
+
+    def read_all(self, verify=True):
+        """Das ganze Image; mit verify wird die SHA-1 aus dem Kopf geprüft."""
+        data = b"".join(self.track(n) for n in range(len(self.tracks)))
+        if verify and hashlib.sha1(data).digest() != self.sha1:
+            raise ValueError(f"{self.path}: Prüfsumme stimmt nicht, Container beschädigt")
+        return data
+
+    def stored_sectors(self):
+        """(abgelegte Sektoren, alle Sektoren)."""
+        stored = total = 0
+        for _, _, track_len, sector_len, _, mask in self.tracks:
+            total += len(sector_lengths(track_len, sector_len))
+            stored += sum(bin(b).count("1") for b in mask)
+        return stored, total
+
+
+@contextlib.contextmanager
+def open_image(path):
+    """
+    Öffnet eine Image-Datei zum Lesen: .cpz als StoredImage (mit .format), sonst per mmap.
+    Beispiel: with open_image(path) as data: rank_formats(data, registry)
+    """
+    if is_store(path):
+        with StoredImage(path) as store:
+            yield store
+        return
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield data
+
+
+def read_source(path):
+    """
+    Imagedaten und Formatname einer Eingabedatei für pack (.img, .cpz, .hfe/.scp dekodiert).
+    Returns:
+        tuple: (bytes, Formatname oder "")
+    """
+    if path.lower().endswith((".hfe", ".scp")):
+        import cpa_detect
+        import cpa_flux
+        ranking, images = cpa_detect.detect_flux(path)
+        name = cpa_detect.choose_format(ranking, cpa_formats.load())
+        data, missing = images[name]
+        cpa_flux.report_missing(missing)
+        print(f"[WARN] {path}: Flussdaten werden nicht abgelegt, nur die dekodierten Sektoren")
+        return bytes(data), name
+    if is_store(path):
+        with StoredImage(path) as store:
+            return store.read_all(), store.format
+    with open(path, "rb") as f:
+        return f.read(), ""
+
+
+def detect_format(data):
+    """Formatname nach config/cpa_detect.py (leer, wenn nichts eindeutig passt)."""
+    import cpa_detect
+    registry = cpa_formats.load()
+    try:
+        return cpa_detect.choose_format(cpa_detect.rank_formats(data, registry), registry, len(data))
+    except ValueError:
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kompakter Speicher für Diskettenimages (.cpz)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    pk = sub.add_parser("pack", help="Images in .cpz-Container packen")
+    pk.add_argument("images", nargs="+", help="Image-Dateien (.img, .hfe, .scp)")
+    pk.add_argument("-o", "--output", help="Ausgabedatei (nur bei einem Image, Standard: <image>.cpz)")
+    pk.add_argument("--format", help="Formatname (Standard: erkennen, config/cpa_detect.py)")
+    pk.add_argument("--method", choices=("zlib", "lzma", "auto"), default="zlib",
+                    help="Kompression je Spur, auto = die kleinere (Standard: zlib)")
+    ex = sub.add_parser("expand", help=".cpz wieder als Image ausgeben")
+    ex.add_argument("store", help=".cpz-Datei")
+    ex.add_argument("-o", "--output", help="Ziel-Image (Standard: <name>.img)")
+    ex.add_argument("--hfe", help="zusätzlich HFE-Datei schreiben (benötigt numpy)")
+    ex.add_argument("--scp", help="zusätzlich SCP-Datei schreiben (benötigt numpy)")
+    inf = sub.add_parser("info", help="Inhalt von .cpz-Dateien anzeigen")
+    inf.add_argument("stores", nargs="+", help=".cpz-Dateien")
+    args = parser.parse_args()
+
+    failed = False
+    if args.command == "pack":
+        if args.output and len(args.images) > 1:
+            parser.error("-o nur bei einem Image")
+        for path in args.images:
+            try:
+                data, fmt_name = read_source(path)
+                fmt_name = args.format or fmt_name or detect_format(data)
+                packed = pack_data(data, fmt_name, args.method)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"[FEHLER] {path}: {e}")
+                failed = True
+                continue
+            out = args.output or os.path.splitext(path)[0] + EXTENSION
+            with open(out, "wb") as f:
+                f.write(packed)
+            print(f"[DONE] {out}: {len(data)} -> {len(packed)} Bytes "
+                  f"({100 * len(packed) / max(len(data), 1):.1f} %, Format: {fmt_name or '-'})")
+    elif args.command == "expand":
+        try:
+            with StoredImage(args.store) as store:
+                data, fmt_name = store.read_all(), store.format
+        except (OSError, ValueError) as e:
+            print(f"[FEHLER] {e}")
+            sys.exit(1)
+        out = args.output or os.path.splitext(args.store)[0] + ".img"
+        with open(out, "wb") as f:
+            f.write(data)
+        print(f"[DONE] Image erstellt: {out}")
+        if args.hfe or args.scp:
+            import cpa_flux
+            cpa_flux.require_numpy()
+            try:
+                cyls, heads, tracks = cpa_flux.encode_data(data, cpa_formats.load().gw_format(fmt_name))
+            except (KeyError, ValueError) as e:
+                print(f"[FEHLER] {e}")
+                sys.exit(1)
+            if args.hfe:
+                cpa_flux.write_hfe(args.hfe, cyls, heads, tracks)
+                print(f"[DONE] HFE-Image erstellt: {args.hfe}")
+            if args.scp:
+                cpa_flux.write_scp(args.scp, cyls, heads, tracks)
+                print(f"[DONE] SCP-Image erstellt: {args.scp}")
+    else:
+        for path in args.stores:
+            try:
+                with StoredImage(path) as store:
+                    stored, total = store.stored_sectors()
+                    packed = os.path.getsize(path)
+                    print(f"{path}: Format {store.format or '-'}, {store.size} Bytes, {len(store.tracks)} Spuren, "
+                          f"{stored}/{total} Sektoren abgelegt, {packed} Bytes "
+                          f"({100 * packed / max(store.size, 1):.1f} %)")
+            except (OSError, ValueError) as e:
+                print(f"[FEHLER] {e}")
+                failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
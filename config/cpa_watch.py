@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# Copyright (c) 2025 by olliy78
+# SPDX-License-Identifier: MIT
+"""
+Watch-Modus: baut bei Dateiänderungen automatisch und nur so weit wie nötig neu
+
+Überwacht (durch regelmäßiges Abfragen, Änderungen werden am Inhalt erkannt):
+- .config und config/<variante>/Kconfig.system   -> *.mac neu patchen (patch_mac), danach wie unten
+- src/*.mac, src/<variante>/*.mac, prebuilt/<variante>/*
+                                                  -> make config <target> (assemblieren, Image neu)
+- additions/*, additions/<variante>/*             -> nur die geänderten Dateien im vorhandenen
+                                                     Diskettenimage ersetzen (kein neues Assemblieren)
+                                                     und die Dateien wieder nach --layout/--trace
+                                                     anordnen (cpa_layout.py)
+- Prioritätsliste und Zugriffsfolge (--layout/--trace) -> make config <target> (Image neu)
+
+--layout und --trace entsprechen DISK_LAYOUT und LAYOUT_TRACE im Makefile ('make watch' gibt sie
+weiter, ein leeres --layout schaltet die Anordnung ab) und werden auch an make weitergereicht, damit
+das Image aus dem Watch-Modus dem von 'make diskimage' gleicht.
+
+Mehrere Änderungen kurz hintereinander (z.B. beim Speichern mehrerer Dateien) werden zusammengefasst
+(Entprellen). Die Systemvariante wird bei jedem Durchlauf aus .config bestimmt wie im Makefile.
+Läuft der Build-Daemon (cpa_daemon.py), wird patch_mac über ihn ausgeführt.
+
+Verwendung:
+    python cpa_watch.py [target] [--interval SEK] [--debounce SEK] [--layout DATEI] [--trace DATEI]
+
+    target       os, diskimage (Standard), diskimagehfe oder diskimagescp
+
+Beispiele:
+    python config/cpa_watch.py
+    make watch WATCH_TARGET=diskimagehfe
+"""
+import os
+import sys
+import glob
+import time
+import hashlib
+import argparse
+import subprocess
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPT_DIR)
+
+import cpaconfig
+import cpa_daemon
+import patch_mac
+import cpa_formats
+import cpa_layout
+from cpa_diskimage import remove_cpm_files
+
+CONFIG_FILE = ".config"
+DEFAULT_SYSTEMVAR = "pc_1715"
+BUILD_DIR = "build"
+FINAL_IMAGE = os.path.join(BUILD_DIR, "cpadisk.img")
+TMP_IMAGE = os.path.join(BUILD_DIR, "cpadisk.img.tmp")
+ADDITIONS_DIR = "additions"
+IMAGE_TARGETS = ("diskimage", "diskimagehfe", "diskimagescp")
+CPMCP = os.path.join("tools", "cpmcp" if os.name != "nt" else "cpmcp.exe")
+
+
+def current_variant():
+    """Systemvariante aus .config (wie das Makefile: erster CONFIG_VARIANT_*=y, klein geschrieben)."""
+    variant = cpaconfig.load(CONFIG_FILE).section("CONFIG_VARIANT_").selected()
+    return variant.lower() if variant else DEFAULT_SYSTEMVAR
+
+
+def image_format(config, variant):
+    """
+    Diskdef und Länge des vorangestellten Bootsektors im fertigen Image (wie das Makefile).
+    Returns:
+        tuple: (diskdef für cpmtools, Anzahl Bytes vor dem cpmtools-Image)
+    """
+    if config.is_enabled("CONFIG_BUILD_DISKTYPE_800K") and not config.is_enabled("CONFIG_BUILD_DISKTYPE_780K"):
+        fmt = "cpa800"
+    else:
+        fmt = "cpa780"
+    dd, boot = cpa_formats.load().build_diskdef(fmt)
+    if not boot:
+        return dd.name, 0
+    bootsector = os.path.join("prebuilt", variant, "bootsec.bin")
+    return dd.name, os.path.getsize(bootsector) if os.path.exists(bootsector) else 0
+
+
+def watched_files(variant, with_additions, layout_files=()):
+    """
+    Alle überwachten Dateien, gruppiert nach der Stufe, die bei einer Änderung neu laufen muss.
+    Returns:
+        dict: Pfad -> "config" | "source" | "additions"
+    """
+    files = {CONFIG_FILE: "config", os.path.join("config", variant, "Kconfig.system"): "config"}
+    for path in layout_files:
+        files[path] = "source"
+    for path in glob.glob(os.path.join("src", "*.mac")) + glob.glob(os.path.join("src", variant, "*.mac")):
+        files[path] = "source"
+    for path in glob.glob(os.path.join("prebuilt", variant, "*")):
+        if os.path.isfile(path):
+            files[path] = "source"
+    if with_additions:
+        for path in glob.glob(os.path.join(ADDITIONS_DIR, "*")) + glob.glob(os.path.join(ADDITIONS_DIR, variant, "*")):
+            if os.path.isfile(path):
+                files[path] = "additions"
+    return files
+
+
+class Watcher:
+    """
+    Merkt sich Datum/Größe und Inhalts-Hash aller überwachten Dateien. Ein Hash wird nur neu berechnet,
+    wenn sich Datum oder Größe geändert hat; nur geänderter Inhalt gilt als Änderung.
+    """
+
+    def __init__(self, with_additions, layout_files=()):
+        self.with_additions = with_additions
+        self.layout_files = layout_files
+        self.state = {}
+        self.scan()
+
+    def scan(self):
+        """
+        Liest den aktuellen Zustand ein.
+        Returns:
+            dict: geänderte, neue oder gelöschte Pfade -> Stufe
+        """
+        variant = current_variant() if os.path.exists(CONFIG_FILE) else DEFAULT_SYSTEMVAR
+        files = watched_files(variant, self.with_additions, self.layout_files)
+        changed = {}
+        new_state = {}
+        for path, stage in files.items():
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            stat_key = (st.st_mtime_ns, st.st_size)
+            old = self.state.get(path)
+            if old and old[0] == stat_key:
+                new_state[path] = old
+                continue
+            with open(path, "rb") as f:
+                digest = hashlib.sha1(f.read()).hexdigest()
+            new_state[path] = (stat_key, digest, stage)
+            if old is None or old[1] != digest:
+                changed[path] = stage
+        for path, old in self.state.items():
+            if path not in new_state:
+                changed[path] = old[2]
+        self.state = new_state
+        return changed
+
+
+def run_make(target, make_vars=()):
+    """Baut das Target wie von Hand mit 'make config <target>' (make_vars: z.B. DISK_LAYOUT=...)."""
+    print(f"[INFO] make config {target}")
+    result = subprocess.run(["make", "config", target] + list(make_vars))
+    if result.returncode != 0:
+        print(f"[FEHLER] make config {target} fehlgeschlagen (Exit-Code {result.returncode})")
+        return False
+    return True
+
+
+def run_patch(variant):
+    """Patcht die *.mac Dateien gemäß .config (über den Build-Daemon, falls er läuft)."""
+    print(f"[INFO] .config geändert, patche *.mac ({variant})")
+    rc = cpa_daemon.forward_patch_mac("patch", CONFIG_FILE, variant)
+    if rc is None:
+        try:
+            patch_mac.run("patch", CONFIG_FILE, variant)
+            rc = 0
+        except SystemExit as e:
+            rc = e.code if isinstance(e.code, int) else 1
+    if rc != 0:
+        print(f"[FEHLER] patch_mac.py fehlgeschlagen (Exit-Code {rc})")
+        return False
+    return True
+
+
+def effective_additions(variant):
+    """Dateiname -> Pfad der Zusatzdateien; wie im Makefile gewinnt additions/<variante> vor additions/."""
+    files = {}
+    for path in sorted(glob.glob(os.path.join(ADDITIONS_DIR, "*"))):
+        if os.path.isfile(path):
+            files[os.path.basename(path)] = path
+    for path in sorted(glob.glob(os.path.join(ADDITIONS_DIR, variant, "*"))):
+        if os.path.isfile(path):
+            files[os.path.basename(path)] = path
+    return files
+
+
+def update_additions(variant, changed_paths, hot):
+    """
+    Ersetzt im vorhandenen build/cpadisk.img nur die geänderten Zusatzdateien und ordnet die Dateien
+    danach wieder nach hot an (cpa_layout.hot_files, leer: keine Anordnung).
+    Returns:
+        bool: False, wenn das Image neu gebaut werden muss (fehlt oder Fehler beim Ersetzen)
+    """
+    if not os.path.exists(FINAL_IMAGE):
+        return False
+    diskdef, prefix = image_format(cpaconfig.load(CONFIG_FILE), variant)
+    current = effective_additions(variant)
+    names = {os.path.basename(p) for p in changed_paths}
+    with open(FINAL_IMAGE, "rb") as f:
+        data = f.read()
+    with open(TMP_IMAGE, "wb") as f:
+        f.write(data[prefix:])
+    try:
+        remove_cpm_files(TMP_IMAGE, diskdef, names)
+        for name in sorted(names):
+            if name in current:
+                print(f"  [ADD] {name}")
+                subprocess.run([CPMCP, "-f", diskdef, TMP_IMAGE, current[name], f"0:{name}"], check=True)
+            else:
+                print(f"  [DEL] {name}")
+        with open(TMP_IMAGE, "rb") as f:
+            body = f.read()
+        if hot:
+            dd = cpa_formats.load().diskdef(diskdef)
+            body, _ = cpa_layout.relayout(body, dd, hot, protected=cpa_layout.protected_bytes(dd, prefix))
+    except (subprocess.CalledProcessError, OSError, KeyError) as e:
+        print(f"[WARN] Zusatzdateien konnten nicht ersetzt werden ({e}), baue Image neu")
+        return False
+    finally:
+        if os.path.exists(TMP_IMAGE):
+            os.remove(TMP_IMAGE)
+    with open(FINAL_IMAGE + ".new", "wb") as f:
+        f.write(data[:prefix] + body)
+    os.replace(FINAL_IMAGE + ".new", FINAL_IMAGE)
+    print(f"[DONE] {len(names)} Zusatzdatei(en) in {FINAL_IMAGE} ersetzt")
+    return True
+
+
+def handle(changed, args, watcher):
+    """Führt die Stufen für eine (entprellte) Menge von Änderungen aus."""
+    target = args.target
+    make_vars = [f"DISK_LAYOUT={args.layout}", f"LAYOUT_TRACE={args.trace}"]
+    stages = set(changed.values())
+    variant = current_variant()
+    print(f"[INFO] Geändert: {', '.join(sorted(changed))}")
+    if "config" in stages:
+        if not run_patch(variant):
+            return
+        # Vom Patchen geänderte *.mac Dateien gehören zu diesem Durchlauf
+        stages.update(watcher.scan().values())
+    if "source" in stages or "config" in stages:
+        run_make(target, make_vars)
+    elif "additions" in stages:
+        try:
+            hot = cpa_layout.hot_files(args.layout, args.trace)
+        except OSError as e:
+            print(f"[FEHLER] {e}")
+            return
+        if not update_additions(variant, [p for p, s in changed.items() if s == "additions"], hot):
+            if os.path.exists(FINAL_IMAGE):
+                os.remove(FINAL_IMAGE)
+            run_make(target, make_vars)
+        elif target != "diskimage":
+            run_make(target, make_vars)
+    # Änderungen durch den Build selbst (z.B. make clean) nicht erneut auslösen
+    watcher.scan()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Baut bei Dateiänderungen automatisch neu")
+    parser.add_argument("target", nargs="?", default="diskimage", choices=("os",) + IMAGE_TARGETS,
+                        help="Build-Target (Standard: diskimage)")
+    parser.add_argument("--interval", type=float, default=0.5, help="Abfrageintervall in Sekunden (Standard: 0.5)")
+    parser.add_argument("--debounce", type=float, default=0.5,
+                        help="Ruhezeit nach der letzten Änderung, bevor gebaut wird (Standard: 0.5)")
+    parser.add_argument("--layout", default=cpa_layout.DEFAULT_LAYOUT,
+                        help="Prioritätsliste wie DISK_LAYOUT, leer: keine Anordnung (Standard: config/disklayout.txt)")
+    parser.add_argument("--trace", default="", help="Zugriffsfolge wie LAYOUT_TRACE (Standard: keine)")
+    args = parser.parse_args()
+
+    if not os.path.exists("Makefile") or not os.path.isdir("src"):
+        print("[FEHLER] cpa_watch.py muss im Hauptverzeichnis der Workbench gestartet werden")
+        sys.exit(1)
+    watcher = Watcher(with_additions=args.target in IMAGE_TARGETS,
+                      layout_files=[p for p in (args.layout, args.trace) if p])
+    print(f"[INFO] Überwache {len(watcher.state)} Dateien (Variante {current_variant()}, Target {args.target}), "
+          f"Abbruch mit Strg+C")
+    try:
+        while True:
+            time.sleep(args.interval)
+            changed = watcher.scan()
+            if not changed:
+                continue
+            # Entprellen: warten, bis eine Weile nichts mehr geändert wurde
+            while True:
+                time.sleep(args.debounce)
+                more = watcher.scan()
+                if not more:
+                    break
+                changed.update(more)
+            handle(changed, args, watcher)
+            print("[INFO] Warte auf Änderungen ...")
+    except KeyboardInterrupt:
+        print("\n[INFO] Watch-Modus beendet")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# Copyright (c) 2025 by olliy78
+# SPDX-License-Identifier: MIT
+"""
+Schreibt ein Diskettenimage mit Greaseweazle und dabei nur die geänderten Spuren
+
+Für jede physikalische Diskette (Name über --disk, im Makefile DISK=...) wird ein Manifest mit den
+Hashes aller Spuren gespeichert, die zuletzt auf sie geschrieben wurden (.cpa_cache/writeimage/).
+Beim nächsten Schreiben werden die Spuren des neuen Images damit verglichen und 'gw write' nur für
+die geänderten Zylinder/Köpfe aufgerufen (--tracks=c=...:h=...). Ohne Manifest, bei anderem
+Format oder mit --full wird die ganze Diskette geschrieben. Ohne --disk ist nicht bekannt, was auf der
+eingelegten Diskette steht; dann wird ebenfalls alles geschrieben und kein Manifest angelegt.
+
+Die Spuraufteilung (Zylinder, Köpfe, Sektoren, Sektorgröße je Spur) stammt aus cpaFormates.cfg
+(über das Formatregister config/cpa_formats.py).
+Das Image enthält die Spuren in der Reihenfolge Zylinder 0 Kopf 0, Zylinder 0 Kopf 1, Zylinder 1 ...
+
+Verwendung:
+    python cpa_writeimage.py <image> --format FORMAT [--disk NAME] [--gw BEFEHL] [--diskdefs DATEI]
+                             [--full] [--dry-run]
+
+    --gw BEFEHL   Aufruf von Greaseweazle (Standard: gw). Zum Testen kann ein Ersatz angegeben werden,
+                  z.B. --gw "python3 config/gw_standin.py"
+
+Beispiele:
+    python config/cpa_writeimage.py build/cpadisk.img --format cpa800 --disk boot01
+    make config writeimage DISK=boot01
+"""
+import os
+import sys
+import json
+import shlex
+import hashlib
+import argparse
+import subprocess
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, SCRIPT_DIR)
+
+import cpa_formats
+from cpa_formats import GW_FORMATS as DEFAULT_DISKDEFS, parse_track_set
+
+MANIFEST_DIR = os.path.join(REPO_DIR, ".cpa_cache", "writeimage")
+
+
+def track_hashes(image_data, fmt):
+    """
+    Zerlegt das Image nach dem Spuraufbau (cpa_formats.GwFormat) in Spuren und bildet deren Hashes.
+    Returns:
+        dict: "Zylinder.Kopf" -> SHA1 der Spur
+    """
+    if fmt.size != len(image_data):
+        raise ValueError(f"Imagegröße {len(image_data)} passt nicht zum Format ({fmt.size} Bytes)")
+    return {f"{c}.{h}": hashlib.sha1(fmt.track(image_data, c, h)).hexdigest() for c, h in fmt.tracks}
+
+
+def format_ranges(numbers):
+    """[0, 1, 2, 5, 7, 8] -> '0-2,5,7-8' (Greaseweazle-Schreibweise)."""
+    parts = []
+    numbers = sorted(numbers)
+    start = prev = numbers[0]
+    for n in numbers[1:] + [None]:
+        if n is not None and n == prev + 1:
+            prev = n
+            continue
+        parts.append(f"{start}-{prev}" if prev != start else str(start))
+        if n is not None:
+            start = prev = n
+    return ",".join(parts)
+
+
+def track_specs(changed, heads):
+    """
+    Fasst geänderte Spuren zu möglichst wenigen --tracks Angaben zusammen: Zylinder, bei denen alle
+    Köpfe geändert sind, in eine Angabe, die übrigen je Kopf.
+    Returns:
+        list: z.B. ["c=3-5,9:h=0-1", "c=12:h=0"]
+    """
+    by_cyl = {}
+    for key in changed:
+        c, h = (int(x) for x in key.split("."))
+        by_cyl.setdefault(c, set()).add(h)
+    groups = {}
+    for c, hs in by_cyl.items():
+        if len(hs) == heads:
+            groups.setdefault("all", []).append(c)
+        else:
+            for h in hs:
+                groups.setdefault(h, []).append(c)
+    specs = []
+    if "all" in groups:
+        specs.append(f"c={format_ranges(groups['all'])}:h={'0' if heads == 1 else f'0-{heads - 1}'}")
+    for h in sorted(k for k in groups if k != "all"):
+        specs.append(f"c={format_ranges(groups[h])}:h={h}")
+    return specs
+
+
+def parse_spec_tracks(spec):
+    """'c=3-5,9:h=0-1' -> Liste der Spurschlüssel "Zylinder.Kopf"."""
+    cyl_part, head_part = (p.split("=", 1)[1] for p in spec.split(":"))
+    cyls = parse_track_set(cyl_part, 1 << 16, 1)
+    heads = parse_track_set(head_part, 1 << 16, 1)
+    return [f"{c}.{h}" for c, _ in cyls for h, _ in heads]
+
+
+def manifest_path(disk):
+    return os.path.join(MANIFEST_DIR, f"{disk}.json")
+
+
+def load_manifest(disk):
+    path = manifest_path(disk)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(disk, manifest):
+    os.makedirs(MANIFEST_DIR, exist_ok=True)
+    tmp = manifest_path(disk) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, manifest_path(disk))
+
+
+def write_image(args):
+    try:
+        fmt = cpa_formats.load(args.diskdefs).gw_format(args.format)
+        with open(args.image, "rb") as f:
+            hashes = track_hashes(f.read(), fmt)
+    except KeyError as e:
+        print(f"[FEHLER] {e.args[0]}")
+        sys.exit(1)
+    except (OSError, ValueError) as e:
+        print(f"[FEHLER] {args.image}: {e}")
+        sys.exit(1)
+
+    if not args.disk:
+        print("[INFO] Keine Diskette angegeben (--disk, im Makefile DISK=...), schreibe alle Spuren")
+    manifest = None if args.full or not args.disk else load_manifest(args.disk)
+    if manifest is None or manifest.get("format") != args.format:
+        if not args.full and args.disk:
+            reason = "kein Manifest" if manifest is None else f"bisher Format {manifest.get('format')}"
+            print(f"[INFO] Diskette '{args.disk}': {reason}, schreibe alle Spuren")
+        changed = sorted(hashes, key=lambda k: tuple(int(x) for x in k.split(".")))
+        old_tracks = {}
+        specs = [None]  # ganze Diskette, ohne --tracks
+    else:
+        old_tracks = manifest["tracks"]
+        changed = [k for k in hashes if old_tracks.get(k) != hashes[k]]
+        if not changed:
+            print(f"[INFO] Diskette '{args.disk}' ist aktuell, nichts zu schreiben")
+            return
+        specs = track_specs(changed, fmt.heads)
+        print(f"[INFO] Diskette '{args.disk}': {len(changed)} von {len(hashes)} Spuren geändert")
+
+    gw = shlex.split(args.gw)
+    for spec in specs:
+        cmd = gw + ["write", f"--diskdefs={args.diskdefs}", f"--format={args.format}"]
+        if spec:
+            cmd.append(f"--tracks={spec}")
+        cmd.append(args.image)
+        print(f"[STEP] {' '.join(cmd)}")
+        if args.dry_run:
+            continue
+        if subprocess.run(cmd).returncode != 0:
+            print("[FEHLER] gw write fehlgeschlagen, Manifest bleibt unverändert")
+            sys.exit(1)
+        # Nach jedem erfolgreichen Teil festhalten, damit ein Abbruch nichts doppelt schreibt
+        if spec:
+            written = parse_spec_tracks(spec)
+            old_tracks.update({k: hashes[k] for k in written if k in hashes})
+        else:
+            old_tracks = dict(hashes)
+        if args.disk:
+            save_manifest(args.disk, {"format": args.format, "image": os.path.abspath(args.image),
+                                      "tracks": old_tracks})
+    if not args.dry_run:
+        target = f" auf Diskette '{args.disk}'" if args.disk else ""
+        print(f"[FERTIG] Diskettenimage{target} geschrieben.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Schreibt nur die geänderten Spuren eines Diskettenimages")
+    parser.add_argument("image", help="Diskettenimage (z.B. build/cpadisk.img)")
+    parser.add_argument("--format", required=True, help="Format aus cpaFormates.cfg (z.B. cpa800)")
+    parser.add_argument("--disk", help="Name der physikalischen Diskette (ohne: alle Spuren schreiben)")
+    parser.add_argument("--gw", default=os.environ.get("GW", "gw"), help="Greaseweazle-Aufruf (Standard: gw)")
+    parser.add_argument("--diskdefs", default=DEFAULT_DISKDEFS, help="Formatdatei für gw (Standard: cpaFormates.cfg)")
+    parser.add_argument("--full", action="store_true", help="Alle Spuren schreiben, Manifest neu anlegen")
+    parser.add_argument("--dry-run", action="store_true", help="Nur anzeigen, was geschrieben würde")
+    args = parser.parse_args()
+    write_image(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# Copyright (c) 2025 by olliy78
+# SPDX-License-Identifier: MIT
+"""
+Gemeinsames Modell der .config Datei für alle Werkzeuge der CPA-Workbench
+
+cpa_menuconfig.py, patch_mac.py und test_patch_mac.py lesen und schreiben die .config
+über dieses Modul, statt jeweils eigene reguläre Ausdrücke zu verwenden.
+
+Eigenschaften:
+- Verlustfrei: Alle Zeilen (auch Kommentare und Leerzeilen) bleiben in ihrer Reihenfolge
+  erhalten. Laden und unverändertes Speichern ergibt dieselbe Datei. Einzige Ausnahme: Steht
+  ein Schlüssel mehrfach in der Datei, bleibt nur die letzte Zeile (sie gilt auch für kconfiglib).
+- Geordnet: Neue Einträge werden am Ende angehängt, geänderte Einträge bleiben an ihrer Stelle.
+- O(1)-Zugriff: Einträge werden über ein Dict vom Schlüssel (z.B. CONFIG_SYSTEM_RTC) auf die
+  Zeile gefunden.
+- Abschnitte: section(prefix) liefert eine Sicht auf alle Einträge mit einem Präfix
+  (z.B. CONFIG_VARIANT_, CONFIG_SYSTEM_, CONFIG_BUILD_).
+- Ein einziger Schreibvorgang: write() erzeugt den gesamten Dateiinhalt und schreibt ihn auf einmal.
+
+Einträge sind Zeilen der Form
+    CONFIG_NAME=wert
+    # CONFIG_NAME is not set
+Wie bisher bildet ein Config-Objekt den Schlüssel auf die komplette Zeile ab (ohne Zeilenende).
+
+Beispiel:
+    import cpaconfig
+    cfg = cpaconfig.load(".config")
+    variante = cfg.section("CONFIG_VARIANT_").selected()
+    cfg.set("CONFIG_SYSTEM_NAME", '"CP/A"')
+    cfg.unset("CONFIG_SYSTEM_RTC")
+    cfg.write(".config")
+"""
+import os
+import re
+
+# Ein Eintrag: "CONFIG_NAME=wert" oder "# CONFIG_NAME is not set"
+_ENTRY_RE = re.compile(r'(# )?(CONFIG_[A-Za-z0-9_\-]+)(?:=(.*)| is not set)')
+
+
+class Config:
+    """
+    Verlustfreie, geordnete Darstellung einer .config Datei.
+
+    Verhält sich wie ein Dict von Schlüssel (CONFIG_...) auf die komplette Zeile. Zeilen, die
+    keine Einträge sind (Kommentare, Leerzeilen), werden nur mitgeführt.
+    """
+
+    def __init__(self, text=""):
+        # Alle Zeilen ohne Zeilenende. Gelöschte Einträge werden zu None, damit die Positionen
+        # im Index gültig bleiben.
+        self._lines = []
+        # Schlüssel -> Position in _lines, in Dateireihenfolge
+        self._index = {}
+        # Endet der Inhalt ohne Zeilenumbruch, bleibt das beim Schreiben so
+        self._final_newline = True
+        if text:
+            self._final_newline = text.endswith("\n")
+            for line in text.splitlines():
+                self._append(line)
+
+    def _append(self, line):
+        m = _ENTRY_RE.match(line)
+        if m:
+            # Bei doppelten Einträgen gilt (wie bei kconfiglib) der letzte. Frühere Zeilen
+            # werden entfernt, damit set()/unset() keinen veralteten Wert in der Datei
+            # zurücklassen. Das Dict bleibt dabei in Dateireihenfolge.
+            i = self._index.pop(m.group(2), None)
+            if i is not None:
+                self._lines[i] = None
+            self._index[m.group(2)] = len(self._lines)
+        self._lines.append(line)
+
+    # --- Dict-Schnittstelle (Schlüssel -> Zeile) ---
+
+    def __getitem__(self, key):
+        return self._lines[self._index[key]]
+
+    def __setitem__(self, key, line):
+        """Ersetzt die Zeile des Eintrags an Ort und Stelle oder hängt sie an."""
+        i = self._index.get(key)
+        if i is None:
+            self._index[key] = len(self._lines)
+            self._lines.append(line)
+        else:
+            self._lines[i] = line
+
+    def __delitem__(self, key):
+        self._lines[self._index.pop(key)] = None
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self._index)
+
+    def get(self, key, default=None):
+        i = self._index.get(key)
+        return default if i is None else self._lines[i]
+
+    def keys(self):
+        """Alle Schlüssel in Dateireihenfolge."""
+        return list(self._index)
+
+    def items(self):
+        """(Schlüssel, Zeile)-Paare in Dateireihenfolge."""
+        return [(key, self._lines[self._index[key]]) for key in self.keys()]
+
+    def copy(self):
+        new = Config()
+        new._lines = list(self._lines)
+        new._index = dict(self._index)
+        new._final_newline = self._final_newline
+        return new
+
+    # --- Werte ---
+
+    def value(self, key):
+        """
+        Liefert den Wert eines Eintrags, so wie er hinter '=' steht (Strings mit Anführungszeichen).
+        Args:
+            key (str): Schlüssel, z.B. CONFIG_SYSTEM_RTC
+        Returns:
+            str|None: Wert oder None, falls der Eintrag fehlt oder 'is not set' ist
+        """
+        line = self.get(key)
+        if line is None:
+            return None
+        return _ENTRY_RE.match(line).group(3)
+
+    def string(self, key):
+        """
+        Liefert den Inhalt eines String-Eintrags (CONFIG_X="..."), ohne die Anführungszeichen.
+        Returns:
+            str|None: Inhalt oder None, falls der Eintrag kein String ist
+        """
+        val = self.value(key)
+        if val is None:
+            return None
+        val = val.strip()
+        if len(val) < 2 or not val.startswith('"') or not val.endswith('"'):
+            return None
+        return val[1:-1]
+
+    def is_enabled(self, key):
+        """True, falls der Eintrag auf 'y' steht."""
+        val = self.value(key)
+        return val is not None and val.strip() == "y"
+
+    def is_not_set(self, key):
+        """True, falls der Eintrag als '# CONFIG_... is not set' vorliegt."""
+        line = self.get(key)
+        return line is not None and line.startswith("# ")
+
+    def set(self, key, value):
+        """Setzt CONFIG_...=value (value unverändert, Strings also mit Anführungszeichen)."""
+        self[key] = f"{key}={value}"
+
+    def unset(self, key):
+        """Setzt den Eintrag auf '# CONFIG_... is not set'."""
+        self[key] = f"# {key} is not set"
+
+    # --- Abschnitte ---
+
+    def section(self, prefix):
+        """
+        Sicht auf alle Einträge, deren Schlüssel mit prefix beginnt (z.B. CONFIG_BUILD_).
+        Die Sicht folgt späteren Änderungen an diesem Config-Objekt.
+        """
+        return Section(self, prefix)
+
+    def update(self, other):
+        """Übernimmt alle Einträge (Schlüssel -> Zeile) aus einem Dict, Config oder Section."""
+        for key, line in other.items():
+            self[key] = line
+
+    # --- Serialisierung ---
+
+    def text(self):
+        """Der komplette Dateiinhalt als String."""
+        lines = [line for line in self._lines if line is not None]
+        if not lines:
+            return ""
+        return "\n".join(lines) + ("\n" if self._final_newline else "")
+
+    def write(self, path):
+        """Schreibt den kompletten Inhalt in einem Schreibvorgang nach path."""
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.text())
+
+
+class Section:
+    """
+    Sicht auf die Einträge einer Config mit gemeinsamem Präfix.
+
+    Verhält sich wie ein Dict von Schlüssel auf Zeile. Schreibzugriffe gehen an die Config.
+    """
+
+    def __init__(self, config, prefix):
+        self.config = config
+        self.prefix = prefix
+
+    def keys(self):
+        return [key for key in self.config.keys() if key.startswith(self.prefix)]
+
+    def items(self):
+        return [(key, self.config[key]) for key in self.keys()]
+
+    def values(self):
+        return [self.config[key] for key in self.keys()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __contains__(self, key):
+        return key.startswith(self.prefix) and key in self.config
+
+    def __getitem__(self, key):
+        if not key.startswith(self.prefix):
+            raise KeyError(key)
+        return self.config[key]
+
+    def __setitem__(self, key, line):
+        if not key.startswith(self.prefix):
+            raise KeyError(key)
+        self.config[key] = line
+
+    def get(self, key, default=None):
+        return self.config.get(key, default) if key.startswith(self.prefix) else default
+
+    def selected(self):
+        """
+        Für Auswahlgruppen (choice): Liefert den Namen des ersten Eintrags mit '=y' ohne Präfix
+        (z.B. 'pc_1715' für CONFIG_VARIANT_pc_1715=y) oder None.
+        """
+        for key in self.keys():
+            if self.config.is_enabled(key):
+                return key[len(self.prefix):]
+        return None
+
+
+def parse(text):
+    """Erzeugt eine Config aus dem Inhalt einer .config Datei."""
+    return Config(text)
+
+
+def load(path):
+    """
+    Liest eine .config Datei ein.
+    Args:
+        path (str): Pfad zur .config Datei
+    Returns:
+        Config: Inhalt der Datei (leer, falls die Datei nicht existiert)
+    """
+    if not os.path.exists(path):
+        return Config()
+    with open(path, encoding="utf-8") as f:
+        return Config(f.read())
+
+
+def from_sections(*sections):
+    """Baut eine neue Config aus mehreren Abschnitten (oder Dicts), in der angegebenen Reihenfolge."""
+    config = Config()
+    for section in sections:
+        config.update(section)
+    return config
@@ -0,0 +1,186 @@
+# Copyright (c) 2025 by olliy78
+# SPDX-License-Identifier: MIT
+"""
+Gemeinsame Profiling-Optionen für die Kommandozeilen-Skripte der Workbench
+
+Jedes Skript ruft statt main() direkt cpaprofile.run_main(main) auf. Ohne Profiling-Option
+wird main() unverändert ausgeführt.
+
+Optionen (werden aus sys.argv entfernt, bevor das Skript seine Argumente auswertet):
+    --profile[=DATEI]     cProfile-Statistik nach DATEI schreiben (Standard: <skript>-<pid>.prof)
+    --profile-mem[=N]     zusätzlich tracemalloc: die N größten Allokationsstellen (Standard: 20)
+
+Umgebungsvariablen (z.B. über make, gelten auch für aufgerufene Unterprozesse):
+    CPA_PROFILE=1         wie --profile, Dateien im aktuellen Verzeichnis
+    CPA_PROFILE=<ordner>  wie --profile, Dateien im angegebenen Ordner (wird angelegt)
+    CPA_PROFILE_MEM=N     wie --profile-mem=N
+
+Erzeugte Dateien zu DATEI:
+    DATEI                 cProfile-Statistik (pstats, z.B. für snakeviz oder python -m pstats)
+    DATEI.txt             die 30 teuersten Funktionen nach kumulierter Zeit als Text
+    DATEI.collapsed       Stichproben der Aufrufstapel im collapsed-Format (flamegraph.pl, speedscope)
+    DATEI.mem.txt         tracemalloc-Bericht (nur mit --profile-mem bzw. CPA_PROFILE_MEM)
+
+Beispiele:
+    python config/patch_mac.py patch .config bc_a5120 --profile=patch.prof --profile-mem
+    make menuconfig PROFILE=profile
+    flamegraph.pl patch.prof.collapsed > patch.svg
+"""
+import os
+import io
+import sys
+import time
+import pstats
+import cProfile
+import threading
+import collections
+
+ENV_PROFILE = "CPA_PROFILE"
+ENV_PROFILE_MEM = "CPA_PROFILE_MEM"
+DEFAULT_MEM_TOP = 20
+SAMPLE_INTERVAL = 0.005
+
+
+def parse_mem_top(value, source):
+    """
+    Wertet N aus --profile-mem=N bzw. CPA_PROFILE_MEM=N aus. Bei einem ungültigen Wert endet das
+    Skript wie bei anderen Argumentfehlern mit einer Meldung und Fehlercode 2.
+    """
+    try:
+        top = int(value)
+    except ValueError:
+        top = -1
+    if top < 0:
+        print(f"[FEHLER] {source}: ungültige Anzahl '{value}' (erwartet: ganze Zahl >= 0)", file=sys.stderr)
+        sys.exit(2)
+    return top
+
+
+def parse_args(argv, script):
+    """
+    Sucht --profile[=DATEI] und --profile-mem[=N] in argv (die Optionen werden entfernt)
+    und wertet ersatzweise CPA_PROFILE und CPA_PROFILE_MEM aus.
+    Returns:
+        tuple: (Profildatei oder None, Anzahl tracemalloc-Einträge oder 0)
+    """
+    default_name = f"{script}-{os.getpid()}.prof"
+    path = None
+    mem_top = 0
+    rest = []
+    for arg in argv:
+        if arg == "--profile":
+            path = default_name
+        elif arg.startswith("--profile="):
+            path = arg.split("=", 1)[1] or default_name
+        elif arg == "--profile-mem":
+            mem_top = DEFAULT_MEM_TOP
+        elif arg.startswith("--profile-mem="):
+            mem_top = parse_mem_top(arg.split("=", 1)[1], "--profile-mem")
+        else:
+            rest.append(arg)
+    argv[:] = rest
+
+    env = os.environ.get(ENV_PROFILE, "")
+    if path is None and env and env != "0":
+        if env == "1":
+            path = default_name
+        else:
+            os.makedirs(env, exist_ok=True)
+            path = os.path.join(env, default_name)
+    if not mem_top and os.environ.get(ENV_PROFILE_MEM):
+        mem_top = parse_mem_top(os.environ[ENV_PROFILE_MEM], ENV_PROFILE_MEM)
+    if mem_top and path is None:
+        path = default_name
+    return path, mem_top
+
+
+class StackSampler:
+    """
+    Nimmt in einem Hintergrund-Thread alle SAMPLE_INTERVAL Sekunden den Aufrufstapel
+    des Haupt-Threads auf und zählt gleiche Stapel (Grundlage für einen Flamegraph).
+    Gemessen wird Wandzeit, Wartezeit auf Unterprozesse (make, cpmcp, patch_mac) ist also enthalten.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.counts = collections.Counter()
+        self._thread_id = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="cpaprofile", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in sorted(self.counts.items()):
+                f.write(f"{stack} {count}\n")
+
+
+def write_mem_report(path, snapshot, top, peak):
+    """Schreibt die top größten Allokationsstellen eines tracemalloc-Snapshots als Text."""
+    stats = snapshot.statistics("lineno")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"Spitze: {peak / 1024:.1f} KiB, am Ende belegt: "
+                f"{sum(s.size for s in stats) / 1024:.1f} KiB in {len(stats)} Zeilen\n\n")
+        for s in stats[:top]:
+            frame = s.traceback[0]
+            f.write(f"{s.size / 1024:10.1f} KiB {s.count:8d} x  {frame.filename}:{frame.lineno}\n")
+
+
+def run_main(main):
+    """
+    Führt main() aus, bei gesetzter Profiling-Option unter cProfile, Stapel-Stichproben und
+    optional tracemalloc. Die Berichte werden auch geschrieben, wenn main() mit sys.exit() endet.
+    """
+    script = os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0]
+    args = sys.argv[1:]
+    path, mem_top = parse_args(args, script)
+    sys.argv[1:] = args
+    if path is None:
+        return main()
+
+    if mem_top:
+        import tracemalloc
+        tracemalloc.start()
+    profiler = cProfile.Profile()
+    sampler = StackSampler()
+    start = time.perf_counter()
+    sampler.start()
+    profiler.enable()
+    try:
+        return main()
+    finally:
+        profiler.disable()
+        sampler.stop()
+        elapsed = time.perf_counter() - start
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        profiler.dump_stats(path)
+        text = io.StringIO()
+        pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(30)
+        with open(path + ".txt", "w", encoding="utf-8") as f:
+            f.write(text.getvalue())
+        sampler.write(path + ".collapsed")
+        written = [path, path + ".txt", path + ".collapsed"]
+        if mem_top:
+            _, peak = tracemalloc.get_traced_memory()
+            write_mem_report(path + ".mem.txt", tracemalloc.take_snapshot(), mem_top, peak)
+            tracemalloc.stop()
+            written.append(path + ".mem.txt")
+        print(f"[INFO] Profil ({elapsed:.2f} s) geschrieben: {', '.join(written)}", file=sys.stderr)
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# Copyright (c) 2025 by olliy78
+# SPDX-License-Identifier: MIT
+"""
+Zufallstest (Fuzzing) für den Round-Trip patch -> extract von patch_mac.py
+
+Erzeugt zufällige, vollständige Konfigurationen einer Systemvariante und prüft, dass
+patch (config -> *.mac) gefolgt von extract (*.mac -> config) wieder genau dieselbe Konfiguration
+liefert. Im Gegensatz zu test_patch_mac.py / roundtrip_patch_mac.py werden alle Parameter gleichzeitig
+und mit zufälligen Werten gesetzt:
+- Auswahlgruppen (Parameter mit gemeinsamen Schlüsseln, z.B. SYSTEM_DRIVE_A_*): genau einer auf =y
+- einzelne bool-Parameter: =y oder 'is not set'
+- string: zufälliger Text, der in db '...',0 passt (druckbare Zeichen ohne Anführungszeichen)
+- hexstring: zufälliger Hex-Wert im equ-Format (z.B. 0A3Fh, beginnt mit einer Ziffer)
+
+String- und Hexstring-Parameter werden immer gesetzt. 'is not set' wird dort beim Patchen zu
+'' bzw. 0 und kommt als Wert zurück, das prüft bereits roundtrip_patch_mac.py.
+
+Schlägt ein Fall fehl, wird die Konfiguration verkleinert (shrinking): Parameter werden so lange auf
+die Ausgangswerte der Variante zurückgesetzt und Texte gekürzt, wie der Fehler bestehen bleibt.
+Ausgegeben wird die minimale Abweichung von den Ausgangswerten und der Seed zum Nachstellen.
+
+Alle Fälle laufen im Prozess in temporären Verzeichnissen, das Arbeitsverzeichnis bleibt unverändert.
+
+Verwendung:
+    python fuzz_patch_mac.py [systemvariante ...] [-n FAELLE] [--seed SEED] [-j JOBS] [--root DIR]
+
+Beispiele:
+    python config/fuzz_patch_mac.py
+    python config/fuzz_patch_mac.py bc_a5120 -n 5000 --seed 42 -j 4
+"""
+import os
+import io
+import sys
+import time
+import random
+import string
+import argparse
+import tempfile
+import contextlib
+import concurrent.futures
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, SCRIPT_DIR)
+
+import cpaconfig
+import patch_mac
+from roundtrip_patch_mac import find_variants, param_kind, prepare_template
+
+# Zeichen für zufällige Strings: druckbar, ohne ' " und \ (Begrenzer in db bzw. .config)
+STRING_CHARS = "".join(c for c in string.printable[:95] if c not in "'\"\\")
+STRING_MAX_LEN = 40
+
+
+def build_model(param_mappings):
+    """
+    Fasst die Parameter zu Gruppen zusammen, die gemeinsam belegt werden müssen.
+    bool-Parameter mit gemeinsamen Schlüsseln bilden eine Auswahlgruppe (choice).
+    Returns:
+        list: Dicts mit kind ('choice', 'bool', 'string', 'hexstring') und keys (CONFIG_-Schlüssel)
+    """
+    groups = []
+    by_mac_key = {}
+    for entry in param_mappings:
+        config_key = f"CONFIG_{entry['config_name']}"
+        kind = param_kind(entry)
+        if kind != "bool":
+            groups.append({"kind": kind, "keys": [config_key]})
+            continue
+        # Gruppen zusammenführen, die einen der Schlüssel dieses Parameters verwenden
+        group = None
+        for mac_key in entry["key_values"]:
+            other = by_mac_key.get(mac_key)
+            if other is not None and other is not group:
+                if group is None:
+                    group = other
+                else:
+                    group["keys"].extend(other["keys"])
+                    groups.remove(other)
+                    for k, g in by_mac_key.items():
+                        if g is other:
+                            by_mac_key[k] = group
+        if group is None:
+            group = {"kind": "bool", "keys": []}
+            groups.append(group)
+        group["keys"].append(config_key)
+        for mac_key in entry["key_values"]:
+            by_mac_key[mac_key] = group
+    for group in groups:
+        if group["kind"] == "bool" and len(group["keys"]) > 1:
+            group["kind"] = "choice"
+    return groups
+
+
+def random_hex(rng):
+    """Zufälliger Hex-Wert im M80-Format (beginnt mit einer Ziffer, Suffix h)."""
+    digits = "".join(rng.choice("0123456789ABCDEF") for _ in range(rng.randint(1, 4)))
+    if not digits[0].isdigit():
+        digits = "0" + digits
+    return digits + "h"
+
+
+def random_config(model, rng):
+    """Erzeugt eine zufällige, gültige Konfiguration als Dict Schlüssel -> Zeile."""
+    config = {}
+    for group in model:
+        kind = group["kind"]
+        if kind == "choice":
+            chosen = rng.choice(group["keys"])
+            for key in group["keys"]:
+                config[key] = f"{key}=y" if key == chosen else f"# {key} is not set"
+        elif kind == "bool":
+            key = group["keys"][0]
+            config[key] = f"{key}=y" if rng.random() < 0.5 else f"# {key} is not set"
+        elif kind == "string":
+            key = group["keys"][0]
+            text = "".join(rng.choice(STRING_CHARS) for _ in range(rng.randint(0, STRING_MAX_LEN)))
+            config[key] = f'{key}="{text}"'
+        else:
+            key = group["keys"][0]
+            config[key] = f'{key}="{random_hex(rng)}"'
+    return config
+
+
+class RoundTrip:
+    """
+    Führt patch -> extract für eine Variante in einem eigenen temporären Verzeichnis aus.
+    Die Quellen werden für jeden Fall aus der Vorlage (im Speicher) neu geschrieben.
+    """
+
+    def __init__(self, variant, template, param_mappings, workdir):
+        self.variant = variant
+        self.param_mappings = param_mappings
+        self.base_dir = tempfile.mkdtemp(prefix=f"fuzz_{variant}_", dir=workdir)
+        self.config_path = os.path.join(self.base_dir, ".config")
+        self.sources = {}
+        for entry in param_mappings:
+            src = entry["source"] if entry["source"] else "bios.mac"
+            if src not in self.sources:
+                with open(os.path.join(template, "src", variant, src), "rb") as f:
+                    self.sources[src] = f.read()
+                os.makedirs(os.path.dirname(os.path.join(self.base_dir, "src", variant, src)),
+                            exist_ok=True)
+
+    def run(self, config):
+        """
+        Patcht die Quellen mit config, extrahiert neu und liefert die Abweichungen.
+        Returns:
+            list: (Schlüssel, erwartete Zeile, erhaltene Zeile) für alle abweichenden Parameter
+        """
+        for src, data in self.sources.items():
+            with open(os.path.join(self.base_dir, "src", self.variant, src), "wb") as f:
+                f.write(data)
+        cpaconfig.from_sections(config).write(self.config_path)
+        with contextlib.redirect_stdout(io.StringIO()):
+            patch_mac.run("patch", self.config_path, self.variant, base_dir=self.base_dir,
+                          param_mappings=self.param_mappings)
+            os.remove(self.config_path)
+            patch_mac.run("extract", self.config_path, self.variant, base_dir=self.base_dir,
+                          param_mappings=self.param_mappings)
+        result = cpaconfig.load(self.config_path)
+        return [(key, line, result.get(key)) for key, line in config.items() if result.get(key) != line]
+
+
+def shrink(roundtrip, model, config, base):
+    """
+    Verkleinert eine fehlschlagende Konfiguration: Gruppen werden auf die Ausgangswerte (base)
+    zurückgesetzt und Texte gekürzt, solange der Round-Trip weiter fehlschlägt.
+    Returns:
+        dict: minimale fehlschlagende Konfiguration
+    """
+    config = dict(config)
+    changed = True
+    while changed:
+        changed = False
+        # 1. Ganze Gruppen auf die Ausgangswerte zurücksetzen
+        for group in model:
+            if all(config[key] == base.get(key, config[key]) for key in group["keys"]):
+                continue
+            candidate = dict(config)
+            for key in group["keys"]:
+                candidate[key] = base.get(key, config[key])
+            if roundtrip.run(candidate):
+                config = candidate
+                changed = True
+        # 2. Texte und Hex-Werte kürzen (Hälfte, dann einzelne Zeichen entfernen)
+        for group in model:
+            if group["kind"] not in ("string", "hexstring"):
+                continue
+            key = group["keys"][0]
+            # Ausgangswerte sind bereits minimal (sonst pendelt 1. gegen 2.)
+            if config[key] == base.get(key):
+                continue
+            value = cpaconfig.parse(config[key]).string(key)
+            if value is None:
+                continue
+            shorter = [value[:len(value) // 2]] + [value[:i] + value[i + 1:] for i in range(len(value))]
+            for text in shorter:
+                if group["kind"] == "hexstring" and not (text[:1].isdigit() and text.endswith("h")):
+                    continue
+                candidate = dict(config)
+                candidate[key] = f'{key}="{text}"'
+                if candidate[key] != config[key] and roundtrip.run(candidate):
+                    config = candidate
+                    changed = True
+                    break
+    return config
+
+
+def fuzz_chunk(variant, template, param_mappings, base, seed, count, workdir):
+    """
+    Führt count zufällige Fälle mit Startwert seed aus (ein Auftrag im Prozess-Pool).
+    Returns:
+        dict: Anzahl Fälle und (falls gefunden) der erste, verkleinerte Fehler
+    """
+    rng = random.Random(seed)
+    model = build_model(param_mappings)
+    roundtrip = RoundTrip(variant, template, param_mappings, workdir)
+    for i in range(count):
+        config = random_config(model, rng)
+        diffs = roundtrip.run(config)
+        if diffs:
+            minimal = shrink(roundtrip, model, config, base)
+            return {
+                "cases": i + 1,
+                "seed": seed,
+                "case": i,
+                "config": {k: v for k, v in minimal.items() if v != base.get(k)},
+                "diffs": roundtrip.run(minimal),
+            }
+    return {"cases": count, "seed": seed}
+
+
+def fuzz_variant(variant, cases, seed, jobs, chunk_size=200, repo_dir=REPO_DIR):
+    """
+    Fuzzt eine Variante mit insgesamt cases Fällen, verteilt auf jobs Prozesse.
+    Returns:
+        tuple: (Anzahl Fälle, Laufzeit in s, Liste gefundener Fehler)
+    """
+    kconfig_path = os.path.join(repo_dir, "config", variant, "Kconfig.system")
+    param_mappings = patch_mac.parse_kconfig_system(kconfig_path)
+    with tempfile.TemporaryDirectory(prefix="fuzz_patch_mac_") as workdir:
+        template, _ = prepare_template(variant, param_mappings, workdir, repo_dir)
+        # Ausgangswerte: die aus den unveränderten Quellen extrahierte Konfiguration
+        base_path = os.path.join(workdir, "base.config")
+        with contextlib.redirect_stdout(io.StringIO()):
+            patch_mac.run("extract", base_path, variant, base_dir=repo_dir, param_mappings=param_mappings)
+        base = dict(cpaconfig.load(base_path).items())
+
+        chunks = [(variant, template, param_mappings, base, seed * 1000003 + n, min(chunk_size, cases - start),
+                   workdir) for n, start in enumerate(range(0, cases, chunk_size))]
+        start = time.perf_counter()
+        if jobs == 1:
+            results = [fuzz_chunk(*args) for args in chunks]
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+                results = list(pool.map(fuzz_chunk, *zip(*chunks)))
+        elapsed = time.perf_counter() - start
+    failures = [r for r in results if "config" in r]
+    return sum(r["cases"] for r in results), elapsed, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Zufallstest für den Round-Trip patch -> extract")
+    parser.add_argument("variants", nargs="*", metavar="systemvariante",
+                        help="Zu testende Systemvarianten (Standard: alle)")
+    parser.add_argument("-n", "--cases", type=int, default=2000,
+                        help="Anzahl Zufallsfälle je Variante (Standard: 2000)")
+    parser.add_argument("--seed", type=int, default=None, help="Startwert (Standard: zufällig)")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="Anzahl paralleler Prozesse (Standard: Anzahl CPUs)")
+    parser.add_argument("--root", default=REPO_DIR,
+                        help="Wurzelverzeichnis mit config/ und src/ (Standard: Repository, siehe gen_variant.py)")
+    args = parser.parse_args()
+
+    seed = args.seed if args.seed is not None else random.randrange(2**31)
+    variants = args.variants or find_variants(args.root)
+    print(f"[INFO] Seed: {seed}")
+    failed = False
+    for variant in variants:
+        if not os.path.exists(os.path.join(args.root, "config", variant, "Kconfig.system")):
+            print(f"[FEHLER] Kconfig.system für Systemvariante '{variant}' nicht gefunden")
+            sys.exit(1)
+        cases, elapsed, failures = fuzz_variant(variant, args.cases, seed, args.jobs, repo_dir=args.root)
+        print(f"[INFO] {variant}: {cases} Fälle in {elapsed:.2f} s ({cases / elapsed:.0f} Fälle/s)")
+        for failure in failures:
+            failed = True
+            print(f"[FEHLER] {variant}: Round-Trip fehlgeschlagen (Chunk-Seed {failure['seed']}, "
+                  f"Fall {failure['case']}). Minimale Abweichung von den Ausgangswerten:")
+            for line in failure["config"].values():
+                print(f"    {line}")
+            for key, expected, actual in failure["diffs"]:
+                print(f"[FEHLER]   {key}: erwartet {expected!r}, erhalten {actual!r}")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# Copyright (c) 2025 by olliy78
+# SPDX-License-Identifier: MIT
+"""
+Generator für synthetische Systemvarianten (Skalierungstests)
+
+Erzeugt eine Systemvariante beliebiger Größe im Aufbau der echten Varianten:
+- config/<name>/Kconfig.system mit Menüs, Auswahlgruppen (choice), bool-, string- und
+  hexstring-Optionen, jeweils mit 'source=<datei> schlüssel=wert' im Hilfetext
+- src/<name>/*.mac mit passenden equ-Definitionen (Konstanten je Auswahl, Schalter, Hex-Werte),
+  db-Strings mit ',0', Kommentarblöcken und Code-Zeilen bis zur gewünschten Zeilenzahl (CRLF)
+- src/<name>/about.txt
+
+patch_mac.py, roundtrip_patch_mac.py, fuzz_patch_mac.py und bench_workbench.py finden die Variante
+danach wie eine echte Variante (Ordner unter config/ und src/). Mit --root kann sie auch in ein
+anderes Verzeichnis geschrieben werden.
+
+Verwendung:
+    python gen_variant.py <name> [-c CHOICES] [-a ALTERNATIVEN] [-b BOOLS] [-s STRINGS] [-x HEXSTRINGS]
+                          [-l ZEILEN] [-f DATEIEN] [--seed SEED] [--root VERZEICHNIS] [--force]
+
+Beispiele:
+    python config/gen_variant.py synth_x10 -c 100 -b 200 -s 50 -x 150 -l 20000
+    python config/gen_variant.py synth_x1000 -c 10000 -x 10000 -l 1000000 -f 20 --root /tmp/synth
+"""
+import os
+import sys
+import random
+import shutil
+import argparse
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(SCRIPT_DIR)
+
+PER_MENU = 40
+
+FILLER_CODE = [
+    "\tld\ta,(hl)",
+    "\tinc\thl",
+    "\tcp\t0dh",
+    "\tjr\tnz,{label}",
+    "\tpush\tbc",
+    "\tcall\t{label}",
+    "\tpop\tbc",
+    "\tld\tde,{hex}",
+    "\tadd\thl,de",
+    "\tout\t({hex}),a",
+    "\tret",
+]
+
+FILLER_COMMENTS = [
+    ";------------------------------------------------------------",
+    "; Synthetische Zeilen fuer Skalierungstests (gen_variant.py)",
+    ";\tDiese Zeilen werden von patch_mac nicht veraendert.",
+    "; Achtung! equ's nicht veraenderbar!",
+]
+
+
+def build_params(args):
+    """
+    Legt alle Parameter fest und verteilt sie auf die *.mac Dateien.
+    Returns:
+        list: Dicts mit kind, config_name, source, key und Kind-spezifischen Werten
+    """
+    rng = random.Random(args.seed)
+    files = ["bios.mac"] + [f"bios{i:03d}.mac" for i in range(1, args.files)]
+    params = []
+    n = 0
+
+    def source():
+        return files[n % len(files)]
+
+    for i in range(args.choices):
+        alternatives = [f"c{i}v{j}" for j in range(args.alternatives)]
+        params.append({"kind": "choice", "config_name": f"SYSTEM_SYN_CH{i}", "source": source(),
+                       "key": f"ch{i}", "alternatives": alternatives,
+                       "selected": rng.randrange(len(alternatives))})
+        n += 1
+    for i in range(args.bools):
+        params.append({"kind": "bool", "config_name": f"SYSTEM_SYN_FLAG{i}", "source": source(),
+                       "key": f"flag{i}", "value": rng.choice("01")})
+        n += 1
+    for i in range(args.strings):
+        params.append({"kind": "string", "config_name": f"SYSTEM_SYN_STR{i}", "source": source(),
+                       "key": f"txt{i}", "value": f"TEXT {i}"})
+        n += 1
+    for i in range(args.hexstrings):
+        params.append({"kind": "hexstring", "config_name": f"SYSTEM_SYN_HEX{i}", "source": source(),
+                       "key": f"hex{i}", "value": f"0{rng.randrange(0x1000):03X}h"})
+        n += 1
+    return files, params
+
+
+def kconfig_lines(name, params):
+    """Inhalt von Kconfig.system (Zeilen ohne Zeilenende)."""
+    out = [
+        f"# Kconfig für die synthetische Systemvariante {name} (erzeugt mit gen_variant.py)",
+        "",
+        f'mainmenu "CP/A System Konfiguration - Synthetische Variante {name} [? für Hilfe]"',
+    ]
+    for m in range(0, len(params), PER_MENU):
+        out += ["", f'menu "Gruppe {m // PER_MENU}"', ""]
+        for p in params[m:m + PER_MENU]:
+            if p["kind"] == "choice":
+                out += ["choice", f'    prompt "Auswahl {p["key"]}"',
+                        f"    default {p['config_name']}_{p['selected']}"]
+                for j, alt in enumerate(p["alternatives"]):
+                    out += [f"    config {p['config_name']}_{j}",
+                            f'        bool "Variante {alt} ({p["key"]}={alt})"',
+                            "        help",
+                            f"            source={p['source']} {p['key']}={alt}"]
+                out += ["endchoice", ""]
+            elif p["kind"] == "bool":
+                out += [f"config {p['config_name']}",
+                        f'    bool "Schalter {p["key"]} (={p["value"]})"',
+                        f"    default {'y' if p['value'] == '1' else 'n'}",
+                        "    help",
+                        f"        source={p['source']} {p['key']}=1",
+                        f"        Schaltet {p['key']} in {p['source']} ein (=1) oder aus (=0).",
+                        ""]
+            else:
+                out += [f"config {p['config_name']}",
+                        f'    string "{p["key"]} ({p["kind"]})"',
+                        f'    default "{p["value"]}"',
+                        "    help",
+                        f"        source={p['source']} {p['key']}={p['kind']}",
+                        f"        Wert von {p['key']} in {p['source']}.",
+                        ""]
+        out.append("endmenu")
+    return out
+
+
+def definition_lines(p):
+    """Zeilen der *.mac Datei, die einen Parameter definieren."""
+    if p["kind"] == "choice":
+        lines = [f"; Auswahl {p['key']}"]
+        lines += [f"{alt}\tequ\t{j}\t;Variante {j}" for j, alt in enumerate(p["alternatives"])]
+        lines.append(f"{p['key']}\tequ\t{p['alternatives'][p['selected']]}\t;gewaehlte Variante")
+        return lines
+    if p["kind"] == "bool":
+        return [f"{p['key']}\tequ\t{p['value']}\t;=1: mit {p['key']}"]
+    if p["kind"] == "string":
+        return [f"{p['key']}:\tdb\t'{p['value']}',0\t;;0 bis 127 Zeichen"]
+    return [f"{p['key']}\tequ\t{p['value']}\t;Adresse {p['key']}"]
+
+
+def mac_lines(fname, params, total_lines, rng):
+    """
+    Inhalt einer *.mac Datei: Kopf, die Definitionen gleichmäßig verteilt und Füllzeilen
+    (Kommentare, Labels, Code) bis total_lines Zeilen.
+    """
+    header = [
+        f"\ttitle\tSynthetisches BIOS ({fname})",
+        "\tname\t('SYNMOD')",
+        "\t.z80",
+        "",
+    ]
+    blocks = [definition_lines(p) for p in params]
+    n_def = sum(len(b) for b in blocks)
+    filler_total = max(0, total_lines - len(header) - n_def - 1)
+    gap = filler_total // (len(blocks) + 1) if blocks else filler_total
+    label = 0
+
+    def filler(count):
+        nonlocal label
+        lines = []
+        while len(lines) < count:
+            r = rng.random()
+            if r < 0.15:
+                lines.append(rng.choice(FILLER_COMMENTS))
+            elif r < 0.25:
+                label += 1
+                lines.append(f"syl{label}:")
+            else:
+                lines.append(rng.choice(FILLER_CODE).format(label=f"syl{max(label, 1)}",
+                                                           hex=f"0{rng.randrange(256):02X}h"))
+        return lines
+
+    out = list(header)
+    for block in blocks:
+        out += filler(gap)
+        out += block
+    out += filler(total_lines - len(out) - 1)
+    out.append("\tend")
+    return out
+
+
+def write_lines(path, lines, newline):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write("".join(line + newline for line in lines))
+
+
+def generate(name, args, root):
+    """Schreibt config/<name>/Kconfig.system und src/<name>/ unterhalb von root."""
+    config_dir = os.path.join(root, "config", name)
+    src_dir = os.path.join(root, "src", name)
+    for d in (config_dir, src_dir):
+        if os.path.exists(d):
+            if not args.force:
+                print(f"[FEHLER] {d} existiert bereits (mit --force überschreiben)")
+                sys.exit(1)
+            shutil.rmtree(d)
+        os.makedirs(d)
+
+    rng = random.Random(args.seed)
+    files, params = build_params(args)
+    write_lines(os.path.join(config_dir, "Kconfig.system"), kconfig_lines(name, params), "\n")
+    for fname in files:
+        file_params = [p for p in params if p["source"] == fname]
+        write_lines(os.path.join(src_dir, fname), mac_lines(fname, file_params, args.lines, rng), "\r\n")
+    write_lines(os.path.join(src_dir, "about.txt"),
+                [f"Synthetische Variante fuer Skalierungstests: {len(params)} Parameter, "
+                 f"{len(files)} Dateien zu je ca. {args.lines} Zeilen"], "\n")
+    return files, params
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Erzeugt eine synthetische Systemvariante für Skalierungstests")
+    parser.add_argument("name", help="Name der Variante (Ordner unter config/ und src/)")
+    parser.add_argument("-c", "--choices", type=int, default=20, help="Anzahl Auswahlgruppen (Standard: 20)")
+    parser.add_argument("-a", "--alternatives", type=int, default=4,
+                        help="Alternativen je Auswahlgruppe (Standard: 4)")
+    parser.add_argument("-b", "--bools", type=int, default=20, help="Anzahl bool-Schalter (Standard: 20)")
+    parser.add_argument("-s", "--strings", type=int, default=5, help="Anzahl string-Optionen (Standard: 5)")
+    parser.add_argument("-x", "--hexstrings", type=int, default=20,
+                        help="Anzahl hexstring-Optionen (Standard: 20)")
+    parser.add_argument("-l", "--lines", type=int, default=1600,
+                        help="Zeilen je *.mac Datei (Standard: 1600, etwa wie bios.mac)")
+    parser.add_argument("-f", "--files", type=int, default=1, help="Anzahl *.mac Dateien (Standard: 1)")
+    parser.add_argument("--seed", type=int, default=0, help="Startwert für Zufallswerte (Standard: 0)")
+    parser.add_argument("--root", default=REPO_DIR,
+                        help="Wurzelverzeichnis mit config/ und src/ (Standard: Repository)")
+    parser.add_argument("--force", action="store_true", help="Vorhandene Variante überschreiben")
+    args = parser.parse_args()
+    if args.alternatives < 2 or args.files < 1:
+        print("[FEHLER] Mindestens 2 Alternativen je Auswahlgruppe und 1 Datei erforderlich")
+        sys.exit(1)
+
+    files, params = generate(args.name, args, args.root)
+    print(f"[INFO] Variante {args.name} erzeugt unter {args.root}: {len(params)} Parameter "
+          f"({args.choices} Auswahlgruppen, {args.bools} bool, {args.strings} string, "
+          f"{args.hexstrings} hexstring), {len(files)} *.mac Datei(en) zu je ca. {args.lines} Zeilen")
+
+if __name__ == "__main__":
+    main()
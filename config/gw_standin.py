@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# Copyright (c) 2025 by olliy78
+# SPDX-License-Identifier: MIT
+"""
+Lokaler Ersatz für 'gw write' zum Testen von writeimage ohne Greaseweazle und Laufwerk
+
+Statt auf eine Diskette werden die Spuren in eine Datei geschrieben, die die physikalische Diskette
+darstellt (Umgebungsvariable GW_STANDIN_DISK, Standard: build/gw_standin.img). Mit --tracks werden
+wie bei gw nur die angegebenen Zylinder/Köpfe übernommen. Jeder Aufruf wird mit den geschriebenen
+Spuren nach GW_STANDIN_LOG protokolliert (falls gesetzt).
+
+Verwendung:
+    python gw_standin.py write --diskdefs=DATEI --format=FORMAT [--tracks=c=...:h=...] <image>
+
+Beispiele:
+    make config writeimage GW="python3 config/gw_standin.py"
+    GW_STANDIN_DISK=/tmp/disk.img python config/cpa_writeimage.py build/cpadisk.img --format cpa800 \\
+        --gw "python3 config/gw_standin.py"
+"""
+import os
+import sys
+import argparse
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPT_DIR)
+
+import cpa_formats
+from cpa_writeimage import parse_spec_tracks
+
+DEFAULT_DISK = os.path.join("build", "gw_standin.img")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ersatz für 'gw write', schreibt in eine Datei")
+    parser.add_argument("command", choices=("write",))
+    parser.add_argument("--diskdefs", required=True)
+    parser.add_argument("--format", required=True)
+    parser.add_argument("--tracks", help="Spurauswahl wie bei gw, z.B. c=0-4,9:h=0")
+    parser.add_argument("image")
+    args = parser.parse_args()
+
+    fmt = cpa_formats.load(args.diskdefs).gw_format(args.format)
+    with open(args.image, "rb") as f:
+        data = f.read()
+    disk_path = os.environ.get("GW_STANDIN_DISK", DEFAULT_DISK)
+    disk = bytearray(open(disk_path, "rb").read()) if os.path.exists(disk_path) else bytearray()
+    if len(disk) < len(data):
+        disk += bytes(len(data) - len(disk))
+
+    selected = set(parse_spec_tracks(args.tracks)) if args.tracks else None
+    written = []
+    for c, h in fmt.tracks:
+        if selected is None or f"{c}.{h}" in selected:
+            pos = fmt.track_offsets[(c, h)]
+            disk[pos:pos + fmt.track_size(c, h)] = fmt.track(data, c, h)
+            written.append(f"{c}.{h}")
+    with open(disk_path, "wb") as f:
+        f.write(disk)
+    print(f"[INFO] gw_standin: {len(written)} Spuren nach {disk_path} geschrieben")
+    if os.environ.get("GW_STANDIN_LOG"):
+        with open(os.environ["GW_STANDIN_LOG"], "a", encoding="utf-8") as f:
+            f.write(f"{args.tracks or '*'} {' '.join(written)}\n")
+
+if __name__ == "__main__":
+    main()
@@ -455,6 +455,25 @@ Some optional warnings can be controlled via environment variables:
     variable.
 
 
+Compiled expression evaluation
+------------------------------
+
+If the KCONFIG_COMPILE_EXPRS environment variable is set to 'y', the
+dependency, default, visibility, and range expressions of all symbols, choices,
+and menu nodes are compiled into Python functions once the Kconfig files have
+been parsed (see Kconfig.compile_exprs()). Symbol and choice values are then
+computed with the compiled functions instead of walking the expression trees.
+The compiled functions belong to the Kconfig instance and are freed with it.
+
+Only expressions with operators (&&, ||, !, =, !=, <, etc.) are compiled.
+Plain symbol references are already cheap to evaluate. Kconfig files that only
+use simple 'depends on FOO' dependencies therefore compile no expressions at
+all and get no speed-up. This is the case for all Kconfig files of the CPA
+Workbench, so 'make menuconfig' does not get faster with
+KCONFIG_COMPILE_EXPRS=y. The option pays off for large Kconfig trees with many
+expressions of that kind.
+
+
 Preprocessor user functions defined in Python
 ---------------------------------------------
 
@@ -552,6 +571,7 @@ import sys
 # Get rid of some attribute lookups. These are obvious in context.
 from glob import iglob
 from os.path import dirname, exists, expandvars, islink, join, realpath
+from types import FunctionType
 
 
 VERSION = (14, 1, 0)
@@ -811,7 +831,9 @@ class Kconfig(object):
       See the module docstring.
     """
     __slots__ = (
+        "_compiled_exprs",
         "_encoding",
+        "_expr_value",
         "_functions",
         "_set_match",
         "_srctree_prefix",
@@ -857,6 +879,7 @@ class Kconfig(object):
         "_line",
         "_tokens",
         "_tokens_i",
+        "_line_tokens",
         "_reuse_tokens",
     )
 
@@ -961,6 +984,10 @@ class Kconfig(object):
 
         self._encoding = encoding
 
+        # Replaced by _compiled_expr_value() in compile_exprs()
+        self._compiled_exprs = {}
+        self._expr_value = expr_value
+
         self.srctree = os.getenv("srctree", "")
         # A prefix we can reliably strip from glob() results to get a filename
         # relative to $srctree. relpath() can cause issues for symlinks,
@@ -1075,6 +1102,10 @@ class Kconfig(object):
         # unget operation.
         self._reuse_tokens = False
 
+        # Maps lines to their tokens, for lines without side effects when
+        # tokenized. See _tokenize().
+        self._line_tokens = {}
+
         # Open the top-level Kconfig file. Store the readline() method directly
         # as a small optimization.
         self._readline = self._open(join(self.srctree, filename), "r").readline
@@ -1093,6 +1124,7 @@ class Kconfig(object):
         self._readline.__self__.close()
 
         self._parsing_kconfigs = False
+        self._line_tokens.clear()
 
         # Do various menu tree post-processing
         self._finalize_node(self.top_node, self.y)
@@ -1123,6 +1155,9 @@ class Kconfig(object):
         # awkward during dependency loop detection
         self._add_choice_deps()
 
+        if os.getenv("KCONFIG_COMPILE_EXPRS") == "y":
+            self.compile_exprs()
+
     @property
     def mainmenu_text(self):
         """
@@ -1987,6 +2022,72 @@ class Kconfig(object):
 
         return expr_value(self._expect_expr_and_eol())
 
+    def compile_exprs(self):
+        """
+        Compiles the expressions of all symbols, choices, and menu nodes into
+        Python functions, which the symbol and choice values are computed with
+        from then on. The values of the expressions stay the same; only the
+        evaluation gets faster. This is done automatically after parsing if
+        KCONFIG_COMPILE_EXPRS is set to 'y'. Calling it more than once is
+        harmless. Returns the number of compiled expressions.
+
+        Covered are direct dependencies, reverse dependencies (select/imply),
+        defaults and their conditions, range conditions, prompt conditions
+        (visibility), and the 'depends on'/'visible if' dependencies of menu
+        nodes.
+
+        Only expressions with operators (&&, ||, !, =, !=, <, etc.) are
+        compiled. Kconfig files that only use plain symbols as dependencies
+        compile nothing, and evaluation then stays exactly as without this
+        call.
+
+        The compiled functions are stored in the Kconfig instance and are
+        freed together with it.
+        """
+        compiled = self._compiled_exprs
+
+        for sym in self.unique_defined_syms:
+            _compile_expr(sym.direct_dep, compiled)
+            _compile_expr(sym.rev_dep, compiled)
+            _compile_expr(sym.weak_rev_dep, compiled)
+
+            for default, cond in sym.defaults:
+                _compile_expr(default, compiled)
+                _compile_expr(cond, compiled)
+
+            for _, _, cond in sym.ranges:
+                _compile_expr(cond, compiled)
+
+        for choice in self.unique_choices:
+            _compile_expr(choice.direct_dep, compiled)
+
+            for _, cond in choice.defaults:
+                _compile_expr(cond, compiled)
+
+        for node in self.node_iter():
+            _compile_expr(node.dep, compiled)
+
+            if node.item is MENU:
+                _compile_expr(node.visibility, compiled)
+
+            if node.prompt:
+                _compile_expr(node.prompt[1], compiled)
+
+        if compiled:
+            self._expr_value = self._compiled_expr_value
+
+        return len(compiled)
+
+    def _compiled_expr_value(self, expr):
+        # Replacement for expr_value() once compile_exprs() has compiled
+        # something. Runs the compiled function for 'expr', if there is one.
+
+        compiled = self._compiled_exprs.get(id(expr))
+        if compiled:
+            return compiled[0]()
+
+        return expr_value(expr)
+
     def unset_values(self):
         """
         Removes any user values from all symbols, as if Kconfig.load_config()
@@ -2346,6 +2447,14 @@ class Kconfig(object):
 
         self._line = s  # Used for error reporting
 
+        # Lines seen before while parsing give the same tokens, unless they
+        # had side effects when tokenized. See the fast path below. Generated
+        # Kconfig files repeat lines like 'bool', 'default n', and 'help' a
+        # lot.
+        tokens = self._line_tokens.get(s)
+        if tokens:
+            return tokens
+
         # Initial token on the line
         match = _command_match(s)
         if not match:
@@ -2375,6 +2484,79 @@ class Kconfig(object):
         # The current index in the string being tokenized
         i = match.end()
 
+        if "$" not in s and "\\" not in s:
+            # Fast path for lines without macros and backslash escapes, which
+            # is nearly all of them. _token_findall() splits the rest of the
+            # line into lexemes in a single call, and we dispatch on which
+            # group of the master regex matched. This saves a regex call and
+            # the character-by-character operator checks per token compared
+            # to the general loop below, which produces the same tokens.
+            #
+            # Tricky implementation detail: 'token' refers to the previous
+            # token here too.
+            append = tokens.append
+            # Existing symbols are fetched without calling _lookup_sym()
+            get_sym = self.syms.get
+            # Outside of parsing (eval_string()), undefined symbols aren't
+            # registered and give a warning each time, so no caching there
+            cacheable = self._parsing_kconfigs
+            # Truthy if the previous lexeme was an identifier/keyword. The
+            # initial token counts as one.
+            after_name = True
+            for name, string, op, comment, other in _token_findall(s, i):
+                if name:
+                    keyword = _get_keyword(name)
+                    if keyword:
+                        token = keyword
+
+                    elif token not in _STRING_LEX:
+                        token = self.const_syms[name] if name in STR_TO_TRI \
+                            else get_sym(name) or self._lookup_sym(name)
+
+                    else:
+                        # Missing quotes. See the general loop.
+                        if token is not _T_CHOICE:
+                            self._warn("style: quotes recommended around '{}' in '{}'"
+                                       .format(name, self._line.strip()),
+                                       self.filename, self.linenr)
+                            # The warning has to be repeated for later
+                            # occurrences of the line
+                            cacheable = False
+
+                        token = name
+
+                elif op:
+                    token = _OPERATOR_TOKENS[op]
+
+                elif string:
+                    val = string[1:-1]
+                    token = \
+                        val if token in _STRING_LEX or tokens[0] is _T_OPTION \
+                        else self._lookup_const_sym(val)
+
+                elif comment:
+                    break
+
+                else:
+                    # A character the other groups don't handle. The regex
+                    # only eats ASCII whitespace, and the general loop skips
+                    # other whitespace after operators and strings (but not
+                    # after identifiers).
+                    if other.isspace() and not after_name:
+                        continue
+
+                    if other in "\"'":
+                        self._parse_error("unterminated string")
+                    self._parse_error("unknown tokens in line")
+
+                after_name = name
+                append(token)
+
+            append(None)
+            if cacheable:
+                self._line_tokens[s] = tokens
+            return tokens
+
         # Main tokenization loop (for tokens past the first one)
         while i < len(s):
             # Test for an identifier/keyword first. This is the most common
@@ -3347,11 +3529,19 @@ class Kconfig(object):
         lines = [expline[indent:]]
         add_line = lines.append  # Micro-optimization
 
+        # Lines that start with 'indent' spaces are part of the help text
+        # without further checks. This is nearly all lines in long help
+        # texts, and saves the expandtabs()/lstrip() copies for them.
+        prefix = indent*" "
+
         while 1:
             line = readline()
             if line.isspace():
                 # No need to preserve the exact whitespace in these
                 add_line("\n")
+            elif line[:indent] == prefix:
+                add_line(line[indent:] if "\t" not in line else
+                         line.expandtabs()[indent:])
             elif not line:
                 # End of file
                 break
@@ -4303,6 +4493,10 @@ class Symbol(object):
             self._cached_str_val = self.name
             return self.name
 
+        # Evaluates with the compiled expressions, if any. See
+        # Kconfig.compile_exprs().
+        expr_value = self.kconfig._expr_value
+
         val = ""
         # Warning: See Symbol._rec_invalidate(), and note that this is a hidden
         # function call (property magic)
@@ -4448,6 +4642,10 @@ class Symbol(object):
         vis = self.visibility
         self._write_to_conf = (vis != 0)
 
+        # Evaluates with the compiled expressions, if any. See
+        # Kconfig.compile_exprs().
+        expr_value = self.kconfig._expr_value
+
         val = 0
 
         if not self.choice:
@@ -4822,6 +5020,10 @@ class Symbol(object):
         if not vis:
             return ()
 
+        # Evaluates with the compiled expressions, if any. See
+        # Kconfig.compile_exprs().
+        expr_value = self.kconfig._expr_value
+
         rev_dep_val = expr_value(self.rev_dep)
 
         if vis == 2:
@@ -4921,6 +5123,10 @@ class Symbol(object):
         # the same algorithm as the C implementation (though a bit cleaned up),
         # for compatibility.
 
+        # Evaluates with the compiled expressions, if any. See
+        # Kconfig.compile_exprs().
+        expr_value = self.kconfig._expr_value
+
         if self.orig_type in _BOOL_TRISTATE:
             val = 0
 
@@ -5438,6 +5644,10 @@ class Choice(object):
         return self._selection_from_defaults()
 
     def _selection_from_defaults(self):
+        # Evaluates with the compiled expressions, if any. See
+        # Kconfig.compile_exprs().
+        expr_value = self.kconfig._expr_value
+
         # Check if we have a default
         for sym, cond in self.defaults:
             # The default symbol must be visible too
@@ -6013,33 +6223,7 @@ def expr_value(expr):
     if expr[0] is NOT:
         return 2 - expr_value(expr[1])
 
-    # Relation
-    #
-    # Implements <, <=, >, >= comparisons as well. These were added to
-    # kconfig in 31847b67 (kconfig: allow use of relations other than
-    # (in)equality).
-
-    rel, v1, v2 = expr
-
-    # If both operands are strings...
-    if v1.orig_type is STRING and v2.orig_type is STRING:
-        # ...then compare them lexicographically
-        comp = _strcmp(v1.str_value, v2.str_value)
-    else:
-        # Otherwise, try to compare them as numbers
-        try:
-            comp = _sym_to_num(v1) - _sym_to_num(v2)
-        except ValueError:
-            # Fall back on a lexicographic comparison if the operands don't
-            # parse as numbers
-            comp = _strcmp(v1.str_value, v2.str_value)
-
-    return 2*(comp == 0 if rel is EQUAL else
-              comp != 0 if rel is UNEQUAL else
-              comp <  0 if rel is LESS else
-              comp <= 0 if rel is LESS_EQUAL else
-              comp >  0 if rel is GREATER else
-              comp >= 0)
+    return _relation_value(expr)
 
 
 def standard_sc_expr_str(sc):
@@ -6289,6 +6473,10 @@ def _visibility(sc):
     # e.g. 'make menuconfig'. This function calculates the visibility for the
     # Symbol or Choice 'sc' -- the logic is nearly identical.
 
+    # Evaluates with the compiled expressions, if any. See
+    # Kconfig.compile_exprs().
+    expr_value = sc.kconfig._expr_value
+
     vis = 0
 
     for node in sc.nodes:
@@ -6375,6 +6563,151 @@ def _sym_to_num(sym):
            int(sym.str_value, _TYPE_TO_BASE[sym.orig_type])
 
 
+def _relation_value(expr):
+    # expr_value() helper for evaluating a relation (FOO = BAR, etc.)
+    #
+    # Implements <, <=, >, >= comparisons as well. These were added to
+    # kconfig in 31847b67 (kconfig: allow use of relations other than
+    # (in)equality).
+
+    rel, v1, v2 = expr
+
+    # If both operands are strings...
+    if v1.orig_type is STRING and v2.orig_type is STRING:
+        # ...then compare them lexicographically
+        comp = _strcmp(v1.str_value, v2.str_value)
+    else:
+        # Otherwise, try to compare them as numbers
+        try:
+            comp = _sym_to_num(v1) - _sym_to_num(v2)
+        except ValueError:
+            # Fall back on a lexicographic comparison if the operands don't
+            # parse as numbers
+            comp = _strcmp(v1.str_value, v2.str_value)
+
+    return 2*(comp == 0 if rel is EQUAL else
+              comp != 0 if rel is UNEQUAL else
+              comp <  0 if rel is LESS else
+              comp <= 0 if rel is LESS_EQUAL else
+              comp >  0 if rel is GREATER else
+              comp >= 0)
+
+
+def _compile_expr(expr, compiled):
+    # Kconfig.compile_exprs() helper. Compiles the expression 'expr' into a
+    # Python function that returns the same value as expr_value(expr), and
+    # stores it in 'compiled' (Kconfig._compiled_exprs). Symbols and choices
+    # are left alone, as expr_value() just returns their tri_value.
+    #
+    # The generated function evaluates the whole expression tree with plain
+    # statements, with no recursion and no function call per subexpression.
+    # Cached symbol values are read directly.
+    #
+    # Expressions with the same shape (same operators, and symbols in the same
+    # positions) share the generated code, so only a few distinct functions
+    # ever get compiled. The symbols are passed in as default arguments, which
+    # makes them fast local variable lookups.
+
+    if expr.__class__ is not tuple or id(expr) in compiled:
+        return
+
+    args = []
+    shape = _expr_shape(expr, args, {})
+
+    template = _compiled_shapes.get(shape)
+    if template is None:
+        lines = []
+        _gen_expr_code(shape, " ", "v", lines)
+        namespace = {"_relation_value": _relation_value}
+        exec("def f({}):\n{}\n return v\n".format(
+                 ", ".join("a{}=None".format(i) for i in range(len(args))),
+                 "\n".join(lines)),
+             namespace)
+        template = _compiled_shapes[shape] = namespace["f"]
+
+    # Store 'expr' as well, so that its id() can't get reused while the
+    # compiled function is registered
+    compiled[id(expr)] = (
+        FunctionType(template.__code__, template.__globals__, "f",
+                     tuple(args)),
+        expr)
+
+
+def _expr_shape(expr, args, arg_indices):
+    # _compile_expr() helper. Returns a hashable description of the shape of
+    # 'expr', where symbols, choices, and relations are replaced by indices
+    # into 'args'. Objects that appear more than once share an index.
+
+    if expr.__class__ is not tuple:
+        if expr.__class__ is Symbol:
+            if expr.is_constant:
+                # n, m, y, or a quoted symbol. Never changes value.
+                return expr.tri_value
+            kind = "sym"
+        else:
+            kind = "choice"
+
+    elif expr[0] is AND or expr[0] is OR:
+        return (expr[0], _expr_shape(expr[1], args, arg_indices),
+                         _expr_shape(expr[2], args, arg_indices))
+
+    elif expr[0] is NOT:
+        return (NOT, _expr_shape(expr[1], args, arg_indices))
+
+    else:
+        # Relations are rare and comparatively involved. Keep using the
+        # non-compiled implementation for them.
+        kind = "rel"
+
+    i = arg_indices.get(id(expr))
+    if i is None:
+        i = arg_indices[id(expr)] = len(args)
+        args.append(expr)
+    return (kind, i)
+
+
+def _gen_expr_code(shape, indent, res, lines):
+    # _compile_expr() helper. Appends lines of code to 'lines' that store the
+    # value of the expression with shape 'shape' in the variable 'res'.
+
+    if shape.__class__ is not tuple:
+        # Constant symbol
+        lines.append("{}{} = {}".format(indent, res, shape))
+
+    elif shape[0] == "sym":
+        arg = "a{}".format(shape[1])
+        lines.append("{}{} = {}._cached_tri_val".format(indent, res, arg))
+        lines.append("{}if {} is None: {} = {}.tri_value"
+                     .format(indent, res, res, arg))
+
+    elif shape[0] == "choice":
+        lines.append("{}{} = a{}.tri_value".format(indent, res, shape[1]))
+
+    elif shape[0] == "rel":
+        lines.append("{}{} = _relation_value(a{})"
+                     .format(indent, res, shape[1]))
+
+    elif shape[0] is NOT:
+        _gen_expr_code(shape[1], indent, res, lines)
+        lines.append("{}{} = 2 - {}".format(indent, res, res))
+
+    else:
+        # AND or OR. Short-circuits the n and y cases, respectively, like
+        # expr_value().
+        _gen_expr_code(shape[1], indent, res, lines)
+        tmp = res + "_"
+        if shape[0] is AND:
+            lines.append("{}if {}:".format(indent, res))
+            _gen_expr_code(shape[2], indent + " ", tmp, lines)
+            lines.append("{} if {} < {}: {} = {}"
+                         .format(indent, tmp, res, res, tmp))
+        else:
+            lines.append("{}if {} != 2:".format(indent, res))
+            _gen_expr_code(shape[2], indent + " ", tmp, lines)
+            lines.append("{} if {} > {}: {} = {}"
+                         .format(indent, tmp, res, res, tmp))
+
+
 def _touch_dep_file(path, sym_name):
     # If sym_name is MY_SYM_NAME, touches my/sym/name.h. See the sync_deps()
     # docstring.
@@ -6827,6 +7160,11 @@ STR_TO_TRI = {
 # Symbol will do. We test this with 'is'.
 _NO_CACHED_SELECTION = 0
 
+# Maps expression shapes to compiled template functions. See _compile_expr().
+# The templates hold no symbols (these are bound per expression), so sharing
+# them between Kconfig instances keeps nothing alive.
+_compiled_shapes = {}
+
 # Are we running on Python 2?
 _IS_PY2 = sys.version_info[0] < 3
 
@@ -7013,6 +7351,21 @@ _DEF_TOKEN_TO_TYPE = {
     _T_DEF_TRISTATE: TRISTATE,
 }
 
+# Operator lexemes to tokens, for the 'op' group in _token_findall
+_OPERATOR_TOKENS = {
+    "&&": _T_AND,
+    "||": _T_OR,
+    "=":  _T_EQUAL,
+    "!=": _T_UNEQUAL,
+    "!":  _T_NOT,
+    "(":  _T_OPEN_PAREN,
+    ")":  _T_CLOSE_PAREN,
+    "<=": _T_LESS_EQUAL,
+    "<":  _T_LESS,
+    ">=": _T_GREATER_EQUAL,
+    ">":  _T_GREATER,
+}
+
 # Tokens after which strings are expected. This is used to tell strings from
 # constant symbol references during tokenization, both of which are enclosed in
 # quotes.
@@ -7136,6 +7489,26 @@ _command_match = _re_match(r"\s*([A-Za-z0-9_$-]+)\s*")
 # '$' is included to detect identifiers containing macro expansions.
 _id_keyword_match = _re_match(r"([A-Za-z0-9_$/.-]+)\s*")
 
+# Master regex for the tokens after the first one on lines without '$' and
+# '\', used with findall() by the fast path in Kconfig._tokenize(). Exactly one
+# of the groups is non-empty for each lexeme:
+#
+#   name     An identifier or keyword
+#   string   A string literal, including the quotes (so that "" is non-empty)
+#   op       An operator (see _OPERATOR_TOKENS)
+#   comment  A '#' comment, running to the end of the line
+#   other    Any other character, which is either non-ASCII whitespace or an
+#            error
+#
+# Trailing whitespace is eaten after identifiers, strings, and operators.
+_token_findall = re.compile(
+    r"(?P<name>[A-Za-z0-9_/.-]+)\s*"
+    r"|(?P<string>\"[^\"]*\"|'[^']*')\s*"
+    r"|(?P<op>&&|\|\||!=|<=|>=|[=!()<>])\s*"
+    r"|(?P<comment>#.*)"
+    r"|(?P<other>.)",
+    re.DOTALL if _IS_PY2 else re.ASCII | re.DOTALL).findall
+
 # A fragment in the left-hand side of a preprocessor variable assignment. These
 # are the portions between macro expansions ($(foo)). Macros are supported in
 # the LHS (variable name).
@@ -148,6 +148,21 @@ MENUCONFIG_STYLE is ignored. The assumption is that the environment is broken
 somehow, and that the important thing is to get something usable.
 
 
+Slow terminals
+==============
+
+The main display and the fullscreen dialogs are drawn row by row, and only the
+rows that changed since the previous keypress are redrawn. Scrolling lists
+use the terminal's insert/delete line functions where available.
+
+For slow serial consoles and high-latency SSH links, setting the
+MENUCONFIG_LOW_BANDWIDTH environment variable to a non-empty value other than
+'0' enables a low-bandwidth mode. It uses no colors and no line-drawing
+characters (the scroll arrows and the menu path separator become '^', 'v', and
+'>'), and only highlights the selection and edit boxes. MENUCONFIG_STYLE is
+ignored in low-bandwidth mode.
+
+
 Other features
 ==============
 
@@ -325,6 +340,24 @@ _STYLES = {
     frame=fg:white,bg:cyan
     body=fg:white,bg:blue
     edit=fg:black,bg:white
+    """,
+
+    # This style is forced in low-bandwidth mode. Only the selection and the
+    # edit boxes are highlighted, to keep attribute changes to a minimum.
+    "low-bandwidth": """
+    path=
+    separator=
+    list=
+    selection=standout
+    inv-list=
+    inv-selection=standout
+    help=
+    show-help=
+    frame=
+    body=
+    edit=standout
+    jump-edit=
+    text=
     """
 }
 
@@ -617,6 +650,11 @@ def _init_styles():
             # seems to be a lot of general brokenness there.
             pass
 
+    if _low_bandwidth:
+        # No colors or line-drawing characters in low-bandwidth mode. Ignore
+        # MENUCONFIG_STYLE, like for the 'monochrome' theme below.
+        _parse_style("low-bandwidth", True)
+    elif curses.has_colors():
         # Use the 'default' theme as the base, and add any user-defined style
         # settings from the environment
         _parse_style("default", True)
@@ -639,9 +677,9 @@ def _style_attr(fg_color, bg_color, attribs, color_attribs={}):
     # and the attributes in 'attribs'. Reuses color pairs already created if
     # possible, and creates a new color pair otherwise.
     #
-    # Returns 'attribs' if colors aren't supported.
+    # Returns 'attribs' if colors aren't supported or in low-bandwidth mode.
 
-    if not curses.has_colors():
+    if not curses.has_colors() or _low_bandwidth:
         return attribs
 
     if (fg_color, bg_color) not in color_attribs:
@@ -675,9 +713,15 @@ def menuconfig(kconf):
     global _conf_changed
     global _minconf_filename
     global _show_all
+    global _low_bandwidth
 
     _kconf = kconf
 
+    # Low-bandwidth mode for slow serial consoles and SSH links. See the
+    # module docstring.
+    _low_bandwidth = \
+        os.environ.get("MENUCONFIG_LOW_BANDWIDTH", "") not in ("", "0")
+
     # Filename to save configuration to
     _conf_filename = standard_config_filename()
 
@@ -725,7 +769,10 @@ def menuconfig(kconf):
     # (From a quick glance at the ncurses source code, ESCDELAY might only be
     # relevant for mouse events there, so maybe escapes are assumed to arrive
     # in one piece already...)
-    os.environ.setdefault("ESCDELAY", "0")
+    #
+    # On slow serial links, escape codes do get split up, so use a delay that
+    # covers a few characters at 9600 baud in low-bandwidth mode.
+    os.environ.setdefault("ESCDELAY", "100" if _low_bandwidth else "0")
 
     # Enter curses mode. _menuconfig() returns a string to print on exit, after
     # curses has been de-initialized.
@@ -799,6 +846,9 @@ def _needs_save():
 #   _show_help/_show_name/_show_all:
 #     If True, the corresponding mode is on. See the module docstring.
 #
+#   _low_bandwidth:
+#     True in low-bandwidth mode. See the module docstring.
+#
 #   _conf_filename:
 #     File to save the configuration to
 #
@@ -1008,6 +1058,9 @@ def _init():
     # List of menu entries with symbols, etc.
     _menu_win = _styled_win("list")
     _menu_win.keypad(True)
+    # Let curses scroll the terminal (insert/delete line) instead of
+    # repainting every row when the list scrolls by a few rows
+    _menu_win.idlok(True)
 
     # Row below menu list, with arrows pointing down
     _bot_sep_win = _styled_win("separator")
@@ -1334,8 +1387,9 @@ def _draw_main():
     # Draws the "main" display, with the list of symbols, the header, and the
     # footer.
     #
-    # This could be optimized to only update the windows that have actually
-    # changed, but keep it simple for now and let curses sort it out.
+    # Each window is described as a list of rows and handed to _draw_rows(),
+    # which only rewrites the rows that changed since the previous frame. See
+    # the "Slow terminals" section in the module docstring.
 
     term_width = _width(_stdscr)
 
@@ -1343,19 +1397,19 @@ def _draw_main():
     # Update the separator row below the menu path
     #
 
-    _top_sep_win.erase()
+    top_sep = []
 
     # Draw arrows pointing up if the symbol window is scrolled down. Draw them
     # before drawing the title, so the title ends up on top for small windows.
     if _menu_scroll > 0:
-        _safe_hline(_top_sep_win, 0, 4, curses.ACS_UARROW, _N_SCROLL_ARROWS)
+        top_sep.append((4, _arrow(curses.ACS_UARROW, "^"), None,
+                        _N_SCROLL_ARROWS))
 
     # Add the 'mainmenu' text as the title, centered at the top
-    _safe_addstr(_top_sep_win,
-                 0, max((term_width - len(_kconf.mainmenu_text))//2, 0),
-                 _kconf.mainmenu_text)
+    top_sep.append((max((term_width - len(_kconf.mainmenu_text))//2, 0),
+                    _kconf.mainmenu_text, None))
 
-    _top_sep_win.noutrefresh()
+    _draw_rows(_top_sep_win, "main-top-sep", [tuple(top_sep)])
 
     # Note: The menu path at the top is deliberately updated last. See below.
 
@@ -1363,7 +1417,7 @@ def _draw_main():
     # Update the symbol window
     #
 
-    _menu_win.erase()
+    menu_rows = []
 
     # Draw the _shown nodes starting from index _menu_scroll up to either as
     # many as fit in the window, or to the end of _shown
@@ -1381,19 +1435,20 @@ def _draw_main():
         else:
             style = _style["inv-selection" if i == _sel_node_i else "inv-list"]
 
-        _safe_addstr(_menu_win, i - _menu_scroll, 0, _node_str(node), style)
+        menu_rows.append(((0, _node_str(node), style),))
 
-    _menu_win.noutrefresh()
+    _draw_rows(_menu_win, "main-menu", menu_rows)
 
     #
     # Update the bottom separator window
     #
 
-    _bot_sep_win.erase()
+    bot_sep = []
 
     # Draw arrows pointing down if the symbol window is scrolled up
     if _menu_scroll < _max_scroll(_shown, _menu_win):
-        _safe_hline(_bot_sep_win, 0, 4, curses.ACS_DARROW, _N_SCROLL_ARROWS)
+        bot_sep.append((4, _arrow(curses.ACS_DARROW, "v"), None,
+                        _N_SCROLL_ARROWS))
 
     # Indicate when show-name/show-help/show-all mode is enabled
     enabled_modes = []
@@ -1405,29 +1460,25 @@ def _draw_main():
         enabled_modes.append("show-all")
     if enabled_modes:
         s = " and ".join(enabled_modes) + " mode enabled"
-        _safe_addstr(_bot_sep_win, 0, max(term_width - len(s) - 2, 0), s)
+        bot_sep.append((max(term_width - len(s) - 2, 0), s, None))
 
-    _bot_sep_win.noutrefresh()
+    _draw_rows(_bot_sep_win, "main-bot-sep", [tuple(bot_sep)])
 
     #
     # Update the help window, which shows either key bindings or help texts
     #
 
-    _help_win.erase()
-
     if _show_help:
         node = _shown[_sel_node_i]
         if isinstance(node.item, (Symbol, Choice)) and node.help:
             help_lines = textwrap.wrap(node.help, _width(_help_win))
-            for i in range(min(_height(_help_win), len(help_lines))):
-                _safe_addstr(_help_win, i, 0, help_lines[i])
         else:
-            _safe_addstr(_help_win, 0, 0, "(no help)")
+            help_lines = ["(no help)"]
     else:
-        for i, line in enumerate(_MAIN_HELP_LINES):
-            _safe_addstr(_help_win, i, 0, line)
+        help_lines = _MAIN_HELP_LINES
 
-    _help_win.noutrefresh()
+    _draw_rows(_help_win, "main-help",
+               [((0, line, None),) for line in help_lines])
 
     #
     # Update the top row with the menu path.
@@ -1438,8 +1489,6 @@ def _draw_main():
     # disappears.
     #
 
-    _path_win.erase()
-
     # Draw the menu path ("(Top) -> Menu -> Submenu -> ...")
 
     menu_prompts = []
@@ -1466,11 +1515,15 @@ def _draw_main():
 
     # Print the path with the arrows reinserted
     split_path = menu_path_str.split("\0")
-    _safe_addstr(_path_win, split_path[0])
+    path = [(0, split_path[0], None)]
+    x = len(split_path[0])
     for s in split_path[1:]:
-        _safe_addch(_path_win, curses.ACS_RARROW)
-        _safe_addstr(_path_win, s)
+        path.append((x, _arrow(curses.ACS_RARROW, ">"), None, 1))
+        path.append((x + 1, s, None))
+        x += 1 + len(s)
 
+    _draw_rows(_path_win, "main-path", [tuple(path)])
+    _safe_move(_path_win, 0, min(x, term_width - 1))
     _path_win.noutrefresh()
 
 
@@ -2031,6 +2084,8 @@ def _jump_to_dialog():
 
     # List of matches
     matches_win = _styled_win("list")
+    # See _init()
+    matches_win.idlok(True)
 
     # Bottom separator, with arrows pointing down
     bot_sep_win = _styled_win("separator")
@@ -2292,7 +2347,7 @@ def _draw_jump_to_dialog(edit_box, matches_win, bot_sep_win, help_win,
     # Update list of matches
     #
 
-    matches_win.erase()
+    match_rows = []
 
     if matches:
         for i in range(scroll,
@@ -2309,37 +2364,34 @@ def _draw_jump_to_dialog(edit_box, matches_win, bot_sep_win, help_win,
             else:  # node.item == COMMENT
                 node_str = 'comment "{}"'.format(node.prompt[0])
 
-            _safe_addstr(matches_win, i - scroll, 0, node_str,
-                         _style["selection" if i == sel_node_i else "list"])
+            style = _style["selection" if i == sel_node_i else "list"]
+            match_rows.append(((0, node_str, style),))
 
     else:
         # bad_re holds the error message from the re.error exception on errors
-        _safe_addstr(matches_win, 0, 0, bad_re or "No matches")
+        match_rows.append(((0, bad_re or "No matches", None),))
 
-    matches_win.noutrefresh()
+    _draw_rows(matches_win, "jump-to-matches", match_rows)
 
     #
     # Update bottom separator line
     #
 
-    bot_sep_win.erase()
+    bot_sep = ()
 
     # Draw arrows pointing down if the symbol list is scrolled up
     if scroll < _max_scroll(matches, matches_win):
-        _safe_hline(bot_sep_win, 0, 4, curses.ACS_DARROW, _N_SCROLL_ARROWS)
+        bot_sep = ((4, _arrow(curses.ACS_DARROW, "v"), None,
+                    _N_SCROLL_ARROWS),)
 
-    bot_sep_win.noutrefresh()
+    _draw_rows(bot_sep_win, "jump-to-bot-sep", [bot_sep])
 
     #
     # Update help window at bottom
     #
 
-    help_win.erase()
-
-    for i, line in enumerate(_JUMP_TO_HELP_LINES):
-        _safe_addstr(help_win, i, 0, line)
-
-    help_win.noutrefresh()
+    _draw_rows(help_win, "jump-to-help",
+               [((0, line, None),) for line in _JUMP_TO_HELP_LINES])
 
     #
     # Update edit box. We do this last since it makes it handy to position the
@@ -2353,8 +2405,8 @@ def _draw_jump_to_dialog(edit_box, matches_win, bot_sep_win, help_win,
     # Draw arrows pointing up if the symbol list is scrolled down
     if scroll > 0:
         # TODO: Bit ugly that _style["frame"] is repeated here
-        _safe_hline(edit_box, 2, 4, curses.ACS_UARROW, _N_SCROLL_ARROWS,
-                    _style["frame"])
+        _safe_hline(edit_box, 2, 4, _arrow(curses.ACS_UARROW, "^"),
+                    _N_SCROLL_ARROWS, _style["frame"])
 
     visible_s = s[hscroll:hscroll + edit_width]
     _safe_addstr(edit_box, 1, 1, visible_s)
@@ -2378,6 +2430,8 @@ def _info_dialog(node, from_jump_to_dialog):
     # Text display
     text_win = _styled_win("text")
     text_win.keypad(True)
+    # See _init()
+    text_win.idlok(True)
 
     # Bottom separator, with arrows pointing down
     bot_sep_win = _styled_win("separator")
@@ -2486,56 +2540,50 @@ def _draw_info_dialog(node, lines, scroll, top_line_win, text_win,
     # Update text display
     #
 
-    text_win.erase()
-
-    for i, line in enumerate(lines[scroll:scroll + text_win_height]):
-        _safe_addstr(text_win, i, 0, line)
-
-    text_win.noutrefresh()
+    _draw_rows(text_win, "info-text",
+               [((0, line, None),)
+                for line in lines[scroll:scroll + text_win_height]])
 
     #
     # Update bottom separator line
     #
 
-    bot_sep_win.erase()
+    bot_sep = ()
 
     # Draw arrows pointing down if the symbol window is scrolled up
     if scroll < _max_scroll(lines, text_win):
-        _safe_hline(bot_sep_win, 0, 4, curses.ACS_DARROW, _N_SCROLL_ARROWS)
+        bot_sep = ((4, _arrow(curses.ACS_DARROW, "v"), None,
+                    _N_SCROLL_ARROWS),)
 
-    bot_sep_win.noutrefresh()
+    _draw_rows(bot_sep_win, "info-bot-sep", [bot_sep])
 
     #
     # Update help window at bottom
     #
 
-    help_win.erase()
-
-    for i, line in enumerate(_INFO_HELP_LINES):
-        _safe_addstr(help_win, i, 0, line)
-
-    help_win.noutrefresh()
+    _draw_rows(help_win, "info-help",
+               [((0, line, None),) for line in _INFO_HELP_LINES])
 
     #
     # Update top row
     #
 
-    top_line_win.erase()
+    top_line = []
 
     # Draw arrows pointing up if the information window is scrolled down. Draw
     # them before drawing the title, so the title ends up on top for small
     # windows.
     if scroll > 0:
-        _safe_hline(top_line_win, 0, 4, curses.ACS_UARROW, _N_SCROLL_ARROWS)
+        top_line.append((4, _arrow(curses.ACS_UARROW, "^"), None,
+                         _N_SCROLL_ARROWS))
 
     title = ("Symbol" if isinstance(node.item, Symbol) else
              "Choice" if isinstance(node.item, Choice) else
              "Menu"   if node.item == MENU else
              "Comment") + " information"
-    _safe_addstr(top_line_win, 0, max((text_win_width - len(title))//2, 0),
-                 title)
+    top_line.append((max((text_win_width - len(title))//2, 0), title, None))
 
-    top_line_win.noutrefresh()
+    _draw_rows(top_line_win, "info-top-line", [tuple(top_line)])
 
 
 def _info_str(node):
@@ -2850,6 +2898,77 @@ def _set_style(win, style):
     win.bkgdset(" ", _style[style])
 
 
+def _arrow(acs_char, ascii_char):
+    # Returns the character to use for an arrow: the line-drawing character
+    # 'acs_char' normally, and the plain 'ascii_char' in low-bandwidth mode.
+    # Line-drawing characters need extra charset-switching escape sequences.
+
+    return ord(ascii_char) if _low_bandwidth else acs_char
+
+
+# Obscure Python: We never pass a value for 'frames', and it keeps pointing to
+# the same dict, mapping a frame ID to the window, geometry, and rows drawn
+# last. Using IDs instead of windows as keys keeps the dict from growing as
+# dialogs come and go.
+def _draw_rows(win, frame_id, rows, frames={}):
+    # Minimal-redraw rendering. Draws 'rows' into 'win' and marks 'win' for
+    # updating, rewriting only the rows that differ from the previous frame
+    # drawn with the same 'frame_id'.
+    #
+    # rows:
+    #   List with one tuple of segments per window row, starting at the top.
+    #   Missing rows are left blank. A segment is either (x, text, attr) or
+    #   (x, char, attr, n), the latter drawing a horizontal line of 'n'
+    #   'char's. An 'attr' of None uses the window's style.
+    #
+    # curses only sends the cells that differ from the terminal to the
+    # terminal, but erasing and redrawing every window for each keypress
+    # still rebuilds all rows and makes curses compare all of them. Unchanged
+    # rows are skipped here instead.
+
+    geometry = (win, win.getbegyx(), win.getmaxyx(), win.getbkgd())
+    rows = rows[:_height(win)]
+
+    old = frames.get(frame_id)
+    if old and old[0] == geometry:
+        old_rows = old[1]
+    else:
+        # New window, or resized, moved, or restyled. Redraw everything.
+        win.erase()
+        old_rows = []
+
+    for y in range(max(len(rows), len(old_rows))):
+        row = rows[y] if y < len(rows) else ()
+        if y < len(old_rows):
+            if old_rows[y] == row:
+                continue
+
+            _safe_move(win, y, 0)
+            _safe_clrtoeol(win)
+
+        for seg in row:
+            if len(seg) == 4:
+                x, c, attr, n = seg
+                if attr is None:
+                    _safe_hline(win, y, x, c, n)
+                else:
+                    _safe_hline(win, y, x, c, n, attr)
+            else:
+                x, s, attr = seg
+                if attr is None:
+                    _safe_addstr(win, y, x, s)
+                else:
+                    _safe_addstr(win, y, x, s, attr)
+
+    frames[frame_id] = (geometry, rows)
+
+    # Dialogs might have been drawn on top of the window since the last frame.
+    # Touching the window copies all of it to the virtual screen, which is
+    # cheap, and curses still only sends the cells that actually differ.
+    win.touchwin()
+    win.noutrefresh()
+
+
 def _max_scroll(lst, win):
     # Assuming 'lst' is a list of items to be displayed in 'win',
     # returns the maximum number of steps 'win' can be scrolled down.
@@ -3248,6 +3367,13 @@ def _safe_move(win, *args):
         pass
 
 
+def _safe_clrtoeol(win):
+    try:
+        win.clrtoeol()
+    except curses.error:
+        pass
+
+
 def _change_c_lc_ctype_to_utf8():
     # See _CHANGE_C_LC_CTYPE_TO_UTF8
 
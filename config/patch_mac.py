@@ -14,6 +14,7 @@ Verwendung:
 Optionale Argumente:
     loglevel=debug   Aktiviere ausführliche Debug-Ausgaben
     loglevel=info    Standard, weniger Ausgaben
+    --profile[=datei] Laufzeitprofil schreiben (siehe cpaprofile.py, auch über CPA_PROFILE)
 
 Beispiel:
     python patch_mac.py extract .config bc_a5120 loglevel=debug
@@ -22,6 +23,10 @@ Beispiel:
 import sys
 import os
 import re
+import functools
+
+import cpaconfig
+import cpaprofile
 
 # --- Funktionsdefinitionen ---
 def parse_kconfig_system(path):
@@ -84,6 +89,68 @@ def parse_kconfig_system(path):
         i += 1
     return results
 
+# re.compile mit eigenem Cache: Die Muster hängen vom Schlüssel ab, bei großen Varianten reicht
+# der interne Cache von re (512 Muster) nicht und jedes Muster würde pro Zeile neu übersetzt.
+# Begrenzt, damit Build-Daemon und Fuzzer bei vielen Varianten nicht unbegrenzt Muster ansammeln.
+PATTERN_CACHE_SIZE = 4096
+_compile = functools.lru_cache(maxsize=PATTERN_CACHE_SIZE)(re.compile)
+
+# Erstes Wort einer *.mac Zeile (Label oder Symbol vor ':', equ oder db)
+_FIRST_WORD_RE = re.compile(r'[^\s:]+')
+_PLAIN_KEY_RE = re.compile(r'\w+')
+
+def index_mac_lines(mac_lines):
+    """
+    Index der *.mac Zeilen nach ihrem ersten Wort, ohne Kommentar- und Leerzeilen.
+    Damit prüfen extract und patch je Schlüssel nur die Zeilen, die mit diesem Schlüssel beginnen,
+    statt für jeden Parameter die ganze Datei zu durchsuchen.
+    Args:
+        mac_lines (list): Zeilen der .mac Datei
+    Returns:
+        dict: erstes Wort -> Liste der Zeilennummern (aufsteigend)
+    """
+    index = {}
+    for idx, line in enumerate(mac_lines):
+        stripped = line.strip()
+        if not stripped or stripped.startswith(';'):
+            continue
+        index.setdefault(_FIRST_WORD_RE.match(stripped).group(0), []).append(idx)
+    return index
+
+def candidate_lines(mac_index, key, mac_lines):
+    """
+    Zeilennummern, in denen key als Label/Symbol stehen kann. Schlüssel, die keine einfachen
+    Bezeichner sind, werden (wie bisher) gegen alle Zeilen geprüft.
+    """
+    if _PLAIN_KEY_RE.fullmatch(key):
+        return mac_index.get(key, ())
+    return range(len(mac_lines))
+
+# Optionaler Cache der eingelesenen *.mac Dateien: Pfad -> (Stat-Schlüssel, Zeilen, Index).
+# Bleibt None (kein Cache) außer im Build-Daemon (cpa_daemon.py), der viele Aufrufe nacheinander bedient.
+MAC_CACHE = None
+
+def _stat_key(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+def read_mac_file(mac_path):
+    """
+    Liest eine *.mac Datei und bildet ihren Zeilenindex (mit MAC_CACHE nur bei geänderter Datei).
+    Returns:
+        tuple: (Liste der Zeilen (eigene Kopie), Index wie index_mac_lines)
+    """
+    if MAC_CACHE is not None:
+        cached = MAC_CACHE.get(mac_path)
+        if cached and cached[0] == _stat_key(mac_path):
+            return list(cached[1]), cached[2]
+    with open(mac_path, encoding="utf-8") as f:
+        mac_lines = f.readlines()
+    mac_index = index_mac_lines(mac_lines)
+    if MAC_CACHE is not None:
+        MAC_CACHE[mac_path] = (_stat_key(mac_path), list(mac_lines), mac_index)
+    return mac_lines, mac_index
+
 def extract_mac_config(mac_path, config_path, param_mappings, loglevel="info"):
     """
     Extrahiert Werte aus *.mac und schreibt sie in .config.
@@ -97,18 +164,9 @@ def extract_mac_config(mac_path, config_path, param_mappings, loglevel="info"):
     if not os.path.exists(mac_path):
         print(f"[ERROR] *.mac Datei nicht gefunden: {mac_path}")
         sys.exit(1)
-    with open(mac_path, encoding="utf-8") as f:
-        mac_lines = f.readlines()
-
-        if loglevel == "debug":
-            print(f"[DEBUG] Extrahiere aus Datei: {mac_path}")
-    config_vals = {}
-    if os.path.exists(config_path):
-        with open(config_path, encoding="utf-8") as f:
-            for line in f:
-                m = re.match(r'^(# )?(CONFIG_\w+) ?(=y|=n|is not set)?', line)
-                if m:
-                    config_vals[m.group(2)] = line.rstrip('\n')
+    mac_lines, mac_index = read_mac_file(mac_path)
+    if loglevel == "debug":
+        print(f"[DEBUG] Extrahiere aus Datei: {mac_path}")
 
     new_config = {}
     for entry in param_mappings:
@@ -122,10 +180,12 @@ def extract_mac_config(mac_path, config_path, param_mappings, loglevel="info"):
             for key, v in key_values.items():
                 if v == "hexstring":
                     istwert = None
-                    for line in mac_lines:
+                    pattern = _compile(rf'^{key}\s+equ\s+([0-9A-Fa-f]+h?|[0-9A-Fa-f]+)')
+                    for idx in candidate_lines(mac_index, key, mac_lines):
+                        line = mac_lines[idx]
                         if line.lstrip().startswith(';'):
                             continue
-                        m = re.match(rf'^{key}\s+equ\s+([0-9A-Fa-f]+h?|[0-9A-Fa-f]+)', line.strip())
+                        m = pattern.match(line.strip())
                         if m:
                             istwert = m.group(1)
                             break
@@ -138,16 +198,19 @@ def extract_mac_config(mac_path, config_path, param_mappings, loglevel="info"):
             for key, v in key_values.items():
                 if v == "string":
                     istwert = None
-                    for line in mac_lines:
+                    pattern = _compile(rf'^{key}:\s+db\s+([\'"])(.*?)([\'"]),0(.*)$')
+                    pattern2 = _compile(rf'^{key}:\s+db\s+([\'"])(.*?)([\'"])(.*)$')
+                    for idx in candidate_lines(mac_index, key, mac_lines):
+                        line = mac_lines[idx]
                         if line.lstrip().startswith(';'):
                             continue
                         # Match with ,0 and optional comment
-                        m = re.match(rf'^{key}:\s+db\s+([\'"])(.*?)([\'"]),0(.*)$', line.strip())
+                        m = pattern.match(line.strip())
                         if m:
                             istwert = m.group(2)
                             break
                         # Match without ,0, but with optional comment
-                        m2 = re.match(rf'^{key}:\s+db\s+([\'"])(.*?)([\'"])(.*)$', line.strip())
+                        m2 = pattern2.match(line.strip())
                         if m2:
                             istwert = m2.group(2)
                             break
@@ -159,10 +222,12 @@ def extract_mac_config(mac_path, config_path, param_mappings, loglevel="info"):
             aktiv_bedingung = True
             for key, sollwert in key_values.items():
                 istwert = None
-                for line in mac_lines:
+                pattern = _compile(rf'^{key}\s+equ\s+(\w+)')
+                for idx in candidate_lines(mac_index, key, mac_lines):
+                    line = mac_lines[idx]
                     if line.lstrip().startswith(';'):
                         continue
-                    m = re.match(rf'^{key}\s+equ\s+(\w+)', line.strip())
+                    m = pattern.match(line.strip())
                     if m:
                         istwert = m.group(1)
                         break
@@ -173,22 +238,10 @@ def extract_mac_config(mac_path, config_path, param_mappings, loglevel="info"):
             else:
                 new_config[config_key] = f"# {config_key} is not set"
 
-    out_lines = []
-    written = set()
-    if os.path.exists(config_path):
-        with open(config_path, encoding="utf-8") as f:
-            for line in f:
-                m = re.match(r'^(# )?(CONFIG_\w+) ?(=y|=n|is not set)?', line)
-                if m and m.group(2) in new_config:
-                    out_lines.append(new_config[m.group(2)] + "\n")
-                    written.add(m.group(2))
-                else:
-                    out_lines.append(line)
-    for k, v in new_config.items():
-        if k not in written:
-            out_lines.append(v + "\n")
-    with open(config_path, "w", encoding="utf-8") as f:
-        f.writelines(out_lines)
+    # Vorhandene Einträge an Ort und Stelle ersetzen, neue anhängen
+    config = cpaconfig.load(config_path)
+    config.update(new_config)
+    config.write(config_path)
     print(f"[INFO] .config aktualisiert (extract)")
 
 def patch_mac_file(mac_path, config_path, param_mappings, loglevel="info"):
@@ -200,24 +253,13 @@ def patch_mac_file(mac_path, config_path, param_mappings, loglevel="info"):
         param_mappings (list): Liste der Parametermappings
         loglevel (str): "info" oder "debug"
     """
-    config_set = set()
-    config_not_set = set()
-    if os.path.exists(config_path):
-        with open(config_path, encoding="utf-8") as f:
-            for line in f:
-                m_y = re.match(r'^CONFIG_(\w+)=(y)', line.strip())
-                m_n = re.match(r'^# CONFIG_(\w+) is not set', line.strip())
-                if m_y:
-                    config_set.add(m_y.group(1))
-                elif m_n:
-                    config_not_set.add(m_n.group(1))
+    config = cpaconfig.load(config_path)
 
     if not os.path.exists(mac_path):
         print(f"[ERROR] *.mac Datei nicht gefunden: {mac_path}")
         sys.exit(1)
-    with open(mac_path, encoding="utf-8") as f:
-        mac_lines = f.readlines()
-
+    # Patchen ändert das erste Wort einer Zeile nicht, der Index bleibt also gültig
+    mac_lines, mac_index = read_mac_file(mac_path)
     original_lines = list(mac_lines)  # Save original for debug diff
 
     def patch_key_in_line(line, key, value, is_string=False, is_hexstring=False):
@@ -237,17 +279,17 @@ def patch_mac_file(mac_path, config_path, param_mappings, loglevel="info"):
             return None
         if is_string:
             # Mit ,0 und Kommentar
-            m = re.match(rf'^({key}:\s+db\s+)([\'"])(.*?)([\'"]),0(.*)$', line.strip())
+            m = _compile(rf'^({key}:\s+db\s+)([\'"])(.*?)([\'"]),0(.*)$').match(line.strip())
             if m:
                 # Ersetze nur den String, Rest bleibt erhalten
                 return f"{m.group(1)}'{value}',0{m.group(5)}\n"
             # Ohne ,0, aber mit Kommentar
-            m2 = re.match(rf'^({key}:\s+db\s+)([\'"])(.*?)([\'"])(.*)$', line.strip())
+            m2 = _compile(rf'^({key}:\s+db\s+)([\'"])(.*?)([\'"])(.*)$').match(line.strip())
             if m2:
                 return f"{m2.group(1)}'{value}'{m2.group(5)}\n"
             return None
         # Standardfall: equ-Zeile patchen
-        m = re.match(rf'^({key}\s+equ\s+)([^;\s]+)(.*)$', line.strip())
+        m = _compile(rf'^({key}\s+equ\s+)([^;\s]+)(.*)$').match(line.strip())
         if m:
             val = value
             # Remove quotes for hexstring/textstring values
@@ -262,9 +304,10 @@ def patch_mac_file(mac_path, config_path, param_mappings, loglevel="info"):
         key_values = entry["key_values"]
         is_string = any(v == "string" for v in key_values.values())
         is_hexstring = any(v == "hexstring" for v in key_values.values())
-        if config_name in config_not_set:
-            for idx, line in enumerate(mac_lines):
-                for key, value in key_values.items():
+        if config.is_not_set(f"CONFIG_{config_name}"):
+            for key, value in key_values.items():
+                for idx in candidate_lines(mac_index, key, mac_lines):
+                    line = mac_lines[idx]
                     if is_hexstring:
                         # Nicht gesetzter Wert -> equ 0
                         patched = patch_key_in_line(line, key, "0", is_hexstring=True)
@@ -288,29 +331,21 @@ def patch_mac_file(mac_path, config_path, param_mappings, loglevel="info"):
         key_values = entry["key_values"]
         is_string = any(v == "string" for v in key_values.values())
         is_hexstring = any(v == "hexstring" for v in key_values.values())
+        config_key = f"CONFIG_{config_name}"
         config_val = None
         string_in_config = False
         hexstring_in_config = False
         if is_hexstring:
-            # Suche nach CONFIG_XYZ=...
-            with open(config_path, encoding="utf-8") as f:
-                for line in f:
-                    m = re.match(rf'^CONFIG_{config_name}=(.+)', line.strip())
-                    if m:
-                        config_val = m.group(1)
-                        hexstring_in_config = True
-                        break
+            # Wert von CONFIG_XYZ=... (mit Anführungszeichen)
+            config_val = (config.value(config_key) or "").strip() or None
+            hexstring_in_config = config_val is not None
         elif is_string:
-            with open(config_path, encoding="utf-8") as f:
-                for line in f:
-                    m = re.match(rf'^CONFIG_{config_name}="(.*)"', line.strip())
-                    if m:
-                        config_val = m.group(1)
-                        string_in_config = True
-                        break
-        if (is_hexstring and hexstring_in_config) or (is_string and string_in_config) or (not is_string and not is_hexstring and config_name in config_set):
-            for idx, line in enumerate(mac_lines):
-                for key, value in key_values.items():
+            config_val = config.string(config_key)
+            string_in_config = config_val is not None
+        if (is_hexstring and hexstring_in_config) or (is_string and string_in_config) or (not is_string and not is_hexstring and config.is_enabled(config_key)):
+            for key, value in key_values.items():
+                for idx in candidate_lines(mac_index, key, mac_lines):
+                    line = mac_lines[idx]
                     if is_hexstring:
                         # Patche immer Wert aus .config, auch wenn "0"
                         patched = patch_key_in_line(line, key, config_val if config_val is not None else "0", is_hexstring=True)
@@ -331,29 +366,26 @@ def patch_mac_file(mac_path, config_path, param_mappings, loglevel="info"):
     # Schreibe Datei mit CRLF-Zeilenenden (\r\n) für M80-Kompatibilität
     with open(mac_path, "w", encoding="utf-8", newline="") as f:
         f.write("".join(line.rstrip("\r\n") + "\r\n" for line in mac_lines))
+    if MAC_CACHE is not None:
+        # So, wie die Datei beim nächsten Einlesen (universelle Zeilenenden) aussieht
+        MAC_CACHE[mac_path] = (_stat_key(mac_path), [line.rstrip("\r\n") + "\n" for line in mac_lines], mac_index)
     print(f"[INFO] *.mac Datei gepatcht (patch, CRLF enforced)")
 
-def main():
+def run(mode, config_path, system_variant, base_dir=".", loglevel="info", param_mappings=None):
     """
-    Hauptfunktion: Argumente parsen, Modus wählen, loglevel setzen und Routing.
+    Führt extract oder patch für alle Parameter einer Systemvariante aus.
+    Kann auch direkt (ohne Unterprozess) aufgerufen werden, z.B. vom Round-Trip-Test.
+    Args:
+        mode (str): "extract" oder "patch"
+        config_path (str): Pfad zur .config Datei
+        system_variant (str): Name der Systemvariante
+        base_dir (str): Verzeichnis, das config/<variante> und src/<variante> enthält
+        loglevel (str): "info" oder "debug"
+        param_mappings (list): Bereits eingelesene Parametermappings (sonst aus Kconfig.system)
     """
-    if len(sys.argv) < 4:
-        print("Usage: patch_mac.py <extract|patch> <config> <systemvariante> [loglevel=debug|loglevel=info]")
-        sys.exit(1)
-    mode = sys.argv[1]
-    config_path = sys.argv[2]
-    system_variant = sys.argv[3]
-    loglevel = "info"
-    # Suche nach loglevel=... in den Argumenten
-    for arg in sys.argv[4:]:
-        if arg.startswith("loglevel="):
-            loglevel = arg.split("=",1)[1].lower()
-    # Fallback auf Umgebungsvariable
-    if loglevel == "info" and os.environ.get("LOGLEVEL"):
-        loglevel = os.environ["LOGLEVEL"].lower()
-
-    kconfig_path = os.path.join("config", system_variant, "Kconfig.system")
-    param_mappings = parse_kconfig_system(kconfig_path)
+    if param_mappings is None:
+        kconfig_path = os.path.join(base_dir, "config", system_variant, "Kconfig.system")
+        param_mappings = parse_kconfig_system(kconfig_path)
 
     # Gruppiere param_mappings nach source-Datei
     source_map = {}
@@ -366,7 +398,7 @@ def main():
     # Für jede source-Datei extrahiere/patch die zugehörigen Parameter
     for src, mappings in source_map.items():
         # src kann relativer Pfad sein (z.B. biopcrtc.mac)
-        mac_path = os.path.join("src", system_variant, src)
+        mac_path = os.path.join(base_dir, "src", system_variant, src)
         if mode == "extract":
             extract_mac_config(mac_path, config_path, mappings, loglevel=loglevel)
         elif mode == "patch":
@@ -375,5 +407,32 @@ def main():
             print("Unknown mode")
             sys.exit(1)
 
+def main():
+    """
+    Hauptfunktion: Argumente parsen, Modus wählen, loglevel setzen und Routing.
+    """
+    if len(sys.argv) < 4:
+        print("Usage: patch_mac.py <extract|patch> <config> <systemvariante> [loglevel=debug|loglevel=info]")
+        sys.exit(1)
+    mode = sys.argv[1]
+    config_path = sys.argv[2]
+    system_variant = sys.argv[3]
+    loglevel = "info"
+    # Suche nach loglevel=... in den Argumenten
+    for arg in sys.argv[4:]:
+        if arg.startswith("loglevel="):
+            loglevel = arg.split("=",1)[1].lower()
+    # Fallback auf Umgebungsvariable
+    if loglevel == "info" and os.environ.get("LOGLEVEL"):
+        loglevel = os.environ["LOGLEVEL"].lower()
+
+    # Läuft der Build-Daemon (cpa_daemon.py), arbeitet er mit warmen Caches, sonst hier im Prozess.
+    # Erst hier importiert, damit Aufrufe ohne Daemon nicht socket/socketserver laden.
+    import cpa_daemon
+    rc = cpa_daemon.forward_patch_mac(mode, config_path, system_variant, loglevel=loglevel)
+    if rc is not None:
+        sys.exit(rc)
+    run(mode, config_path, system_variant, loglevel=loglevel)
+
 if __name__ == "__main__":
-    main()
+    cpaprofile.run_main(main)
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# Copyright (c) 2025 by olliy78
+# SPDX-License-Identifier: MIT
+"""
+Schneller Round-Trip-Test für patch_mac.py (patch -> extract) ohne Unterprozesse
+
+Prüft dieselben Fälle wie test_patch_mac.py, aber:
+- patch_mac wird direkt im Prozess aufgerufen (keine python-Aufrufe pro Schritt)
+- jeder Testfall läuft auf einer eigenen Kopie von src/<variante> in einem temporären Verzeichnis,
+  .config und *.mac im Arbeitsverzeichnis werden nie verändert
+- die Testfälle werden auf einen Prozess-Pool verteilt
+- kein Anhalten mit input(), Ergebnisse optional als JUnit-XML und/oder JSON
+
+Testfälle je Parameter (alle anderen Parameter stehen auf 'is not set'):
+- bool:      CONFIG_X=y               -> nach extract wieder CONFIG_X=y
+- string:    CONFIG_X="Test Kommand"  -> nach extract wieder CONFIG_X="Test Kommand"
+- hexstring: CONFIG_X="123CAFFEh"     -> nach extract wieder CONFIG_X="123CAFFEh"
+             # CONFIG_X is not set    -> nach extract CONFIG_X="0" (patch schreibt 'equ 0', extract liest
+                                         den Wert wieder aus, 'is not set' lässt sich im *.mac nicht darstellen)
+
+Verwendung:
+    python roundtrip_patch_mac.py [systemvariante ...] [-j JOBS] [--junit DATEI] [--json DATEI] [--root DIR] [-v]
+
+Ohne Systemvariante werden alle Varianten mit config/<variante>/Kconfig.system getestet.
+
+Beispiele:
+    python config/roundtrip_patch_mac.py
+    python config/roundtrip_patch_mac.py bc_a5120 -j 4 --junit roundtrip.xml --json roundtrip.json
+"""
+import os
+import io
+import sys
+import json
+import time
+import glob
+import shutil
+import argparse
+import tempfile
+import contextlib
+import concurrent.futures
+import xml.etree.ElementTree as ET
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, SCRIPT_DIR)
+
+import cpaconfig
+import patch_mac
+
+
+def find_variants(repo_dir=REPO_DIR):
+    """Alle Systemvarianten mit Kconfig.system und passendem src-Ordner."""
+    variants = []
+    for path in sorted(glob.glob(os.path.join(repo_dir, "config", "*", "Kconfig.system"))):
+        name = os.path.basename(os.path.dirname(path))
+        if os.path.isdir(os.path.join(repo_dir, "src", name)):
+            variants.append(name)
+    return variants
+
+
+def param_kind(entry):
+    """Art eines Parameters: 'hexstring', 'string' oder 'bool' (wie in patch_mac)."""
+    values = entry["key_values"].values()
+    if any(v == "hexstring" for v in values):
+        return "hexstring"
+    if any(v == "string" for v in values):
+        return "string"
+    return "bool"
+
+
+def build_cases(variant, param_mappings):
+    """
+    Erzeugt die Testfälle einer Variante.
+    Returns:
+        list: Dicts mit name, config_key, line (Zeile vor patch) und expected (erwartete Zeile nach extract)
+    """
+    cases = []
+    for entry in param_mappings:
+        config_key = f"CONFIG_{entry['config_name']}"
+        kind = param_kind(entry)
+        if kind == "hexstring":
+            values = [("a", f'{config_key}="123CAFFEh"', None),
+                      ("b", f"# {config_key} is not set", f'{config_key}="0"')]
+        elif kind == "string":
+            values = [("", f'{config_key}="Test Kommand"', None)]
+        else:
+            values = [("", f"{config_key}=y", None)]
+        for suffix, line, expected in values:
+            cases.append({
+                "variant": variant,
+                "name": f"{entry['config_name']}{suffix}",
+                "kind": kind,
+                "config_key": config_key,
+                "line": line,
+                "expected": expected or line,
+            })
+    return cases
+
+
+def prepare_template(variant, param_mappings, workdir, repo_dir=REPO_DIR):
+    """
+    Legt eine Vorlage im temporären Verzeichnis an: Kopie von src/<variante>, daraus extrahierte .config
+    und die Quellen mit allen Parametern auf 'is not set' gepatcht (Ausgangszustand jedes Testfalls).
+    Returns:
+        tuple: (Vorlagenverzeichnis, Config mit allen Parametern 'is not set')
+    """
+    template = os.path.join(workdir, f"template_{variant}")
+    shutil.copytree(os.path.join(repo_dir, "src", variant), os.path.join(template, "src", variant))
+    config_path = os.path.join(template, ".config")
+    with contextlib.redirect_stdout(io.StringIO()):
+        patch_mac.run("extract", config_path, variant, base_dir=template, param_mappings=param_mappings)
+        all_is_not_set = cpaconfig.load(config_path)
+        for key in all_is_not_set:
+            all_is_not_set.unset(key)
+        all_is_not_set.write(config_path)
+        patch_mac.run("patch", config_path, variant, base_dir=template, param_mappings=param_mappings)
+    return template, all_is_not_set
+
+
+def run_case(case, template, base_config, param_mappings, workdir):
+    """
+    Führt einen Testfall auf einer privaten Kopie der Vorlage aus (patch, .config löschen, extract, vergleichen).
+    Läuft im Prozess-Pool und liefert das Ergebnis als Dict.
+    """
+    start = time.perf_counter()
+    case_dir = tempfile.mkdtemp(prefix=f"{case['variant']}_{case['name']}_", dir=workdir)
+    variant = case["variant"]
+    config_path = os.path.join(case_dir, ".config")
+    output = io.StringIO()
+    actual = None
+    error = None
+    try:
+        shutil.copytree(os.path.join(template, "src"), os.path.join(case_dir, "src"))
+        config = base_config.copy()
+        config[case["config_key"]] = case["line"]
+        config.write(config_path)
+        with contextlib.redirect_stdout(output):
+            patch_mac.run("patch", config_path, variant, base_dir=case_dir, param_mappings=param_mappings)
+            os.remove(config_path)
+            patch_mac.run("extract", config_path, variant, base_dir=case_dir, param_mappings=param_mappings)
+        actual = cpaconfig.load(config_path).get(case["config_key"])
+    except (Exception, SystemExit) as e:
+        error = f"{type(e).__name__}: {e}"
+    finally:
+        shutil.rmtree(case_dir, ignore_errors=True)
+    result = dict(case)
+    result.update({
+        "ok": error is None and actual == case["expected"],
+        "actual": actual,
+        "error": error,
+        "output": output.getvalue(),
+        "time": time.perf_counter() - start,
+    })
+    return result
+
+
+def write_junit(path, results, elapsed):
+    """Schreibt die Ergebnisse als JUnit-XML (eine testsuite je Systemvariante)."""
+    root = ET.Element("testsuites", name="roundtrip_patch_mac", tests=str(len(results)),
+                      failures=str(sum(not r["ok"] for r in results)), time=f"{elapsed:.3f}")
+    for variant in sorted({r["variant"] for r in results}):
+        suite_results = [r for r in results if r["variant"] == variant]
+        suite = ET.SubElement(root, "testsuite", name=variant, tests=str(len(suite_results)),
+                              failures=str(sum(not r["ok"] for r in suite_results)),
+                              time=f"{sum(r['time'] for r in suite_results):.3f}")
+        for r in suite_results:
+            tc = ET.SubElement(suite, "testcase", classname=f"patch_mac.{variant}", name=r["name"],
+                               time=f"{r['time']:.3f}")
+            if not r["ok"]:
+                failure = ET.SubElement(tc, "failure", message=r["error"] or
+                                        f"erwartet {r['expected']!r}, erhalten {r['actual']!r}")
+                failure.text = r["output"]
+    ET.ElementTree(root).write(path, encoding="utf-8", xml_declaration=True)
+
+
+def write_json(path, results, elapsed):
+    """Schreibt die Ergebnisse als JSON."""
+    data = {
+        "tests": len(results),
+        "failures": sum(not r["ok"] for r in results),
+        "time": elapsed,
+        "results": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+
+
+def run_roundtrip(variants, jobs=None, repo_dir=REPO_DIR):
+    """
+    Führt alle Round-Trip-Testfälle der angegebenen Varianten parallel aus.
+    Returns:
+        list: Ergebnis-Dicts in der Reihenfolge der Testfälle
+    """
+    with tempfile.TemporaryDirectory(prefix="roundtrip_patch_mac_") as workdir:
+        jobs_args = []
+        for variant in variants:
+            kconfig_path = os.path.join(repo_dir, "config", variant, "Kconfig.system")
+            param_mappings = patch_mac.parse_kconfig_system(kconfig_path)
+            template, base_config = prepare_template(variant, param_mappings, workdir, repo_dir)
+            for case in build_cases(variant, param_mappings):
+                jobs_args.append((case, template, base_config, param_mappings, workdir))
+        if jobs == 1:
+            return [run_case(*args) for args in jobs_args]
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(run_case, *args) for args in jobs_args]
+            return [f.result() for f in futures]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Paralleler Round-Trip-Test für patch_mac.py")
+    parser.add_argument("variants", nargs="*", metavar="systemvariante",
+                        help="Zu testende Systemvarianten (Standard: alle)")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="Anzahl paralleler Prozesse (Standard: Anzahl CPUs)")
+    parser.add_argument("--junit", metavar="DATEI", help="Ergebnisse als JUnit-XML speichern")
+    parser.add_argument("--json", metavar="DATEI", help="Ergebnisse als JSON speichern")
+    parser.add_argument("--root", default=REPO_DIR,
+                        help="Wurzelverzeichnis mit config/ und src/ (Standard: Repository, siehe gen_variant.py)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Jeden Testfall ausgeben")
+    args = parser.parse_args()
+
+    variants = args.variants or find_variants(args.root)
+    for variant in variants:
+        if not os.path.exists(os.path.join(args.root, "config", variant, "Kconfig.system")):
+            print(f"[FEHLER] Kconfig.system für Systemvariante '{variant}' nicht gefunden")
+            sys.exit(1)
+
+    start = time.perf_counter()
+    results = run_roundtrip(variants, jobs=args.jobs, repo_dir=args.root)
+    elapsed = time.perf_counter() - start
+
+    for r in results:
+        if not r["ok"]:
+            print(f"[FEHLER] {r['variant']} {r['name']}: "
+                  f"{r['error'] or 'erwartet ' + repr(r['expected']) + ', erhalten ' + repr(r['actual'])}")
+        elif args.verbose:
+            print(f"[INFO] {r['variant']} {r['name']} OK")
+    if args.junit:
+        write_junit(args.junit, results, elapsed)
+    if args.json:
+        write_json(args.json, results, elapsed)
+
+    failures = sum(not r["ok"] for r in results)
+    print(f"[INFO] {len(results)} Testfälle in {elapsed:.2f} s ({', '.join(variants)}): "
+          f"{len(results) - failures} OK, {failures} Fehler")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -16,6 +16,8 @@ Optionale Argumente:
     loglevel=debug   Aktiviere ausführliche Debug-Ausgaben (wird an patch_mac.py durchgereicht)
     loglevel=info    Standard, weniger Ausgaben
     step=...         Einzelne Testschritte oder Step-Modi
+    --profile[=datei] Laufzeitprofil schreiben (siehe cpaprofile.py); mit CPA_PROFILE werden auch
+                     die patch_mac.py-Aufrufe profiliert
 
 Ablauf:
     1. Liest die Kconfig.system der Systemvariante und extrahiert alle konfigurierbaren Parameter.
@@ -33,10 +35,12 @@ Ablauf:
 import os
 import sys
 import subprocess
-import re
 import shutil
 from termcolor import colored
 
+import cpaconfig
+import cpaprofile
+
 def parse_kconfig_system(path):
     """
     Extrahiere alle konfigurierbaren Parameter und deren Werte aus Kconfig.system.
@@ -103,28 +107,17 @@ def parse_kconfig_system(path):
 
 def read_config(path):
     """
-    Liest die .config-Datei und gibt ein Dict mit allen CONFIG_*-Einträgen zurück.
+    Liest die .config-Datei und gibt eine cpaconfig.Config mit allen CONFIG_*-Einträgen zurück.
     Key: CONFIG_<name>, Value: komplette Zeile (inkl. Kommentar, =y, is not set)
     """
-    vals = {}
-    if not os.path.exists(path):
-        return vals
-    with open(path, encoding="utf-8") as f:
-        for line in f:
-            # Erkenne alle Zuweisungen, inkl. ="...", =..., =y, =n, is not set
-            m = re.match(r'^(# )?(CONFIG_\w+)\s*(=.*| is not set)?', line)
-            if m:
-                vals[m.group(2)] = line.strip()
-    return vals
+    return cpaconfig.load(path)
 
 def write_config(path, vals):
     """
-    Schreibt das gegebene Dict (Key: CONFIG_<name>, Value: Zeile) in die .config-Datei.
+    Schreibt die gegebene Config (Key: CONFIG_<name>, Value: Zeile) in die .config-Datei.
     Jede Zeile entspricht einem Konfigurationsparameter.
     """
-    with open(path, "w", encoding="utf-8") as f:
-        for k in sorted(vals.keys()):
-            f.write(vals[k] + "\n")
+    vals.write(path)
 
 def run_patch_mac(mode, config_path, system_variant):
     """
@@ -317,4 +310,4 @@ def main():
     print(colored("Ursprüngliche Konfiguration wurde wiederhergestellt.", "cyan"))
 
 if __name__ == "__main__":
-    main()
+    cpaprofile.run_main(main)
@@ -2,38 +2,141 @@
 """
 extractUI.py
 GUI-Frontend für extract_files.py-Funktionalität mit moderner tkinter/ttk-Oberfläche.
+
+Extraktionen laufen als Auftragsliste in einem Hintergrund-Thread: Die Ausgabe
+von extract_files.py erscheint zeilenweise, während das Fenster bedienbar
+bleibt. Mehrere Images können eingereiht und laufende Aufträge abgebrochen
+werden.
 """
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import subprocess
+import threading
+import signal
+import queue
 import sys
 import os
 from pathlib import Path
 
-def run_extract(format_val, file_path, diskname, mode):
-    # Baue den Befehl
+# Formatliste aus config/cpa_formats.py (fehlt z.B. in der gepackten Version)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config'))
+try:
+    import cpa_formats
+except ImportError:
+    cpa_formats = None
+
+# Abfrageintervall der Ausgabe-Queue in ms
+POLL_MS = 100
+
+def format_values():
+    # 'auto' erkennt das Format, danach alle Formate aus der diskdefs im Arbeitsverzeichnis
+    names = ['cpa800', 'cpa780']
+    if cpa_formats and os.path.exists('diskdefs'):
+        names = list(cpa_formats.load().diskdefs) or names
+    return ['auto'] + names
+
+def extract_command(format_val, file_path, diskname, mode, dedup=False):
+    # Baue den Befehl (None, wenn weder Datei noch Diskettenname angegeben ist)
     script = os.path.join(os.path.dirname(__file__), 'extract_files.py')
-    cmd = [sys.executable, script]
+    cmd = [sys.executable, script, '--progress']
     if format_val:
         cmd += ['-t', format_val]
+    if dedup:
+        cmd += ['--dedup']
     if mode == 'file' and file_path:
         cmd += ['-f', file_path]
     elif mode == 'gw' and diskname:
         cmd += ['-g', diskname]
     else:
-        return False, 'Bitte Datei oder Diskettenname angeben.'
+        return None
+    return cmd
+
+# Jeder Auftrag läuft in einer eigenen Prozessgruppe, damit Abbrechen auch die von extract_files.py
+# gestarteten Programme (gw read, cpmcp, ...) beendet und das Laufwerk sofort wieder frei ist
+if os.name == 'nt':
+    PROCESS_GROUP = {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+else:
+    PROCESS_GROUP = {'start_new_session': True}
+
+def stop_process_tree(proc):
+    # Beendet extract_files.py samt allen Kindprozessen
+    if os.name == 'nt':
+        subprocess.run(['taskkill', '/T', '/F', '/PID', str(proc.pid)], capture_output=True)
+        return
     try:
-        proc = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        return True, proc.stdout + proc.stderr
-    except subprocess.CalledProcessError as e:
-        return False, e.stdout + e.stderr
+        os.killpg(proc.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        pass
+
+class Job:
+    """Ein Extraktionsauftrag mit Zustand, Fortschritt und gesammelter Ausgabe."""
+
+    def __init__(self, number, cmd, label):
+        self.number = number
+        self.cmd = cmd
+        self.label = label
+        self.state = 'wartet'
+        self.done = 0
+        self.total = 0
+        self.lines = []
+        self.proc = None
+        self.cancelled = False
+
+class JobRunner:
+    """Arbeitet Aufträge nacheinander in einem Hintergrund-Thread ab.
+
+    Ein einziger Worker genügt: Es gibt nur ein Greaseweazle-Laufwerk, und
+    extract_files.py wählt den Zielordner ohne Sperre. Der Thread fasst Tk
+    nicht an; Zeilen und Zustandswechsel gehen als (Auftrag, Art, Wert) in
+    die Queue ``events``, die die Oberfläche per after() abfragt.
+    """
+
+    def __init__(self):
+        self.jobs = queue.Queue()
+        self.events = queue.Queue()
+        self.lock = threading.Lock()
+        threading.Thread(target=self._work, daemon=True).start()
+
+    def submit(self, job):
+        self.jobs.put(job)
+
+    def cancel(self, job):
+        # Wartende Aufträge werden übersprungen, laufende beendet
+        with self.lock:
+            job.cancelled = True
+            if job.proc and job.proc.poll() is None:
+                stop_process_tree(job.proc)
+
+    def _work(self):
+        while True:
+            job = self.jobs.get()
+            with self.lock:
+                if job.cancelled:
+                    self.events.put((job, 'end', None))
+                    continue
+                # Ungepuffert, damit jede Zeile sofort ankommt
+                env = dict(os.environ, PYTHONUNBUFFERED='1', PYTHONIOENCODING='utf-8')
+                try:
+                    job.proc = subprocess.Popen(job.cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                                text=True, encoding='utf-8', errors='replace', env=env,
+                                                **PROCESS_GROUP)
+                except OSError as e:
+                    self.events.put((job, 'line', f'[FEHLER] {e}'))
+                    self.events.put((job, 'end', -1))
+                    continue
+            self.events.put((job, 'start', None))
+            for line in job.proc.stdout:
+                self.events.put((job, 'line', line.rstrip('\n')))
+            self.events.put((job, 'end', job.proc.wait()))
 
 def show_help():
     messagebox.showinfo('Hilfe',
         'Dieses Tool extrahiert alle Dateien aus einem CP/M-Disketten-Image oder von Diskette (Greaseweazle) in einen neuen Ordner unterhalb von Disketten/.\n\n'
-        '1. Wähle ein Image (Datei) ODER gib einen Diskettennamen für Greaseweazle ein.\n'
-        '2. Wähle das Format (z.B. cpa800, cpa780).\n'
-        '3. Klicke auf "Ausführen".\n\n'
+        '1. Wähle ein oder mehrere Images (Datei) ODER gib einen Diskettennamen für Greaseweazle ein.\n'
+        '2. Wähle das Format (z.B. cpa800, cpa780) oder auto, um es anhand des Verzeichnisses zu erkennen.\n'
+        '3. Optional: "Gleiche Inhalte nur einmal speichern" legt jede Datei nur einmal in Disketten/.objects ab und verlinkt sie.\n'
+        '4. Klicke auf "Einreihen". Die Aufträge laufen nacheinander im Hintergrund; weitere können jederzeit hinzugefügt werden.\n\n'
+        'Ein Klick auf einen Auftrag zeigt seine Ausgabe. "Abbrechen" beendet den gewählten Auftrag bzw. nimmt ihn aus der Warteschlange.\n\n'
         'Das Zielverzeichnis wird automatisch angelegt. Temporäre Images werden nach der Extraktion gelöscht.'
     )
 
@@ -46,28 +149,33 @@ def main():
     style.configure('TLabel', font=('Segoe UI', 11))
     style.configure('TEntry', font=('Segoe UI', 11))
     style.configure('TCombobox', font=('Segoe UI', 11))
-    root.geometry('640x400')
-    root.resizable(False, False)
+    root.geometry('720x600')
+    root.minsize(640, 520)
 
     frm = ttk.Frame(root, padding=24)
     frm.pack(fill='both', expand=True)
+    frm.columnconfigure(1, weight=1)
+    frm.rowconfigure(5, weight=1)
+
+    runner = JobRunner()
+    jobs = {}
 
     # Format-Auswahl
     ttk.Label(frm, text='Format:').grid(row=0, column=0, sticky='e', pady=5)
-    format_var = tk.StringVar(value='cpa800')
-    format_box = ttk.Combobox(frm, textvariable=format_var, values=['cpa800', 'cpa780'], state='readonly', width=18)
+    format_var = tk.StringVar(value='auto')
+    format_box = ttk.Combobox(frm, textvariable=format_var, values=format_values(), state='readonly', width=18)
     format_box.grid(row=0, column=1, sticky='w', pady=5, columnspan=2)
 
-    # Dateiauswahl
+    # Dateiauswahl (mehrere Images werden mit ';' getrennt)
     file_var = tk.StringVar()
     def choose_file():
-        path = filedialog.askopenfilename(title='Image-Datei auswählen', filetypes=[('Disk-Images', '*.img *.hfe *.scp *.bin *.raw'), ('Alle Dateien', '*.*')])
-        if path:
-            file_var.set(path)
+        paths = filedialog.askopenfilenames(title='Image-Dateien auswählen', filetypes=[('Disk-Images', '*.img *.cpz *.hfe *.scp *.bin *.raw'), ('Alle Dateien', '*.*')])
+        if paths:
+            file_var.set(';'.join(paths))
             diskname_var.set('')
     ttk.Label(frm, text='Image-Datei:').grid(row=1, column=0, sticky='e', pady=5)
     file_entry = ttk.Entry(frm, textvariable=file_var, width=40)
-    file_entry.grid(row=1, column=1, sticky='w', pady=5)
+    file_entry.grid(row=1, column=1, sticky='we', pady=5)
     ttk.Button(frm, text='Durchsuchen...', command=choose_file).grid(row=1, column=2, padx=5)
 
     # Diskettenname
@@ -77,46 +185,146 @@ def main():
             file_var.set('')
     ttk.Label(frm, text='Diskettenname:').grid(row=2, column=0, sticky='e', pady=5)
     disk_entry = ttk.Entry(frm, textvariable=diskname_var, width=40)
-    disk_entry.grid(row=2, column=1, sticky='w', pady=5, columnspan=2)
+    disk_entry.grid(row=2, column=1, sticky='we', pady=5)
     diskname_var.trace_add('write', on_diskname_entry)
 
-    # Status-Ausgabe
+    # Inhaltsspeicher
+    dedup_var = tk.BooleanVar(value=False)
+    ttk.Checkbutton(frm, text='Gleiche Inhalte nur einmal speichern (Disketten/.objects)',
+                    variable=dedup_var).grid(row=3, column=1, sticky='w', pady=5, columnspan=2)
+
+    # Auftragsliste
+    table = ttk.Treeview(frm, columns=('quelle', 'status', 'fortschritt'), show='headings', height=5, selectmode='browse')
+    table.heading('quelle', text='Quelle')
+    table.heading('status', text='Status')
+    table.heading('fortschritt', text='Fortschritt')
+    table.column('quelle', width=360)
+    table.column('status', width=110)
+    table.column('fortschritt', width=100, anchor='e')
+    table.grid(row=4, column=0, columnspan=3, sticky='we', pady=(18, 0))
+    # Status-Ausgabe (zeigt den gewählten Auftrag)
     status = tk.Text(frm, height=10, width=72, font=('Consolas', 10), state='disabled', wrap='word')
-    status.grid(row=4, column=0, columnspan=3, pady=(18, 0))
+    status.grid(row=5, column=0, columnspan=3, sticky='nsew', pady=(6, 0))
+    status.tag_configure('err', foreground='red')
+
+    # Fortschritt des gewählten Auftrags
+    progress = ttk.Progressbar(frm, mode='determinate')
+    progress.grid(row=6, column=0, columnspan=3, sticky='we', pady=(6, 0))
 
     def set_status(msg, error=False):
         status.config(state='normal')
         status.delete('1.0', 'end')
-        status.insert('end', msg)
-        if error:
-            status.tag_configure('err', foreground='red')
-            status.insert('end', '\n', 'err')
+        status.insert('end', msg, 'err' if error else '')
         status.config(state='disabled')
 
-    # Ausführen-Button
+    def append_status(line):
+        status.config(state='normal')
+        status.insert('end', line + '\n', 'err' if line.startswith('[FEHLER]') else '')
+        status.see('end')
+        status.config(state='disabled')
+
+    def selected_job():
+        sel = table.selection()
+        return jobs.get(sel[0]) if sel else None
+
+    def show_progress(job):
+        if job and job.state == 'läuft' and not job.total:
+            # Umfang noch unbekannt (z.B. Lesen per Greaseweazle)
+            if str(progress['mode']) != 'indeterminate':
+                progress.config(mode='indeterminate')
+                progress.start(15)
+            return
+        progress.stop()
+        total = job.total if job and job.total else 0
+        progress.config(mode='determinate', maximum=total or 1, value=job.done if total else 0)
+
+    def update_row(job):
+        shown = f'{job.done}/{job.total}' if job.total else ''
+        table.item(str(job.number), values=(job.label, job.state, shown))
+        if selected_job() is job:
+            show_progress(job)
+
+    def on_select(_event=None):
+        job = selected_job()
+        if job:
+            set_status('\n'.join(job.lines) + ('\n' if job.lines else ''))
+            status.see('end')
+        show_progress(job)
+    table.bind('<<TreeviewSelect>>', on_select)
+
+    def poll():
+        # Ereignisse des Worker-Threads im Tk-Thread übernehmen
+        try:
+            while True:
+                job, kind, value = runner.events.get_nowait()
+                if kind == 'start':
+                    job.state = 'läuft'
+                    table.selection_set(str(job.number))
+                    table.see(str(job.number))
+                elif kind == 'line':
+                    if value.startswith('[PROGRESS] '):
+                        job.done, job.total = map(int, value.split()[1].split('/'))
+                    else:
+                        job.lines.append(value)
+                        if selected_job() is job:
+                            append_status(value)
+                elif kind == 'end':
+                    if job.cancelled:
+                        job.state = 'abgebrochen'
+                    else:
+                        job.state = 'fertig' if value == 0 else 'Fehler'
+                update_row(job)
+        except queue.Empty:
+            pass
+        root.after(POLL_MS, poll)
+
+    # Einreihen-Button
     def on_run():
-        file_path = file_var.get().strip()
+        file_paths = [p.strip() for p in file_var.get().split(';') if p.strip()]
         diskname = diskname_var.get().strip()
         format_val = format_var.get().strip()
-        if file_path:
-            mode = 'file'
+        if file_paths:
+            sources = [('file', p, '', Path(p).name) for p in file_paths]
         elif diskname:
-            mode = 'gw'
+            sources = [('gw', '', diskname, f'Greaseweazle: {diskname}')]
         else:
             set_status('Bitte eine Image-Datei auswählen oder einen Diskettennamen angeben.', error=True)
             return
-        set_status('Extrahiere Dateien... Bitte warten.')
-        root.update()
-        ok, out = run_extract(format_val, file_path, diskname, mode)
-        set_status(out, error=not ok)
+        for mode, file_path, name, label in sources:
+            job = Job(len(jobs) + 1, extract_command(format_val, file_path, name, mode, dedup_var.get()), label)
+            jobs[str(job.number)] = job
+            table.insert('', 'end', iid=str(job.number), values=(label, job.state, ''))
+            runner.submit(job)
+        # Eingaben leeren, damit derselbe Auftrag nicht versehentlich doppelt eingereiht wird
+        diskname_var.set('')
+        file_var.set('')
+
+    def on_cancel():
+        job = selected_job()
+        if job and job.state in ('wartet', 'läuft'):
+            runner.cancel(job)
+            if job.state == 'wartet':
+                job.state = 'abgebrochen'
+                update_row(job)
+
+    def on_close():
+        pending = [j for j in jobs.values() if j.state in ('wartet', 'läuft')]
+        if pending and not messagebox.askyesno('Beenden', f'{len(pending)} Auftrag/Aufträge noch offen. Abbrechen und schließen?'):
+            return
+        for job in pending:
+            runner.cancel(job)
+        root.destroy()
 
     # Buttons
     btn_frame = ttk.Frame(frm)
-    btn_frame.grid(row=5, column=0, columnspan=3, pady=18)
+    btn_frame.grid(row=7, column=0, columnspan=3, pady=18)
     ttk.Button(btn_frame, text='Hilfe', command=show_help).pack(side='left', padx=8)
-    ttk.Button(btn_frame, text='Ausführen', command=on_run).pack(side='left', padx=8)
-    ttk.Button(btn_frame, text='Schließen', command=root.destroy).pack(side='left', padx=8)
+    ttk.Button(btn_frame, text='Einreihen', command=on_run).pack(side='left', padx=8)
+    ttk.Button(btn_frame, text='Abbrechen', command=on_cancel).pack(side='left', padx=8)
+    ttk.Button(btn_frame, text='Schließen', command=on_close).pack(side='left', padx=8)
+    root.protocol('WM_DELETE_WINDOW', on_close)
 
+    root.after(POLL_MS, poll)
     root.mainloop()
 
 if __name__ == '__main__':
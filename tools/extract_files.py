@@ -5,26 +5,124 @@
 extract_files.py
 Extrahiert alle Dateien aus einem CP/M-Disketten-Image oder direkt von Diskette (Greaseweazle) in ein neues Verzeichnis unterhalb des Ordners Disketten.
 Verwendung:
-    python3 extract_files.py [-t FORMAT] -f <disk_image.img> | -g <DiskName>
-    -t FORMAT   Dateisystemformat für cpmtools (Standard: cpa800)
-    -f FILE     Image-Datei einlesen (z.B. foo.img)
+    python3 extract_files.py [-t FORMAT] [--dedup[=SPEICHER]] -f <disk_image.img> | -g <DiskName>
+    -t FORMAT   Dateisystemformat für cpmtools oder auto (Standard: auto, Format wird erkannt)
+    -f FILE     Image-Datei einlesen (z.B. foo.img, auch .cpz, .hfe oder .scp)
     -g DiskName Diskette mit Greaseweazle einlesen (legt DiskName.img temporär an)
+    --dedup[=SPEICHER]  Inhalte nur einmal ablegen (Standard: Disketten/.objects) und verlinken
+    --progress  Fortschritt als Zeilen "[PROGRESS] n/gesamt" ausgeben (für extractUI.py)
     -h          Zeigt diese Hilfe an
+    --profile[=DATEI]  Laufzeitprofil schreiben (siehe config/cpaprofile.py, auch über CPA_PROFILE)
 
 Das Zielverzeichnis und ggf. das temporäre Image werden immer unterhalb des Ordners Disketten/ angelegt.
 Existiert Disketten/ nicht, wird es automatisch erzeugt.
 Nach Extraktion wird ein temporär erzeugtes Image automatisch gelöscht.
+HFE- und SCP-Dateien werden direkt im Speicher dekodiert und ausgelesen (config/cpa_flux.py, benötigt
+numpy), ohne temporäres Image und ohne Greaseweazle. Fehlt numpy, wird wie bisher gw convert verwendet.
+Mit -t auto wird das Format anhand des Verzeichnisses erkannt (config/cpa_detect.py); beim Einlesen mit
+Greaseweazle oder ohne config/ wird dann wie bisher cpa800 verwendet.
+.cpz-Container (config/cpa_store.py) werden direkt im Speicher ausgelesen; mit -t auto gilt das im
+Container abgelegte Format.
+Mit --dedup wird jeder Dateiinhalt nur einmal unter seiner SHA-1 im Speicher Disketten/.objects/
+abgelegt und per Hardlink in das Zielverzeichnis eingetragen (ohne Hardlinks: Kopie). Gleiche Dateien
+vieler Disketten (pip.com, m80.com, ...) belegen so nur einmal Platz und werden nur einmal
+geschrieben. Die Objekte sind schreibgeschützt, damit eine Änderung an einer extrahierten Datei nicht
+alle anderen Disketten mit verändert. Jedes Zielverzeichnis erhält eine .manifest.json mit Quelle,
+Format und Name, Größe und SHA-1 jeder Datei.
 """
 import argparse
+import hashlib
+import json
 import os
 import shutil
 import subprocess
 import sys
 from pathlib import Path
 
+# Profiling-Optionen aus config/cpaprofile.py und HFE/SCP-Dekoder aus config/cpa_flux.py
+# (fehlen z.B. in der gepackten Version)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config'))
+try:
+    import cpaprofile
+except ImportError:
+    cpaprofile = None
+try:
+    import cpa_flux
+    import cpa_detect
+    import cpa_formats
+    import cpa_store
+    from cpa_diskimage import image_diskdef, read_cpm_files
+except ImportError:
+    cpa_flux = None
+    cpa_detect = None
+    cpa_store = None
+
+AUTO_FORMAT = 'auto'
+FALLBACK_FORMAT = 'cpa800'
+DEFAULT_STORE = Path('Disketten') / '.objects'
+MANIFEST = '.manifest.json'
+
 def show_help():
     print(__doc__)
 
+def fallback_format(reason):
+    print(f"Format kann {reason} nicht erkannt werden, verwende {FALLBACK_FORMAT} (sonst mit -t angeben).")
+    return FALLBACK_FORMAT
+
+def report_format(ranking, path, size=None):
+    try:
+        name = cpa_detect.choose_format(ranking, cpa_formats.load(), size)
+    except ValueError as e:
+        print(f"Format von {path} nicht erkannt: {e}. Bitte mit -t angeben.")
+        sys.exit(1)
+    print(f"Erkanntes Format: {name} (Punkte: {ranking[0][0]})")
+    return name
+
+def prefixed(name, img_file):
+    """True, wenn das Image anders als mit der diskdef name gelesen werden muss (z.B. cpa780 mit Bootspuren)."""
+    try:
+        dd, boot = image_diskdef(name, img_file.stat().st_size)
+    except KeyError:
+        return False
+    return boot > 0 or dd.name != name
+
+def store_object(store, content):
+    """
+    Legt einen Inhalt unter seiner SHA-1 im Speicher ab (nur wenn er dort noch fehlt).
+    Returns:
+        tuple: (SHA-1, Pfad des Objekts, True wenn neu geschrieben)
+    """
+    digest = hashlib.sha1(content).hexdigest()
+    obj = store / digest[:2] / digest
+    if obj.exists():
+        return digest, obj, False
+    obj.parent.mkdir(parents=True, exist_ok=True)
+    tmp = obj.with_name(f"{digest}.{os.getpid()}.tmp")
+    tmp.write_bytes(content)
+    tmp.chmod(0o444)
+    os.replace(tmp, obj)
+    return digest, obj, True
+
+def link_object(obj, target):
+    """Trägt ein Objekt per Hardlink ein, ohne Hardlinks (z.B. FAT, anderes Laufwerk) als Kopie."""
+    try:
+        os.link(obj, target)
+    except OSError:
+        shutil.copyfile(obj, target)
+
+def dedup_file(store, path):
+    """Ersetzt eine bereits extrahierte Datei durch einen Link auf das Objekt gleichen Inhalts."""
+    content = path.read_bytes()
+    digest, obj, new = store_object(store, content)
+    path.unlink()
+    link_object(obj, path)
+    return digest, len(content), new
+
+def write_manifest(new_dir, source, fmt, entries):
+    manifest = {'image': str(source), 'format': fmt,
+                'files': [{'name': name, 'user': 0, 'size': size, 'sha1': digest} for name, size, digest in entries]}
+    (new_dir / MANIFEST).write_text(json.dumps(manifest, indent=2), encoding='utf-8')
+
 def run(cmd, **kwargs):
     try:
         subprocess.run(cmd, check=True, **kwargs)
@@ -34,9 +132,12 @@ def run(cmd, **kwargs):
 
 def main():
     parser = argparse.ArgumentParser(add_help=False)
-    parser.add_argument('-t', metavar='FORMAT', default='cpa800', help='Dateisystemformat für cpmtools (Standard: cpa800)')
-    parser.add_argument('-f', metavar='FILE', help='Image-Datei einlesen (z.B. foo.img)')
+    parser.add_argument('-t', metavar='FORMAT', default=AUTO_FORMAT, help='Dateisystemformat für cpmtools oder auto (Standard: auto)')
+    parser.add_argument('-f', metavar='FILE', help='Image-Datei einlesen (z.B. foo.img, foo.cpz, foo.hfe, foo.scp)')
     parser.add_argument('-g', metavar='DISKNAME', help='Diskette mit Greaseweazle einlesen (legt DiskName.img an)')
+    parser.add_argument('--dedup', metavar='SPEICHER', nargs='?', const=str(DEFAULT_STORE),
+                        help='Inhalte nur einmal im Speicher ablegen und verlinken (Standard: Disketten/.objects)')
+    parser.add_argument('--progress', action='store_true', help='Fortschritt als [PROGRESS] n/gesamt ausgeben')
     parser.add_argument('-h', action='store_true', help='Zeigt diese Hilfe an')
     args = parser.parse_args()
 
@@ -53,8 +154,11 @@ def main():
 
     img_file = None
     temp_img = None
+    image_data = None
     # Greaseweazle: Diskette einlesen
     if args.g:
+        if FORMAT == AUTO_FORMAT:
+            FORMAT = fallback_format("beim Einlesen mit Greaseweazle")
         img_file = DISKDIR / f"{args.g}.img"
         print(f"Lese Diskette mit Greaseweazle ein: {img_file} (Format: {FORMAT})")
         run([GW, 'read', '--diskdefs=cpaFormates.cfg', f'--format={FORMAT}', str(img_file)])
@@ -63,7 +167,36 @@ def main():
         orig_file = Path(args.f)
         basename_noext = orig_file.stem
         ext = orig_file.suffix.lower()
-        if ext != '.img':
+        if cpa_store and cpa_store.is_store(orig_file):
+            try:
+                with cpa_store.StoredImage(str(orig_file)) as store:
+                    image_data = store.read_all()
+                    stored_format = store.format
+            except ValueError as e:
+                print(f"Fehler beim Lesen des Containers: {e}")
+                sys.exit(1)
+            if FORMAT == AUTO_FORMAT:
+                if stored_format:
+                    FORMAT = stored_format
+                    print(f"Format aus dem Container: {FORMAT}")
+                else:
+                    FORMAT = report_format(cpa_detect.detect_image(str(orig_file))[0], orig_file, len(image_data))
+        elif ext in ('.hfe', '.scp') and cpa_flux and cpa_flux.np is not None:
+            print(f"Dekodiere {orig_file} (Format: {FORMAT}) ...")
+            try:
+                if FORMAT == AUTO_FORMAT:
+                    ranking, images = cpa_detect.detect_flux(str(orig_file))
+                    FORMAT = report_format(ranking, orig_file)
+                    image_data, missing = images[FORMAT]
+                    cpa_flux.report_missing(missing)
+                else:
+                    image_data = cpa_flux.decode_image(str(orig_file), FORMAT)
+            except (KeyError, ValueError) as e:
+                print(f"Fehler beim Dekodieren: {e}")
+                sys.exit(1)
+        elif ext != '.img':
+            if FORMAT == AUTO_FORMAT:
+                FORMAT = fallback_format("ohne numpy vor gw convert")
             img_file = DISKDIR / f"{basename_noext}.img"
             print(f"Konvertiere {orig_file} nach {img_file} (Format: {FORMAT}) ...")
             run([GW, 'convert', '--diskdefs=cpaFormates.cfg', f'--format={FORMAT}', str(orig_file), str(img_file)])
@@ -74,13 +207,25 @@ def main():
                 dest = DISKDIR / img_file.name
                 shutil.copy2(img_file, dest)
                 img_file = dest
-    if not img_file or not img_file.exists():
+    if image_data is None and (not img_file or not img_file.exists()):
         print("Kein gültiges Image angegeben.")
         show_help()
         sys.exit(1)
+    if FORMAT == AUTO_FORMAT:
+        if cpa_detect:
+            ranking, size = cpa_detect.detect_image(str(img_file))
+            FORMAT = report_format(ranking, img_file, size)
+        else:
+            FORMAT = fallback_format("ohne config/cpa_detect.py")
+    store = Path(args.dedup) if args.dedup else None
+    if image_data is None and cpa_flux and (store or prefixed(FORMAT, img_file)):
+        # Mit Inhaltsspeicher im Speicher auslesen, damit bekannte Inhalte gar nicht erst geschrieben werden;
+        # ebenso, wenn cpmtools das Verzeichnis hinter Bootspuren/Bootsektor nicht findet
+        image_data = img_file.read_bytes()
+        orig_file = img_file
 
     # Zielverzeichnis bestimmen
-    basename = img_file.stem
+    basename = img_file.stem if img_file else orig_file.stem
     new_dir = DISKDIR / basename
     count = 1
     while new_dir.exists():
@@ -90,20 +235,53 @@ def main():
         else:
             new_dir = DISKDIR / f"{basename}_{count}"
     new_dir.mkdir()
+    entries = []
+    written = 0
 
-    # Zeige Inhalt der Diskette
-    run([CPMLS, '-Ff', FORMAT, str(img_file)])
+    if image_data is not None:
+        # Dekodiertes Image direkt aus dem Speicher auslesen
+        try:
+            dd, boot = image_diskdef(FORMAT, len(image_data))
+            files = read_cpm_files(image_data[boot:], dd)
+        except KeyError as e:
+            print(f"Fehler: {e}")
+            sys.exit(1)
+        print("0:")
+        for n, (fname, content) in enumerate(files, 1):
+            print(f"{fname:<12} {len(content):>7} Bytes")
+            if store:
+                digest, obj, new = store_object(store, content)
+                link_object(obj, new_dir / fname)
+                entries.append((fname, len(content), digest))
+                written += new
+            else:
+                (new_dir / fname).write_bytes(content)
+            if args.progress:
+                print(f"[PROGRESS] {n}/{len(files)}", flush=True)
+    else:
+        # Zeige Inhalt der Diskette
+        run([CPMLS, '-Ff', FORMAT, str(img_file)])
 
-    # Liste alle Dateien im Image auf (ohne Kopfzeile)
-    result = subprocess.run([CPMLS, '-f', FORMAT, str(img_file)], capture_output=True, text=True, check=True)
-    files = [line.split()[0] for line in result.stdout.strip().splitlines()[1:] if line.strip()]
-    for fname in files:
-        if fname:
-            run([CPMCP, '-f', FORMAT, str(img_file), f'0:{fname}', str(new_dir)])
+        # Liste alle Dateien im Image auf (ohne Kopfzeile)
+        result = subprocess.run([CPMLS, '-f', FORMAT, str(img_file)], capture_output=True, text=True, check=True)
+        files = [line.split()[0] for line in result.stdout.strip().splitlines()[1:] if line.strip()]
+        for n, fname in enumerate(files, 1):
+            if fname:
+                run([CPMCP, '-f', FORMAT, str(img_file), f'0:{fname}', str(new_dir)])
+            if args.progress:
+                print(f"[PROGRESS] {n}/{len(files)}", flush=True)
+        if store:
+            for path in sorted(new_dir.iterdir()):
+                digest, size, new = dedup_file(store, path)
+                entries.append((path.name, size, digest))
+                written += new
 
     # Zähle extrahierte Dateien
-    count_files = sum(1 for _ in new_dir.glob('*') if _.is_file())
+    count_files = sum(1 for _ in new_dir.glob('*') if _.is_file() and _.name != MANIFEST)
     print(f"Es wurden {count_files} Dateien in den Ordner {new_dir} extrahiert.")
+    if store:
+        write_manifest(new_dir, orig_file if args.f else img_file, FORMAT, entries)
+        print(f"Davon {written} Inhalte neu im Speicher {store}, {len(entries) - written} bereits vorhanden.")
 
     # Temporäres Image löschen
     if temp_img and temp_img.exists():
@@ -111,4 +289,7 @@ def main():
         print(f"Temporäres Disketten-Image {temp_img} wurde gelöscht.")
 
 if __name__ == '__main__':
-    main()
+    if cpaprofile:
+        cpaprofile.run_main(main)
+    else:
+        main()